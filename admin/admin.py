@@ -8,25 +8,34 @@ from starlette.applications import Starlette
 from starlette.middleware import Middleware
 from starlette.middleware.authentication import AuthenticationMiddleware
 from starlette.middleware.sessions import SessionMiddleware
+from starlette.routing import Mount
 from starlette.staticfiles import StaticFiles
+from starlette_admin import CustomView
 from starlette_admin.contrib.mongoengine import Admin
 
 from auth import AdminAuth, AdminAuthProvider, LoginRequiredMiddleware
-from config import SECRET_KEY, DEBUG, ADMIN_TITLE, ADMIN_BASE_URL
+from config import (
+    SECRET_KEY, DEBUG, ADMIN_TITLE, ADMIN_BASE_URL, LOG_LEVEL, LOG_LEVELS,
+    PRODUCTION, ACCESS_LOG_SAMPLE, GZIP_MIN_SIZE, STATIC_MAX_AGE,
+)
 from db import get_startup_handlers, get_shutdown_handlers
-from views import NominationView, UserView, VoteView
-from database import Nomination, User, Vote
+from logger import AccessLogSampler
+from models.logs import setup_logging
+from production import CachedStaticFiles, StreamingAwareGZipMiddleware
+from live import live_feed
+from views import FraudClusterView, LiveStreamView, NominationView, UserView, VoteView
+from database import FraudCluster, Nomination, User, Vote
 
 # Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-)
+setup_logging(LOG_LEVEL, LOG_LEVELS)
 logger = logging.getLogger("xumotjbot.admin")
+if PRODUCTION:
+    logging.getLogger("uvicorn.access").addFilter(AccessLogSampler(ACCESS_LOG_SAMPLE))
 
 # Define paths
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 STATIC_DIR = os.path.join(BASE_DIR, "static")
+TEMPLATES_DIR = os.path.join(BASE_DIR, "templates")
 os.makedirs(STATIC_DIR, exist_ok=True)
 
 
@@ -37,16 +46,22 @@ def create_app() -> Starlette:
         Middleware(AuthenticationMiddleware, backend=AdminAuth()),
         Middleware(LoginRequiredMiddleware),
     ]
+    if PRODUCTION:
+        middleware.insert(0, Middleware(StreamingAwareGZipMiddleware, minimum_size=GZIP_MIN_SIZE, compresslevel=6))
     
     _app = Starlette(
         on_startup=get_startup_handlers(),
-        on_shutdown=get_shutdown_handlers(),
+        on_shutdown=[live_feed.stop, *get_shutdown_handlers()],
         debug=DEBUG,
         middleware=middleware,
     )
     
     # Mount static files directly
-    _app.mount("/static", StaticFiles(directory="static"), name="static")   
+    if PRODUCTION:
+        statics = CachedStaticFiles(directory="static", max_age=STATIC_MAX_AGE)
+    else:
+        statics = StaticFiles(directory="static")
+    _app.mount("/static", statics, name="static")
 
     # Configure admin interface with proper static file parameters based on version
     admin_kwargs = {
@@ -54,14 +69,29 @@ def create_app() -> Starlette:
         "base_url": ADMIN_BASE_URL,
         "auth_provider": AdminAuthProvider(),
         "statics_dir": STATIC_DIR,
+        "templates_dir": TEMPLATES_DIR,
     }
     
     _admin = Admin(**admin_kwargs)
+    if PRODUCTION:
+        # Serve the admin's own CSS/JS with the same cache headers
+        _admin.routes = [
+            Mount("/statics", app=CachedStaticFiles(
+                directory=STATIC_DIR, packages=["starlette_admin"], max_age=STATIC_MAX_AGE
+            ), name="statics")
+            if isinstance(route, Mount) and route.name == "statics" else route
+            for route in _admin.routes
+        ]
     
     # Register models
     _admin.add_view(NominationView(Nomination, label="Nominations", icon="fa fa-star"))
     _admin.add_view(UserView(User, label="Users", icon="fa fa-users"))
     _admin.add_view(VoteView(Vote, label="Votes", icon="fa fa-check-square"))
+    _admin.add_view(FraudClusterView(FraudCluster, label="Suspicious Clusters", icon="fa fa-user-secret"))
+    _admin.add_view(CustomView(
+        label="Live Results", icon="fa fa-bolt", path="/live", template_path="live.html", name="live"
+    ))
+    _admin.add_view(LiveStreamView())
     
     # Mount admin interface to app
     _admin.mount_to(_app)
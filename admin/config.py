@@ -13,6 +13,23 @@ DEBUG = os.getenv("DEBUG", "False").lower() == "true"
 HOST = os.getenv("HOST", "127.0.0.1")
 PORT = int(os.getenv("PORT", 8000))
 
+# Run mode: "development" (reload, verbose logs) or "production"
+ADMIN_ENV = os.getenv("ADMIN_ENV", "development").lower()
+PRODUCTION = ADMIN_ENV == "production"
+WORKERS = int(os.getenv("ADMIN_WORKERS", min(2 * (os.cpu_count() or 1) + 1, 8)))
+# Share of successful requests written to the access log in production
+ACCESS_LOG_SAMPLE = float(os.getenv("ADMIN_ACCESS_LOG_SAMPLE", 0.1))
+GZIP_MIN_SIZE = int(os.getenv("ADMIN_GZIP_MIN_SIZE", 1024))
+STATIC_MAX_AGE = int(os.getenv("ADMIN_STATIC_MAX_AGE", 7 * 24 * 3600))
+# Proxies whose X-Forwarded-For/-Proto headers are trusted, comma-separated; "*" trusts any client
+FORWARDED_ALLOW_IPS = os.getenv("ADMIN_FORWARDED_ALLOW_IPS", "127.0.0.1")
+
+# Logging configuration, LOG_LEVELS looks like "starlette=INFO,pymongo=WARNING"
+LOG_LEVEL = os.getenv("LOG_LEVEL", "DEBUG" if DEBUG else "INFO")
+LOG_LEVELS = dict(
+    item.strip().split("=", 1) for item in os.getenv("LOG_LEVELS", "").split(",") if "=" in item
+)
+
 # Database configuration
 DB_NAME = os.getenv("MONGODB_DATABASE", "xumotjbot")
 # Use MONGO_URI if provided, otherwise construct it from components
@@ -29,15 +46,49 @@ else:
     else:
         MONGO_URI = f"mongodb://{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
+# Connection pool, timeouts and compression (same variables as the bot)
+DB_MAX_POOL_SIZE = int(os.getenv("MONGODB_MAX_POOL_SIZE", 100))
+DB_MIN_POOL_SIZE = int(os.getenv("MONGODB_MIN_POOL_SIZE", 0))
+DB_CONNECT_TIMEOUT_MS = int(os.getenv("MONGODB_CONNECT_TIMEOUT_MS", 10000))
+DB_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGODB_SERVER_SELECTION_TIMEOUT_MS", 30000))
+DB_SOCKET_TIMEOUT_MS = int(os.getenv("MONGODB_SOCKET_TIMEOUT_MS", 0))
+DB_COMPRESSORS = os.getenv("MONGODB_COMPRESSORS", "")
+# List pages and the live dashboard may read from secondaries; writes use the write concern
+DB_READ_PREFERENCE = os.getenv("MONGODB_READ_PREFERENCE", "primary")
+DB_MAX_STALENESS = int(os.getenv("MONGODB_MAX_STALENESS", -1))
+DB_WRITE_CONCERN = os.getenv("MONGODB_WRITE_CONCERN", "")
+DB_WRITE_TIMEOUT_MS = int(os.getenv("MONGODB_WRITE_TIMEOUT_MS", 0))
+
 # Authentication configuration
 ADMIN_USERNAME = os.getenv("ADMIN_USERNAME", "admin")
 ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD", "admin")
-SECRET_KEY = os.getenv("SECRET_KEY", secrets.token_hex(32))
+# Without SECRET_KEY every process signs sessions with its own random key,
+# so production workers (ADMIN_WORKERS > 1) need it set to share logins.
+SECRET_KEY_CONFIGURED = bool(os.getenv("SECRET_KEY"))
+SECRET_KEY = os.getenv("SECRET_KEY") or secrets.token_hex(32)
 
 # Admin panel configuration
 ADMIN_TITLE = "XumotjBot Admin Panel"
 ADMIN_BASE_URL = os.getenv("ADMIN_BASE_URL", "/admin")
 
+# List views: seconds a page boundary and a filtered total stay valid
+KEYSET_BOUNDARY_TTL = int(os.getenv("ADMIN_KEYSET_BOUNDARY_TTL", 60))
+COUNT_CACHE_TTL = int(os.getenv("ADMIN_COUNT_CACHE_TTL", 30))
+
+# Live dashboard: coalescing window, polling fallback, per-browser buffer and keep-alive
+LIVE_INTERVAL = float(os.getenv("ADMIN_LIVE_INTERVAL", 1.0))
+LIVE_POLL_INTERVAL = float(os.getenv("ADMIN_LIVE_POLL_INTERVAL", 5.0))
+LIVE_BUFFER_SIZE = int(os.getenv("ADMIN_LIVE_BUFFER_SIZE", 100))
+LIVE_HEARTBEAT = float(os.getenv("ADMIN_LIVE_HEARTBEAT", 15.0))
+
+# Vote-farm detection: registration window, cluster size, phone prefix length and look-back
+FRAUD_WINDOW_MINUTES = int(os.getenv("ADMIN_FRAUD_WINDOW_MINUTES", 10))
+FRAUD_MIN_CLUSTER = int(os.getenv("ADMIN_FRAUD_MIN_CLUSTER", 5))
+FRAUD_PHONE_PREFIX = int(os.getenv("ADMIN_FRAUD_PHONE_PREFIX", 7))
+FRAUD_LOOKBACK_DAYS = int(os.getenv("ADMIN_FRAUD_LOOKBACK_DAYS", 30))
+# Clusters scoring below this (0-100) are not put on the review list
+FRAUD_MIN_SCORE = float(os.getenv("ADMIN_FRAUD_MIN_SCORE", 40))
+
 # Bot configuration
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
 ADMIN_IDS = os.getenv("ADMIN_IDS", "").split(",")
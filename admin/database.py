@@ -1,7 +1,26 @@
+import dataclasses
 import mongoengine as db
 from datetime import datetime, timezone
 from typing import List, Optional
 
+from mongoengine.errors import NotUniqueError, ValidationError
+from mongoengine.queryset.visitor import Q
+from pymongo.errors import DuplicateKeyError
+
+import models
+
+# Raw because IntField(min_value=0) rejects the -1 that dec__ would send.
+UNDO_VOTE = {'$inc': {'participants.$.votes': -1}}
+
+
+def open_for_voting(now: datetime) -> Q:
+    """Query matching nominations that accept votes at ``now`` (see ``models.voting_open``)."""
+    return (
+        Q(is_active=True)
+        & (Q(opens_at=None) | Q(opens_at__lte=now))
+        & (Q(closes_at=None) | Q(closes_at__gt=now))
+    )
+
 
 class Participant(db.EmbeddedDocument):
     """
@@ -12,7 +31,7 @@ class Participant(db.EmbeddedDocument):
         votes (int): The number of votes the participant has received
         created_at (datetime): When the participant was added
     """
-    name = db.StringField(required=True, max_length=100)
+    name = db.StringField(required=True, max_length=models.Participant.NAME_MAX_LENGTH)
     votes = db.IntField(default=0, min_value=0)
     created_at = db.DateTimeField(default=lambda: datetime.now(timezone.utc))
     
@@ -33,15 +52,25 @@ class Nomination(db.Document):
         description (str): Optional description of the nomination
         participants (List[Participant]): List of participants in this nomination
         is_active (bool): Whether voting is currently active for this nomination
+        opens_at (datetime): Optional start of voting (UTC)
+        closes_at (datetime): Optional end of voting (UTC), exclusive
         created_at (datetime): When the nomination was created
         updated_at (datetime): When the nomination was last updated
+        votes_archived_at (datetime): When scripts/archive_votes.py moved the votes out
+        archived_votes (int): How many votes are in vote_archive
+        votes_invalidated_at (datetime): When fraud.py last removed votes of this nomination
     """
-    title = db.StringField(required=True, max_length=200, unique=True)
-    description = db.StringField(max_length=500)
+    title = db.StringField(required=True, max_length=models.Nomination.TITLE_MAX_LENGTH, unique=True)
+    description = db.StringField(max_length=models.Nomination.DESCRIPTION_MAX_LENGTH)
     participants = db.ListField(db.EmbeddedDocumentField(Participant), default=[])
     is_active = db.BooleanField(default=True)
+    opens_at = db.DateTimeField()
+    closes_at = db.DateTimeField()
     created_at = db.DateTimeField(default=lambda: datetime.now(timezone.utc))
     updated_at = db.DateTimeField(default=lambda: datetime.now(timezone.utc))
+    votes_archived_at = db.DateTimeField()
+    archived_votes = db.IntField(default=0)
+    votes_invalidated_at = db.DateTimeField()
     
     meta = {
         'indexes': [
@@ -50,46 +79,71 @@ class Nomination(db.Document):
             {'fields': ['-created_at']}
         ],
         'ordering': ['-created_at'],
-        'collection': 'nominations'
+        'collection': models.Nomination.COLLECTION
     }
     
+    def clean(self) -> None:
+        if self.opens_at and self.closes_at and self.closes_at <= self.opens_at:
+            raise ValidationError("Voting must close after it opens", field_name="closes_at")
+        # Archived votes no longer hit the unique (user, nomination) index, so
+        # reopening would let the same users vote again on top of the counts.
+        if self.votes_archived_at and self.is_active and (
+            self.closes_at is None or models.nomination.as_utc(self.closes_at) > datetime.now(timezone.utc)
+        ):
+            raise ValidationError(
+                "Votes of this nomination are archived; restore them with scripts/archive_votes.py before reopening",
+                field_name="closes_at",
+            )
+
+    def is_open(self, now: Optional[datetime] = None) -> bool:
+        """Whether the bot accepts votes for this nomination at ``now``."""
+        return models.voting_open(self.is_active, self.opens_at, self.closes_at, now or datetime.now(timezone.utc))
+
     def add_participant(self, name: str) -> Participant:
         """
         Add a new participant to the nomination.
-        
+
+        Appends with a single ``$push`` instead of saving the whole document,
+        so vote counts written by the bot in the meantime are kept. This
+        instance is not reloaded.
+
         Args:
             name: The name of the participant
-            
+
         Returns:
             The newly created participant
+
+        Raises:
+            ValueError: If the nomination already has a participant with this name
         """
         participant = Participant(name=name)
-        self.participants.append(participant)
-        self.updated_at = datetime.now(timezone.utc)
-        self.save()
+        added = Nomination.objects(id=self.id, participants__name__ne=name).update_one(
+            push__participants=participant,
+            set__updated_at=datetime.now(timezone.utc),
+        )
+        if not added:
+            raise ValueError(f"Participant {name!r} already exists in {self.title!r}")
         return participant
-    
+
     def vote_for_participant(self, participant_name: str) -> bool:
         """
         Register a vote for a participant.
-        
+
+        A positional ``$inc`` that only matches while the nomination is open
+        for voting, so concurrent votes are never lost.
+
         Args:
             participant_name: The name of the participant to vote for
-            
+
         Returns:
             True if the vote was successful, False otherwise
         """
-        if not self.is_active:
-            return False
-            
-        for i, participant in enumerate(self.participants):
-            if participant.name == participant_name:
-                self.participants[i].increment_vote()
-                self.updated_at = datetime.now(timezone.utc)
-                self.save()
-                return True
-        return False
-    
+        now = datetime.now(timezone.utc)
+        return bool(Nomination.objects(open_for_voting(now), id=self.id, participants__name=participant_name).update_one(
+            inc__participants__S__votes=1,
+            set__updated_at=now,
+        ))
+
     def get_results(self) -> List[Participant]:
         """
         Get participants sorted by votes (highest first).
@@ -109,10 +163,17 @@ class User(db.Document):
     Maps directly to the users collection created by the bot.
     """
     user_id = db.IntField(required=True, unique=True)
-    fullname = db.StringField(max_length=255)
-    username = db.StringField(max_length=64)
-    input_fullname = db.StringField(max_length=255)
-    input_phone = db.StringField(max_length=20)
+    fullname = db.StringField(max_length=models.User.FULLNAME_MAX_LENGTH)
+    username = db.StringField(max_length=models.User.USERNAME_MAX_LENGTH)
+    input_fullname = db.StringField(max_length=models.User.FULLNAME_MAX_LENGTH)
+    input_phone = db.StringField(max_length=models.User.PHONE_MAX_LENGTH)
+    # Delivery state maintained by the bot's broadcaster
+    is_blocked = db.BooleanField(default=False)
+    is_deactivated = db.BooleanField(default=False)
+    last_delivery_at = db.DateTimeField()
+    delivery_failures = db.IntField(default=0, min_value=0)
+    # Last update received from the user, flushed in batches by the bot
+    last_active_at = db.DateTimeField()
     created_at = db.DateTimeField(default=lambda: datetime.now(timezone.utc))
     updated_at = db.DateTimeField(default=lambda: datetime.now(timezone.utc))
     
@@ -121,12 +182,17 @@ class User(db.Document):
             {'fields': ['user_id'], 'unique': True},
             {'fields': ['username']},
             {'fields': ['input_phone']},
-            {'fields': ['-created_at']}
+            {'fields': ['-created_at', '-id']},
+            {'fields': ['-last_active_at']}
         ],
-        'collection': 'users',  # Important: matches the bot's collection name
+        'collection': models.User.COLLECTION,
         'ordering': ['-created_at']
     }
     
+    def clean(self) -> None:
+        # Edits from the panel must move updated_at too, or incremental backups miss them.
+        self.updated_at = datetime.now(timezone.utc)
+
     @classmethod
     def get_or_create(cls, user_id: int, fullname: str = None, username: str = None) -> 'User':
         user = cls.objects(user_id=user_id).first()
@@ -159,6 +225,11 @@ class User(db.Document):
             "username": self.username,
             "input_fullname": self.input_fullname,
             "input_phone": self.input_phone,
+            "is_blocked": self.is_blocked,
+            "is_deactivated": self.is_deactivated,
+            "last_delivery_at": self.last_delivery_at,
+            "delivery_failures": self.delivery_failures,
+            "last_active_at": self.last_active_at,
             "created_at": self.created_at,
             "updated_at": self.updated_at,
             "is_registered": self.is_fully_registered(),
@@ -175,15 +246,15 @@ class Vote(db.Document):
     """
     user_id = db.IntField(required=True)
     nomination_id = db.ObjectIdField(required=True)
-    participant_name = db.StringField(required=True, max_length=100)
+    participant_name = db.StringField(required=True, max_length=models.Vote.PARTICIPANT_NAME_MAX_LENGTH)
     voted_at = db.DateTimeField(default=lambda: datetime.now(timezone.utc))
     
     meta = {
         'indexes': [
             {'fields': ['user_id', 'nomination_id'], 'unique': True},
-            {'fields': ['-voted_at']}
+            {'fields': ['-voted_at', '-id']}
         ],
-        'collection': 'votes',  # Important: matches the bot's collection name
+        'collection': models.Vote.COLLECTION,
         'ordering': ['-voted_at']
     }
     
@@ -199,34 +270,124 @@ class Vote(db.Document):
     
     @classmethod
     def cast_vote(cls, user_id: int, nomination_id: str, participant_name: str) -> tuple:
-        user = User.objects(user_id=user_id).first()
-        if not user:
+        """
+        Record or change a user's vote without loading the nomination.
+
+        The new participant's count is incremented first, guarded on the
+        nomination being open for voting. The vote itself is then upserted; the unique
+        ``(user_id, nomination_id)`` index rejects a repeat vote for the same
+        participant, in which case the increment is undone. A changed vote
+        decrements the previous participant, never below zero.
+        """
+        if not User.objects(user_id=user_id).only('id').first():
             return False, "User not found"
-        nomination = Nomination.objects(id=nomination_id).first()
-        if not nomination:
-            return False, "Nomination not found"
-        if not nomination.is_active:
-            return False, "Voting is closed for this nomination"
-        participant_exists = any(p.name == participant_name for p in nomination.participants)
-        if not participant_exists:
+
+        now = datetime.now(timezone.utc)
+        counted = Nomination.objects(
+            open_for_voting(now), id=nomination_id, participants__name=participant_name,
+        ).update_one(inc__participants__S__votes=1, set__updated_at=now)
+        if not counted:
+            nomination = Nomination.objects(id=nomination_id).only('is_active', 'opens_at', 'closes_at').first()
+            if not nomination:
+                return False, "Nomination not found"
+            if not nomination.is_open(now):
+                return False, "Voting is closed for this nomination"
             return False, "Participant not found"
-        existing_vote = cls.objects(user_id=user_id, nomination_id=nomination_id).first()
-        if existing_vote and existing_vote.participant_name == participant_name:
+
+        try:
+            previous = cls.objects(
+                user_id=user_id, nomination_id=nomination_id, participant_name__ne=participant_name
+            ).modify(upsert=True, new=False, set__participant_name=participant_name, set__voted_at=now)
+        except (NotUniqueError, DuplicateKeyError):
+            Nomination.objects(id=nomination_id, participants__name=participant_name).update_one(
+                __raw__=UNDO_VOTE,
+            )
             return False, "You've already voted for this participant"
-        if existing_vote:
-            for i, p in enumerate(nomination.participants):
-                if p.name == existing_vote.participant_name:
-                    nomination.participants[i].votes = max(0, nomination.participants[i].votes - 1)
-                    break
-            existing_vote.delete()
-        vote = cls(user_id=user_id, nomination_id=nomination_id, participant_name=participant_name)
-        vote.save()
-        for i, p in enumerate(nomination.participants):
-            if p.name == participant_name:
-                nomination.participants[i].votes += 1
-                break
-        nomination.updated_at = datetime.now(timezone.utc)
-        nomination.save()
-        if existing_vote:
-            return True, f"Vote changed from {existing_vote.participant_name} to {participant_name}"
-        return True, "Vote recorded successfully"
\ No newline at end of file
+
+        if previous:
+            Nomination.objects(
+                id=nomination_id,
+                participants__match={'name': previous.participant_name, 'votes__gt': 0},
+            ).update_one(__raw__=UNDO_VOTE)
+            return True, f"Vote changed from {previous.participant_name} to {participant_name}"
+        return True, "Vote recorded successfully"
+
+
+class FraudTarget(db.EmbeddedDocument):
+    """Votes a suspicious cluster gave one participant."""
+    nomination_id = db.ObjectIdField(required=True)
+    participant_name = db.StringField(required=True, max_length=models.Vote.PARTICIPANT_NAME_MAX_LENGTH)
+    votes = db.IntField(default=0, min_value=0)
+
+    def __str__(self) -> str:
+        return f"{self.participant_name}: {self.votes}"
+
+
+class FraudCluster(db.Document):
+    """
+    Accounts registered in the same window with the same phone prefix, scored by ``fraud.py``.
+
+    The id is ``<window start>:<phone prefix>`` so re-running the analysis
+    updates the same clusters. Reviewers move them from ``pending`` to
+    ``confirmed`` or ``dismissed``; invalidating a confirmed cluster removes
+    its votes and marks it ``invalidated``.
+    """
+    STATUSES = ("pending", "confirmed", "dismissed", "invalidated")
+
+    id = db.StringField(primary_key=True)
+    window_start = db.DateTimeField(required=True)
+    window_end = db.DateTimeField(required=True)
+    phone_prefix = db.StringField(max_length=20)
+    user_ids = db.ListField(db.IntField())
+    user_count = db.IntField(default=0)
+    voter_count = db.IntField(default=0)
+    vote_count = db.IntField(default=0)
+    left_count = db.IntField(default=0)
+    vote_span_seconds = db.FloatField()
+    targets = db.ListField(db.EmbeddedDocumentField(FraudTarget), default=[])
+    score = db.FloatField(default=0)
+    status = db.StringField(choices=STATUSES, default="pending")
+    detected_at = db.DateTimeField(default=lambda: datetime.now(timezone.utc))
+    analyzed_at = db.DateTimeField()
+    reviewed_at = db.DateTimeField()
+    invalidated_votes = db.IntField(default=0)
+
+    meta = {
+        'indexes': [
+            {'fields': ['status', '-score']},
+            {'fields': ['-score']},
+        ],
+        'collection': 'fraud_clusters',
+        'ordering': ['-score']
+    }
+
+    def __str__(self) -> str:
+        return f"{self.phone_prefix or '?'}* @ {self.window_start:%Y-%m-%d %H:%M} ({self.user_count} users, {self.score:.0f})"
+
+
+def check_shared_fields() -> None:
+    """
+    Fail fast when a document here and its ``models`` counterpart no longer
+    declare the same fields, so a field added to one side is not silently
+    dropped by the other.
+    """
+    pairs = (
+        (models.Participant, Participant),
+        (models.Nomination, Nomination),
+        (models.User, User),
+        (models.Vote, Vote),
+    )
+    mismatches = []
+    for shared, document in pairs:
+        expected = {field.name for field in dataclasses.fields(shared)}
+        declared = set(document._fields)
+        if expected != declared:
+            mismatches.append(
+                f"{document.__name__}: only in models {sorted(expected - declared)}, "
+                f"only in admin {sorted(declared - expected)}"
+            )
+    if mismatches:
+        raise TypeError("Shared document fields out of sync: " + "; ".join(mismatches))
+
+
+check_shared_fields()
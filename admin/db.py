@@ -4,17 +4,32 @@ Database connection management for the XumotjBot Admin Panel.
 import logging
 from typing import Callable, List
 from mongoengine import connect, disconnect
+from models.mongo import client_options, make_read_preference
 
-from config import DB_NAME, MONGO_URI
+from config import (
+    DB_NAME, MONGO_URI, DB_MAX_POOL_SIZE, DB_MIN_POOL_SIZE, DB_CONNECT_TIMEOUT_MS,
+    DB_SERVER_SELECTION_TIMEOUT_MS, DB_SOCKET_TIMEOUT_MS, DB_COMPRESSORS,
+    DB_READ_PREFERENCE, DB_MAX_STALENESS, DB_WRITE_CONCERN, DB_WRITE_TIMEOUT_MS,
+)
 
 # Configure logging
 logger = logging.getLogger("xumotjbot.admin.db")
 
-def setup_database() -> None:
-    """Connect to MongoDB database."""
+CLIENT_OPTIONS = client_options(
+    DB_MAX_POOL_SIZE, DB_MIN_POOL_SIZE, DB_CONNECT_TIMEOUT_MS, DB_SERVER_SELECTION_TIMEOUT_MS,
+    DB_SOCKET_TIMEOUT_MS, DB_COMPRESSORS, DB_WRITE_CONCERN, DB_WRITE_TIMEOUT_MS,
+)
+
+
+# Used for read-mostly queries: list pages, totals and the live dashboard
+LIST_READ_PREFERENCE = make_read_preference(DB_READ_PREFERENCE, DB_MAX_STALENESS)
+
+
+def setup_database(host: str = MONGO_URI, db: str = DB_NAME) -> None:
+    """Connect to MongoDB database; the configured one unless ``host``/``db`` are given."""
     try:
-        connect(host=MONGO_URI, db=DB_NAME)
-        logger.info(f"Connected to database: {DB_NAME}, {MONGO_URI}")
+        connect(host=host, db=db, **CLIENT_OPTIONS)
+        logger.info(f"Connected to database: {db}, {host}")
     except Exception as e:
         logger.error(f"Failed to connect to database: {e}")
         raise
@@ -0,0 +1,339 @@
+"""
+Vote-farm detection and bulk vote invalidation.
+
+A farm registers a burst of accounts from one batch of SIM cards, votes for
+the same participants within minutes and abandons the accounts. The analysis
+groups ``users`` by registration window and phone prefix in one aggregation,
+profiles the ``votes`` of every large group in a second one and stores the scored
+groups as :class:`FraudCluster` documents for review in the admin panel.
+
+Run it periodically, e.g. from cron:
+
+    python fraud.py
+    python fraud.py --window 5 --min-cluster 10 --lookback 7
+"""
+import argparse
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, List, Tuple
+
+from pymongo import UpdateOne
+
+from config import (
+    FRAUD_LOOKBACK_DAYS, FRAUD_MIN_CLUSTER, FRAUD_MIN_SCORE, FRAUD_PHONE_PREFIX, FRAUD_WINDOW_MINUTES,
+)
+from database import FraudCluster, Nomination, User, Vote
+
+logger = logging.getLogger("xumotjbot.admin.fraud")
+
+# Share of the 0-100 score each signal contributes
+WEIGHTS = {
+    "size": 0.15,           # cluster size, saturating at four times the minimum
+    "voting": 0.25,         # share of the accounts that voted
+    "concentration": 0.30,  # share of votes going to the cluster's favourite in each nomination
+    "burst": 0.15,          # all votes cast within one registration window
+    "left": 0.15,           # share of the accounts that blocked the bot or were deleted since
+}
+ARCHIVE_COLLECTION = "invalidated_votes"
+
+
+def cluster_key(window_ms: int, prefix_length: int) -> dict:
+    """Projection of a user's registration window and phone prefix, the two parts of a cluster's key."""
+    created_ms = {"$toLong": "$created_at"}
+    return {
+        "window": {"$subtract": [created_ms, {"$mod": [created_ms, window_ms]}]},
+        "prefix": {"$substrCP": [
+            {"$replaceAll": {"input": {"$ifNull": ["$input_phone", ""]}, "find": "+", "replacement": ""}},
+            0, prefix_length,
+        ]},
+    }
+
+
+def cluster_pipeline(since: datetime, window_ms: int, prefix_length: int, min_cluster: int) -> list:
+    """Group recent users by registration window and phone prefix, keeping groups of ``min_cluster`` or more."""
+    return [
+        {"$match": {"created_at": {"$gte": since}}},
+        {"$project": {
+            "user_id": 1,
+            "left": {"$or": [{"$eq": ["$is_blocked", True]}, {"$eq": ["$is_deactivated", True]}]},
+            **cluster_key(window_ms, prefix_length),
+        }},
+        {"$group": {
+            "_id": {"window": "$window", "prefix": "$prefix"},
+            "user_ids": {"$push": "$user_id"},
+            "left": {"$sum": {"$cond": ["$left", 1, 0]}},
+        }},
+        {"$set": {"user_count": {"$size": "$user_ids"}}},
+        {"$match": {"user_count": {"$gte": min_cluster}}},
+    ]
+
+
+def vote_profile_pipeline(user_ids: List[int], window_ms: int, prefix_length: int) -> list:
+    """
+    Votes of every cluster in one pass: per-participant counts plus voter count and time span.
+
+    Each vote is tagged with its voter's cluster key via ``$lookup``, so the
+    results carry the same ``{window, prefix}`` ids as :func:`cluster_pipeline`.
+    """
+    return [
+        {"$match": {"user_id": {"$in": user_ids}}},
+        {"$lookup": {
+            "from": User._get_collection_name(),
+            "localField": "user_id",
+            "foreignField": "user_id",
+            "pipeline": [{"$project": {"_id": 0, **cluster_key(window_ms, prefix_length)}}],
+            "as": "cluster",
+        }},
+        {"$unwind": "$cluster"},
+        {"$facet": {
+            "targets": [
+                {"$group": {
+                    "_id": {
+                        "cluster": "$cluster",
+                        "nomination_id": "$nomination_id",
+                        "participant_name": "$participant_name",
+                    },
+                    "votes": {"$sum": 1},
+                }},
+                {"$sort": {"votes": -1}},
+            ],
+            "summary": [
+                {"$group": {
+                    "_id": {"cluster": "$cluster", "user_id": "$user_id"},
+                    "votes": {"$sum": 1},
+                    "first": {"$min": "$voted_at"},
+                    "last": {"$max": "$voted_at"},
+                }},
+                {"$group": {
+                    "_id": "$_id.cluster",
+                    "voters": {"$sum": 1},
+                    "votes": {"$sum": "$votes"},
+                    "first": {"$min": "$first"},
+                    "last": {"$max": "$last"},
+                }},
+            ],
+        }},
+    ]
+
+
+def score(user_count: int, voter_count: int, left_count: int, targets: list,
+          vote_span: float, window_seconds: float, min_cluster: int) -> float:
+    """Combine the cluster's signals into a 0-100 score, see ``WEIGHTS``."""
+    if not voter_count:
+        return 0.0
+    vote_count = sum(target["votes"] for target in targets)
+    favourites = {}
+    for target in targets:
+        nomination = target["_id"]["nomination_id"]
+        favourites[nomination] = max(favourites.get(nomination, 0), target["votes"])
+    signals = {
+        "size": min(1.0, user_count / (4 * min_cluster)),
+        "voting": voter_count / user_count,
+        "concentration": sum(favourites.values()) / vote_count,
+        "burst": 1.0 if vote_span <= window_seconds else window_seconds / vote_span,
+        "left": left_count / user_count,
+    }
+    return round(100 * sum(WEIGHTS[name] * value for name, value in signals.items()), 1)
+
+
+def analyze(
+    window_minutes: int = FRAUD_WINDOW_MINUTES,
+    min_cluster: int = FRAUD_MIN_CLUSTER,
+    prefix_length: int = FRAUD_PHONE_PREFIX,
+    lookback_days: int = FRAUD_LOOKBACK_DAYS,
+    min_score: float = FRAUD_MIN_SCORE,
+) -> int:
+    """
+    Score registration clusters of the last ``lookback_days`` and store those above ``min_score``.
+
+    Re-running updates the metrics of existing clusters but keeps their review
+    status; invalidated clusters are left alone.
+
+    Returns:
+        Number of clusters stored or updated
+    """
+    now = datetime.now(timezone.utc)
+    window_ms = window_minutes * 60 * 1000
+    pipeline = cluster_pipeline(now - timedelta(days=lookback_days), window_ms, prefix_length, min_cluster)
+    groups = list(User._get_collection().aggregate(pipeline, allowDiskUse=True))
+    logger.info("Found %d registration clusters of %d+ users", len(groups), min_cluster)
+
+    invalidated = set(FraudCluster.objects(status="invalidated").scalar("id"))
+    candidates = {}
+    for group in groups:
+        window_start = datetime.fromtimestamp(group["_id"]["window"] / 1000, timezone.utc)
+        key = f"{window_start:%Y%m%dT%H%M}:{group['_id']['prefix']}"
+        if key not in invalidated:
+            candidates[(group["_id"]["window"], group["_id"]["prefix"])] = (key, window_start, group)
+
+    targets, summaries = {}, {}
+    if candidates:
+        user_ids = [user_id for _, _, group in candidates.values() for user_id in group["user_ids"]]
+        pipeline = vote_profile_pipeline(user_ids, window_ms, prefix_length)
+        profile = next(Vote._get_collection().aggregate(pipeline, allowDiskUse=True))
+        for target in profile["targets"]:
+            cluster = target["_id"].pop("cluster")
+            targets.setdefault((cluster["window"], cluster["prefix"]), []).append(target)
+        for summary in profile["summary"]:
+            summaries[(summary["_id"]["window"], summary["_id"]["prefix"])] = summary
+
+    operations = []
+    for cluster, (key, window_start, group) in candidates.items():
+        cluster_targets = targets.get(cluster, [])
+        summary = summaries.get(cluster, {"voters": 0, "votes": 0})
+        span = (summary["last"] - summary["first"]).total_seconds() if summary["votes"] else 0.0
+        cluster_score = score(
+            group["user_count"], summary["voters"], group["left"], cluster_targets,
+            span, window_minutes * 60, min_cluster,
+        )
+        if cluster_score < min_score:
+            continue
+
+        operations.append(UpdateOne({"_id": key}, {
+            "$set": {
+                "window_start": window_start,
+                "window_end": window_start + timedelta(minutes=window_minutes),
+                "phone_prefix": group["_id"]["prefix"],
+                "user_ids": group["user_ids"],
+                "user_count": group["user_count"],
+                "voter_count": summary["voters"],
+                "vote_count": summary["votes"],
+                "left_count": group["left"],
+                "vote_span_seconds": span,
+                "targets": [{**target["_id"], "votes": target["votes"]} for target in cluster_targets],
+                "score": cluster_score,
+                "analyzed_at": now,
+            },
+            "$setOnInsert": {"status": "pending", "detected_at": now, "invalidated_votes": 0},
+        }, upsert=True))
+
+    if operations:
+        FraudCluster._get_collection().bulk_write(operations, ordered=False)
+    logger.info("Stored %d suspicious clusters", len(operations))
+    return len(operations)
+
+
+def recount(nomination_ids: list) -> None:
+    """Set every participant's counter of the given nominations to the number of its stored votes."""
+    votes = Vote._get_collection()
+    operations = []
+    for nomination in Nomination._get_collection().find({"_id": {"$in": nomination_ids}}, {"participants.name": 1}):
+        counts = {row["_id"]: row["votes"] for row in votes.aggregate([
+            {"$match": {"nomination_id": nomination["_id"]}},
+            {"$group": {"_id": "$participant_name", "votes": {"$sum": 1}}},
+        ])}
+        operations.extend(
+            UpdateOne(
+                {"_id": nomination["_id"], "participants.name": participant["name"]},
+                {"$set": {"participants.$.votes": counts.get(participant["name"], 0)}},
+            )
+            for participant in nomination.get("participants", [])
+        )
+    if operations:
+        Nomination._get_collection().bulk_write(operations, ordered=False)
+
+
+def invalidate(cluster_ids: Iterable[str]) -> Tuple[int, int]:
+    """
+    Remove every vote of the given confirmed clusters and take them off the participants' counts.
+
+    Everything runs in the database. Per cluster, an aggregation ``$merge``s
+    the votes into ``invalidated_votes``, stamped with the cluster id and this
+    run's ``invalidated_at``, and ``delete_many`` removes the same votes. The
+    counter corrections are grouped from the archived documents of this run,
+    one positional ``$inc`` per participant in a single bulk write. If a vote
+    changed between the two steps, the deleted and archived counts differ and
+    the affected nominations are recounted from ``votes`` instead. Votes cast
+    after the run started are left alone.
+
+    The nominations get ``votes_invalidated_at``, which tells the bot to drop
+    its cached vote maps for them.
+
+    Returns:
+        ``(clusters, votes)`` invalidated
+    """
+    clusters = list(FraudCluster.objects(id__in=list(cluster_ids), status="confirmed").only("id", "user_ids"))
+    if not clusters:
+        return 0, 0
+    now = datetime.now(timezone.utc)
+
+    votes = Vote._get_collection()
+    deleted = 0
+    for cluster in clusters:
+        match = {"user_id": {"$in": cluster.user_ids}, "voted_at": {"$lte": now}}
+        votes.aggregate([
+            {"$match": match},
+            {"$project": {
+                "user_id": 1, "nomination_id": 1, "participant_name": 1, "voted_at": 1,
+                "cluster_id": {"$literal": cluster.id}, "invalidated_at": {"$literal": now},
+            }},
+            # Votes archived by an earlier, interrupted run are stamped with this run
+            {"$merge": {"into": ARCHIVE_COLLECTION, "on": "_id",
+                        "whenMatched": "replace", "whenNotMatched": "insert"}},
+        ])
+        deleted += votes.delete_many(match).deleted_count
+
+    archive = votes.database[ARCHIVE_COLLECTION]
+    counts, per_cluster = {}, {}
+    for group in archive.aggregate([
+        {"$match": {"cluster_id": {"$in": [cluster.id for cluster in clusters]}, "invalidated_at": now}},
+        {"$group": {
+            "_id": {"cluster_id": "$cluster_id", "nomination_id": "$nomination_id", "name": "$participant_name"},
+            "votes": {"$sum": 1},
+        }},
+    ]):
+        target = (group["_id"]["nomination_id"], group["_id"]["name"])
+        counts[target] = counts.get(target, 0) + group["votes"]
+        per_cluster[group["_id"]["cluster_id"]] = per_cluster.get(group["_id"]["cluster_id"], 0) + group["votes"]
+
+    archived = sum(counts.values())
+    affected = list({nomination_id for nomination_id, _ in counts})
+    nominations = Nomination._get_collection()
+    if archived != deleted:
+        logger.warning("Archived %d votes but deleted %d; recounting %d nominations",
+                       archived, deleted, len(affected))
+        recount(affected)
+    elif counts:
+        nominations.bulk_write([
+            UpdateOne(
+                {"_id": nomination_id, "participants.name": name},
+                {"$inc": {"participants.$.votes": -count}},
+            )
+            for (nomination_id, name), count in counts.items()
+        ], ordered=False)
+    if affected:
+        nominations.update_many(
+            {"_id": {"$in": affected}}, {"$set": {"votes_invalidated_at": now, "updated_at": now}}
+        )
+
+    FraudCluster._get_collection().bulk_write([
+        UpdateOne({"_id": cluster.id}, {"$set": {
+            "status": "invalidated", "reviewed_at": now, "invalidated_votes": per_cluster.get(cluster.id, 0),
+        }})
+        for cluster in clusters
+    ], ordered=False)
+    logger.info("Invalidated %d votes from %d clusters", deleted, len(clusters))
+    return len(clusters), deleted
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Find and score suspicious registration clusters.")
+    parser.add_argument("--window", type=int, default=FRAUD_WINDOW_MINUTES, help="Registration window in minutes")
+    parser.add_argument("--min-cluster", type=int, default=FRAUD_MIN_CLUSTER, help="Smallest cluster to score")
+    parser.add_argument("--prefix", type=int, default=FRAUD_PHONE_PREFIX, help="Phone prefix length in digits")
+    parser.add_argument("--lookback", type=int, default=FRAUD_LOOKBACK_DAYS, help="Days of registrations to scan")
+    parser.add_argument("--min-score", type=float, default=FRAUD_MIN_SCORE, help="Lowest score put up for review")
+    args = parser.parse_args()
+
+    from db import close_database, setup_database
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    setup_database()
+    try:
+        analyze(args.window, args.min_cluster, args.prefix, args.lookback, args.min_score)
+    finally:
+        close_database()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+"""
+Live vote counts for the admin dashboard, pushed to browsers over Server-Sent Events.
+"""
+import asyncio
+import json
+import logging
+import threading
+from collections import OrderedDict
+from typing import AsyncIterator, Dict, Iterable, Optional
+
+from anyio import to_thread
+from pymongo.errors import OperationFailure, PyMongoError
+
+from config import LIVE_BUFFER_SIZE, LIVE_HEARTBEAT, LIVE_INTERVAL, LIVE_POLL_INTERVAL
+from database import Nomination
+from db import LIST_READ_PREFERENCE
+
+logger = logging.getLogger("xumotjbot.admin.live")
+
+PROJECTION = {"title": 1, "is_active": 1, "participants.name": 1, "participants.votes": 1}
+# 40573: not a replica set or sharded cluster; 136: change streams not supported by the storage engine.
+CHANGE_STREAMS_UNSUPPORTED = {40573, 136}
+WATCH_RETRY_MAX = 60.0
+
+
+def _summarize(doc: dict) -> dict:
+    participants = {p.get("name"): p.get("votes", 0) for p in doc.get("participants", [])}
+    return {
+        "id": str(doc["_id"]),
+        "title": doc.get("title"),
+        "is_active": doc.get("is_active", True),
+        "participants": participants,
+        "total": sum(participants.values()),
+    }
+
+
+class Subscription:
+    """
+    Pending updates of one connected browser.
+
+    Updates are keyed by nomination, so a burst of votes in one nomination
+    collapses into its latest state. When more than ``limit`` nominations are
+    pending the client is too slow to keep up: the buffer is dropped and the
+    client gets a full snapshot instead.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.pending: "OrderedDict[str, Optional[dict]]" = OrderedDict()
+        self.resync = True
+        self._ready = asyncio.Event()
+
+    def reset(self) -> None:
+        """Drop pending updates and send a full snapshot next."""
+        self.pending.clear()
+        self.resync = True
+        self._ready.set()
+
+    def push(self, key: str, state: Optional[dict]) -> None:
+        if self.resync:
+            return
+        if key not in self.pending and len(self.pending) >= self.limit:
+            self.reset()
+            return
+        self.pending[key] = state
+        self._ready.set()
+
+    async def wait(self, timeout: float) -> bool:
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        self._ready.clear()
+        return True
+
+
+class LiveFeed:
+    """
+    One database consumer shared by every dashboard.
+
+    A MongoDB change stream on ``nominations`` runs in a worker thread and
+    only marks documents dirty. Every ``interval`` seconds the dirty
+    nominations are re-read in a single query and the changed ones are handed
+    to each subscriber. Deployments without change streams (a standalone
+    mongod) poll the collection on ``poll_interval`` instead; other stream
+    errors are retried with backoff. Either way the database sees one
+    consumer per process, however many browsers are connected, and none at
+    all while nobody is watching. Production workers are separate processes,
+    so that is up to ``ADMIN_WORKERS`` consumers.
+    """
+
+    def __init__(self, interval: float, poll_interval: float, buffer_size: int):
+        self.interval = interval
+        self.poll_interval = poll_interval
+        self.buffer_size = buffer_size
+        self.snapshot: Dict[str, dict] = {}
+        self._subscribers: set = set()
+        self._dirty: set = set()
+        self._ready = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._stopped = threading.Event()
+        self._loaded = False
+        self._polling = False
+        self._reload = False
+
+    # -- database side, worker threads ---------------------------------
+
+    def _load(self, ids: Optional[Iterable] = None) -> list:
+        query = {} if ids is None else {"_id": {"$in": list(ids)}}
+        collection = Nomination._get_collection().with_options(read_preference=LIST_READ_PREFERENCE)
+        return list(collection.find(query, PROJECTION))
+
+    def _watch(self, loop: asyncio.AbstractEventLoop, stopped: threading.Event) -> None:
+        collection = Nomination._get_collection()
+        token = None
+        delay = max(self.interval, 1.0)
+        reload = False
+        while not stopped.is_set():
+            try:
+                with collection.watch(resume_after=token, max_await_time_ms=1000) as stream:
+                    delay = max(self.interval, 1.0)
+                    if reload:
+                        # Changes made while the stream was down were not seen.
+                        reload = False
+                        loop.call_soon_threadsafe(self._request_reload)
+                    while not stopped.is_set():
+                        change = stream.try_next()
+                        token = stream.resume_token
+                        if change is not None:
+                            loop.call_soon_threadsafe(self._mark_dirty, change["documentKey"]["_id"])
+            except OperationFailure as e:
+                if e.code in CHANGE_STREAMS_UNSUPPORTED:
+                    logger.info("Change streams unavailable (%s), polling every %ss", e, self.poll_interval)
+                    loop.call_soon_threadsafe(self._start_polling)
+                    return
+                # Auth, permissions, a lost resume point...: start a new stream and reload once it is up.
+                logger.warning("Change stream failed (%s), retrying in %ss", e, delay)
+                token = None
+                reload = True
+                stopped.wait(delay)
+                delay = min(delay * 2, WATCH_RETRY_MAX)
+            except PyMongoError:
+                logger.exception("Change stream failed, resuming in %ss", delay)
+                stopped.wait(delay)
+                delay = min(delay * 2, WATCH_RETRY_MAX)
+
+    # -- event loop side ------------------------------------------------
+
+    def _mark_dirty(self, nomination_id) -> None:
+        self._dirty.add(nomination_id)
+        self._ready.set()
+
+    def _start_polling(self) -> None:
+        self._polling = True
+        self._ready.set()
+
+    def _request_reload(self) -> None:
+        self._reload = True
+        self._ready.set()
+
+    def _publish(self, docs: list, removed: Iterable[str] = ()) -> None:
+        for doc in docs:
+            state = _summarize(doc)
+            if self.snapshot.get(state["id"]) == state:
+                continue
+            self.snapshot[state["id"]] = state
+            for subscription in self._subscribers:
+                subscription.push(state["id"], state)
+        for key in removed:
+            if self.snapshot.pop(key, None) is not None:
+                for subscription in self._subscribers:
+                    subscription.push(key, None)
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        self._stopped = threading.Event()
+        threading.Thread(
+            target=self._watch, args=(loop, self._stopped), name="live-feed", daemon=True
+        ).start()
+        docs = await to_thread.run_sync(self._load)
+        self.snapshot = {}
+        self._publish(docs)
+        self._loaded = True
+        for subscription in self._subscribers:
+            subscription.reset()
+        while True:
+            try:
+                await asyncio.wait_for(self._ready.wait(), self.poll_interval if self._polling else None)
+            except asyncio.TimeoutError:
+                pass
+            self._ready.clear()
+            # Let a burst of changes accumulate before touching the database.
+            await asyncio.sleep(self.interval)
+            try:
+                if self._polling or self._reload:
+                    docs = await to_thread.run_sync(self._load)
+                    self._reload = False
+                    self._dirty.clear()
+                    seen = {str(doc["_id"]) for doc in docs}
+                    self._publish(docs, removed=[key for key in self.snapshot if key not in seen])
+                elif self._dirty:
+                    dirty, self._dirty = self._dirty, set()
+                    docs = await to_thread.run_sync(self._load, dirty)
+                    found = {doc["_id"] for doc in docs}
+                    self._publish(docs, removed=[str(key) for key in dirty if key not in found])
+            except PyMongoError:
+                logger.exception("Failed to refresh live vote counts")
+
+    def subscribe(self) -> Subscription:
+        subscription = Subscription(self.buffer_size)
+        self._subscribers.add(subscription)
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        elif self._loaded:
+            subscription.reset()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self._subscribers.discard(subscription)
+        if not self._subscribers:
+            self._halt()
+
+    def _halt(self) -> Optional[asyncio.Task]:
+        task, self._task = self._task, None
+        self._stopped.set()
+        if task is not None:
+            task.cancel()
+        self._loaded = False
+        self._polling = False
+        self._reload = False
+        self._dirty.clear()
+        return task
+
+    async def stop(self) -> None:
+        """Stop the consumer; the next subscriber starts it again."""
+        task = self._halt()
+        if task is not None:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+            except Exception:
+                logger.exception("Live feed stopped with an error")
+
+    async def stream(self) -> AsyncIterator[str]:
+        """Subscribe and yield SSE frames until the client disconnects."""
+        subscription = self.subscribe()
+        try:
+            yield f"retry: {int(LIVE_HEARTBEAT * 1000)}\n\n"
+            while True:
+                if not await subscription.wait(LIVE_HEARTBEAT):
+                    yield ": keep-alive\n\n"
+                    continue
+                if subscription.resync:
+                    subscription.resync = False
+                    subscription.pending.clear()
+                    payload = list(self.snapshot.values())
+                    yield f"event: snapshot\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+                    continue
+                updates, subscription.pending = subscription.pending, OrderedDict()
+                for key, state in updates.items():
+                    payload = state if state is not None else {"id": key, "deleted": True}
+                    yield f"event: update\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+        finally:
+            self.unsubscribe(subscription)
+
+
+live_feed = LiveFeed(LIVE_INTERVAL, LIVE_POLL_INTERVAL, LIVE_BUFFER_SIZE)
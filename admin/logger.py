@@ -0,0 +1,24 @@
+"""
+Access log sampling for the XumotjBot Admin Panel; setup lives in ``models.logs``.
+"""
+import logging
+import random
+
+
+class AccessLogSampler(logging.Filter):
+    """
+    Keep a ``rate`` share of uvicorn access log lines for successful requests.
+
+    Client and server errors (status 400 and above) are always kept.
+    """
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        # uvicorn.access args: (client, method, path, http_version, status_code)
+        args = record.args if isinstance(record.args, tuple) else ()
+        if len(args) == 5 and isinstance(args[4], int) and args[4] >= 400:
+            return True
+        return random.random() < self.rate
@@ -0,0 +1,201 @@
+"""
+Keyset pagination, cached counts and secondary reads for admin list views.
+"""
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+from anyio import to_thread
+from starlette.requests import Request
+from starlette_admin.contrib.mongoengine.helpers import build_order_clauses
+
+from config import COUNT_CACHE_TTL, KEYSET_BOUNDARY_TTL
+from db import LIST_READ_PREFERENCE
+
+logger = logging.getLogger("xumotjbot.admin.pagination")
+
+MAX_BOUNDARIES = 1000
+MAX_CACHED_COUNTS = 500
+
+
+class ListReadMixin:
+    """Run list page and total queries with ``LIST_READ_PREFERENCE``."""
+
+    def list_queryset(self, query=None):
+        queryset = self.document.objects if query is None else self.document.objects(query)
+        return queryset.read_preference(LIST_READ_PREFERENCE)
+
+    def list_collection(self):
+        return self.document._get_collection().with_options(read_preference=LIST_READ_PREFERENCE)
+
+    async def find_all(
+        self,
+        request: Request,
+        skip: int = 0,
+        limit: int = 100,
+        where: Union[Dict[str, Any], str, None] = None,
+        order_by: Optional[List[str]] = None,
+    ) -> Sequence[Any]:
+        query = await self._build_query(request, where)
+        objs = self.list_queryset(query).order_by(*build_order_clauses(order_by or []))
+        if limit > 0:
+            return objs[skip:skip + limit]
+        return objs[skip:]
+
+    async def count(
+        self,
+        request: Request,
+        where: Union[Dict[str, Any], str, None] = None,
+    ) -> int:
+        query = await self._build_query(request, where)
+        return self.list_queryset(query).count()
+
+
+class KeysetPaginationMixin(ListReadMixin):
+    """
+    Serve unfiltered list pages with keyset (cursor) queries instead of skip/limit.
+
+    The list UI still asks for ``skip`` offsets, so every page remembers the
+    ``(keyset_field, _id)`` of its last row as the boundary for the page after
+    it. Moving to the next page is then a range query on the compound
+    ``(keyset_field, _id)`` index. A jump to an unknown offset walks that
+    index once, reading only index keys, to find its boundary.
+
+    Filtered or searched lists and other sort orders fall back to the default
+    implementation. Totals come from ``estimated_document_count`` for the full
+    collection and from a per-filter cache refreshed in the background otherwise.
+    """
+
+    keyset_field: str = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._boundaries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._counts: Dict[str, tuple] = {}
+        self._refreshing: set = set()
+
+    def _keyset_direction(self, where, order_by: Optional[List[str]]) -> Optional[int]:
+        if where or not self.keyset_field:
+            return None
+        if not order_by:
+            ordering = self.document._meta.get("ordering") or []
+            if ordering == [f"-{self.keyset_field}"]:
+                return -1
+            if ordering == [self.keyset_field]:
+                return 1
+            return None
+        if len(order_by) != 1:
+            return None
+        field, _, order = order_by[0].strip().partition(" ")
+        if field != self.keyset_field:
+            return None
+        return -1 if order.strip().lower() == "desc" else 1
+
+    def _keyset_query(self, direction: int, boundary: tuple = None):
+        sign = "-" if direction < 0 else "+"
+        queryset = self.list_queryset()
+        if boundary is not None:
+            value, pk = boundary
+            op = "$lt" if direction < 0 else "$gt"
+            queryset = queryset(__raw__={"$or": [
+                {self.keyset_field: {op: value}},
+                {self.keyset_field: value, "_id": {op: pk}},
+            ]})
+        return queryset.order_by(f"{sign}{self.keyset_field}", f"{sign}id")
+
+    def _find_boundary(self, direction: int, skip: int) -> Optional[tuple]:
+        """Read the sort key of row ``skip - 1`` straight from the index."""
+        collection = self.list_collection()
+        cursor = (
+            collection.find({}, {self.keyset_field: 1})
+            .sort([(self.keyset_field, direction), ("_id", direction)])
+            .skip(skip - 1)
+            .limit(1)
+        )
+        for doc in cursor:
+            return doc.get(self.keyset_field), doc["_id"]
+        return None
+
+    def _cached_boundary(self, direction: int, skip: int) -> Optional[tuple]:
+        entry = self._boundaries.get((direction, skip))
+        if entry is None:
+            return None
+        boundary, stored_at = entry
+        if time.monotonic() - stored_at > KEYSET_BOUNDARY_TTL:
+            del self._boundaries[(direction, skip)]
+            return None
+        self._boundaries.move_to_end((direction, skip))
+        return boundary
+
+    def _remember_boundary(self, direction: int, skip: int, obj: Any) -> None:
+        boundary = (getattr(obj, self.keyset_field), obj.pk)
+        self._boundaries[(direction, skip)] = (boundary, time.monotonic())
+        self._boundaries.move_to_end((direction, skip))
+        while len(self._boundaries) > MAX_BOUNDARIES:
+            self._boundaries.popitem(last=False)
+
+    def _keyset_page(self, direction: int, skip: int, limit: int) -> list:
+        boundary = None
+        if skip > 0:
+            boundary = self._cached_boundary(direction, skip) or self._find_boundary(direction, skip)
+            if boundary is None:
+                return []
+        items = list(self._keyset_query(direction, boundary).limit(limit))
+        if items:
+            self._remember_boundary(direction, skip + len(items), items[-1])
+        return items
+
+    async def find_all(
+        self,
+        request: Request,
+        skip: int = 0,
+        limit: int = 100,
+        where: Union[Dict[str, Any], str, None] = None,
+        order_by: Optional[List[str]] = None,
+    ) -> Sequence[Any]:
+        direction = self._keyset_direction(where, order_by)
+        if direction is None or limit <= 0:
+            return await super().find_all(request, skip, limit, where, order_by)
+        return await to_thread.run_sync(self._keyset_page, direction, skip, limit)
+
+    def _exact_count(self, key: str, query) -> int:
+        try:
+            value = self.list_queryset(query).count()
+            self._counts.pop(key, None)
+            self._counts[key] = (value, time.monotonic())
+            while len(self._counts) > MAX_CACHED_COUNTS:
+                self._counts.pop(next(iter(self._counts)))
+            return value
+        finally:
+            self._refreshing.discard(key)
+
+    async def _refresh_count(self, key: str, query) -> None:
+        try:
+            await to_thread.run_sync(self._exact_count, key, query)
+        except Exception:
+            logger.exception("Failed to refresh count for %s", self.document.__name__)
+
+    async def count(
+        self,
+        request: Request,
+        where: Union[Dict[str, Any], str, None] = None,
+    ) -> int:
+        if not where:
+            return await to_thread.run_sync(self.list_collection().estimated_document_count)
+
+        key = json.dumps(where, sort_keys=True, default=str)
+        query = await self._build_query(request, where)
+        cached = self._counts.get(key)
+        if cached is None:
+            self._refreshing.add(key)
+            return await to_thread.run_sync(self._exact_count, key, query)
+
+        value, stored_at = cached
+        if time.monotonic() - stored_at > COUNT_CACHE_TTL and key not in self._refreshing:
+            # Serve the stale total now and recount in the background.
+            self._refreshing.add(key)
+            asyncio.create_task(self._refresh_count(key, query))
+        return value
@@ -0,0 +1,46 @@
+"""
+HTTP tuning used when the admin panel runs with ADMIN_ENV=production.
+"""
+import os
+
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.responses import Response
+from starlette.staticfiles import StaticFiles
+from starlette.types import Receive, Scope, Send
+
+
+class StreamingAwareGZipMiddleware(GZipMiddleware):
+    """
+    Gzip responses except Server-Sent Events.
+
+    GZipMiddleware keeps streamed chunks in the compressor until it has
+    enough data, which would hold back live dashboard events indefinitely.
+    EventSource always sends ``Accept: text/event-stream``, so those requests
+    bypass compression.
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and "text/event-stream" in Headers(scope=scope).get("accept", ""):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+
+class CachedStaticFiles(StaticFiles):
+    """StaticFiles that lets browsers and proxies keep assets for ``max_age`` seconds."""
+
+    def __init__(self, *args, max_age: int = 604800, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_age = max_age
+
+    def file_response(
+        self,
+        full_path: os.PathLike,
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        response.headers["Cache-Control"] = f"public, max-age={self.max_age}"
+        return response
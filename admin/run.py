@@ -1,36 +1,61 @@
 """
 Enhanced server runner with error handling for the XumotjBot Admin Panel.
 """
-import logging
 import os
 import sys
 import traceback
 import uvicorn
-from admin import app, logger
-from config import HOST, PORT
+from admin import logger
+from config import FORWARDED_ALLOW_IPS, HOST, PORT, LOG_LEVELS, PRODUCTION, SECRET_KEY_CONFIGURED, WORKERS
+from models.logs import setup_logging
 
 def configure_logging():
     """Configure more detailed logging for troubleshooting."""
-    # Configure root logger to show all messages
-    root_logger = logging.getLogger()
-    root_logger.setLevel(logging.DEBUG)
-    
-    # Add stream handler if not already present
-    if not root_logger.handlers:
-        handler = logging.StreamHandler(sys.stdout)
-        handler.setFormatter(logging.Formatter(
-            '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-        ))
-        root_logger.addHandler(handler)
-    
-    # Enable more verbose logging for relevant modules
-    logging.getLogger('starlette').setLevel(logging.DEBUG)
-    logging.getLogger('uvicorn').setLevel(logging.INFO)
-    logging.getLogger('starlette_admin').setLevel(logging.DEBUG)
+    # Show all messages, with more verbose logging for relevant modules
+    setup_logging("DEBUG", {
+        "starlette": "DEBUG",
+        "uvicorn": "INFO",
+        "starlette_admin": "DEBUG",
+        **LOG_LEVELS,
+    })
+
+def run_production():
+    """
+    Serve with several worker processes, uvloop and httptools, without reloading.
+
+    Each worker is a separate process with its own live results feed, so the
+    database sees one change stream (or poller) per worker with dashboards open.
+    Workers only share sessions with a configured ``SECRET_KEY``; without one
+    more than a single worker refuses to start.
+    """
+    if WORKERS > 1 and not SECRET_KEY_CONFIGURED:
+        logger.critical(
+            f"SECRET_KEY is not set: each of the {WORKERS} workers would sign sessions with its own "
+            "random key, breaking logins and CSRF checks. Set SECRET_KEY or ADMIN_WORKERS=1."
+        )
+        sys.exit(1)
+    logger.info(f"Starting admin server at http://{HOST}:{PORT}/admin with {WORKERS} workers")
+    uvicorn.run(
+        "admin:app",
+        host=HOST,
+        port=PORT,
+        workers=WORKERS,
+        loop="uvloop",
+        http="httptools",
+        log_level="info",
+        log_config=None,  # Workers import admin.py, which sets up logging and access log sampling
+        proxy_headers=True,
+        forwarded_allow_ips=FORWARDED_ALLOW_IPS,
+        timeout_keep_alive=30,
+    )
 
 def run_server():
     """Start the admin server with enhanced error handling."""
     try:
+        if PRODUCTION:
+            run_production()
+            return
+
         # Configure detailed logging
         configure_logging()
         
@@ -44,7 +69,8 @@ def run_server():
             host=HOST, 
             port=PORT, 
             reload=True,  # Enable hot reloading
-            log_level="debug"
+            log_level="debug",
+            log_config=None,  # Keep uvicorn logs on the queue-based handler
         )
     except Exception as e:
         logger.critical(f"Server failed to start: {e}")
@@ -1,30 +1,113 @@
 """
 Admin UI views for XumotjBot Admin Panel.
 """
+from datetime import datetime, timezone
+from typing import Any, List
+
+from anyio import to_thread
+from starlette.requests import Request
+from starlette.responses import Response, StreamingResponse
+from starlette.templating import Jinja2Templates
+from starlette_admin import CustomView, action
 from starlette_admin.contrib.mongoengine import ModelView
-from database import Nomination, User, Vote
+from starlette_admin.exceptions import ActionFailed
+from database import FraudCluster
+from fraud import invalidate
+from live import live_feed
+from pagination import KeysetPaginationMixin, ListReadMixin
 
 
-class NominationView(ModelView):
+class NominationView(ListReadMixin, ModelView):
     """Enhanced view for Nomination model with participant information."""
-    list_display = ["title", "description", "is_active", "created_at", "updated_at"]
+    list_display = ["title", "description", "is_active", "opens_at", "closes_at", "created_at", "updated_at"]
     search_fields = ["title", "description"]
-    sortable_fields = ["title", "is_active", "created_at", "updated_at"]
-    filters = ["is_active", "created_at", "updated_at"]
+    sortable_fields = ["title", "is_active", "opens_at", "closes_at", "created_at", "updated_at"]
+    filters = ["is_active", "opens_at", "closes_at", "created_at", "updated_at"]
+    readonly_fields = ["votes_archived_at", "archived_votes", "votes_invalidated_at"]
 
 
-class UserView(ModelView):
+class UserView(KeysetPaginationMixin, ModelView):
     """View for managing Telegram users."""
-    list_display = ["user_id", "fullname", "username", "input_fullname", "input_phone", "created_at"]
+    keyset_field = "created_at"
+    fields_default_sort = [("created_at", True)]
+    list_display = [
+        "user_id", "fullname", "username", "input_fullname", "input_phone", "is_blocked", "last_active_at", "created_at",
+    ]
     search_fields = ["fullname", "username", "input_fullname", "input_phone"]
-    sortable_fields = ["user_id", "fullname", "created_at", "updated_at"]
-    filters = ["created_at", "updated_at"]
-    readonly_fields = ["user_id", "created_at", "updated_at"]
+    sortable_fields = ["user_id", "fullname", "last_delivery_at", "last_active_at", "created_at", "updated_at"]
+    filters = ["is_blocked", "is_deactivated", "last_active_at", "created_at", "updated_at"]
+    readonly_fields = [
+        "user_id", "is_blocked", "is_deactivated", "last_delivery_at", "delivery_failures", "last_active_at",
+        "created_at", "updated_at",
+    ]
 
 
-class VoteView(ModelView):
+class VoteView(KeysetPaginationMixin, ModelView):
     """View for monitoring voting activity."""
+    keyset_field = "voted_at"
+    fields_default_sort = [("voted_at", True)]
     list_display = ["user", "nomination", "participant_name", "voted_at"]
     search_fields = ["participant_name"]
     sortable_fields = ["voted_at"]
     filters = ["nomination", "voted_at"]
+
+
+class FraudClusterView(ModelView):
+    """Review list of suspicious registration clusters found by ``fraud.py``."""
+    list_display = [
+        "score", "status", "window_start", "phone_prefix", "user_count", "voter_count", "vote_count",
+        "left_count", "targets", "invalidated_votes",
+    ]
+    exclude_fields_from_list = ["user_ids"]
+    sortable_fields = ["score", "window_start", "user_count", "vote_count", "detected_at"]
+    filters = ["status", "window_start", "detected_at"]
+    fields_default_sort = [("score", True)]
+    actions = ["confirm", "dismiss", "invalidate"]
+
+    def can_create(self, request: Request) -> bool:
+        return False
+
+    def can_edit(self, request: Request) -> bool:
+        return False
+
+    def _review(self, pks: List[Any], status: str) -> int:
+        return FraudCluster.objects(id__in=pks, status__in=["pending", "confirmed", "dismissed"]).update(
+            set__status=status, set__reviewed_at=datetime.now(timezone.utc),
+        )
+
+    @action(name="confirm", text="Confirm as fraud", confirmation="Mark the selected clusters as vote farms?",
+            submit_btn_class="btn-warning")
+    async def confirm_action(self, request: Request, pks: List[Any]) -> str:
+        updated = await to_thread.run_sync(self._review, pks, "confirmed")
+        return f"{updated} clusters confirmed; invalidate them to remove their votes"
+
+    @action(name="dismiss", text="Dismiss", confirmation="Mark the selected clusters as legitimate?")
+    async def dismiss_action(self, request: Request, pks: List[Any]) -> str:
+        updated = await to_thread.run_sync(self._review, pks, "dismissed")
+        return f"{updated} clusters dismissed"
+
+    @action(
+        name="invalidate",
+        text="Invalidate votes",
+        confirmation="Delete every vote of the selected confirmed clusters and lower the participants' counts?",
+        submit_btn_class="btn-danger",
+    )
+    async def invalidate_action(self, request: Request, pks: List[Any]) -> str:
+        clusters, votes = await to_thread.run_sync(invalidate, pks)
+        if not clusters:
+            raise ActionFailed("Only confirmed clusters can be invalidated")
+        return f"Invalidated {votes} votes from {clusters} clusters"
+
+
+class LiveStreamView(CustomView):
+    """Server-Sent Events stream of vote counts behind the live dashboard."""
+
+    def __init__(self):
+        super().__init__(label="Live stream", path="/live/stream", name="live-stream", add_to_menu=False)
+
+    async def render(self, request: Request, templates: Jinja2Templates) -> Response:
+        return StreamingResponse(
+            live_feed.stream(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
@@ -5,26 +5,17 @@ set -e
 
 # Configuration
 BACKUP_DIR="./backups"
-TIMESTAMP=$(date +"%Y%m%d_%H%M%S")
-BACKUP_FILENAME="xumotjbot_backup_${TIMESTAMP}.gz"
 
 # Create backup directory if it doesn't exist
 mkdir -p "${BACKUP_DIR}"
 
 echo "📦 Creating MongoDB backup..."
 
-# Backup MongoDB data
-docker-compose exec -T mongodb mongodump --archive --gzip --db xumotjbot > "${BACKUP_DIR}/${BACKUP_FILENAME}"
+# Run scripts/backup.py in the bot image (it already has pymongo) on the compose network.
+# Extra arguments are passed through, e.g. ./backup.sh --incremental --max-rate 10
+docker-compose run --rm -T \
+  -v "$(pwd)/scripts:/scripts:ro" \
+  -v "$(pwd)/${BACKUP_DIR}:/backups" \
+  bot python /scripts/backup.py --output /backups backup --keep 10 "$@"
 
-# Check if backup was successful
-if [ $? -eq 0 ]; then
-  echo "✅ Backup created successfully: ${BACKUP_DIR}/${BACKUP_FILENAME}"
-  
-  # Clean up old backups (keep last 10)
-  echo "🧹 Cleaning up old backups..."
-  ls -t "${BACKUP_DIR}"/*.gz | tail -n +11 | xargs -r rm
-  echo "✅ Backup process completed!"
-else
-  echo "❌ Error: Backup failed."
-  exit 1
-fi
+echo "✅ Backup process completed!"
@@ -1,57 +1,188 @@
 import logging
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, fields
 
 from environs import Env
+from models.mongo import client_options
 
 env = Env()
-env.read_env()
 
 
 @dataclass
 class BotConfig:
     """Bot configuration."""
-    token: str = env.str("TELEGRAM_TOKEN")
+    token: str = field(default_factory=lambda: env.str("TELEGRAM_TOKEN"))
     admins: list = field(default_factory=lambda: env.list("ADMIN_IDS"))
-    debug: bool = env.bool("DEBUG", False)
-    channel_id: str = env.str("CHANNEL_ID")
+    debug: bool = field(default_factory=lambda: env.bool("DEBUG", False))
+    channel_id: str = field(default_factory=lambda: env.str("CHANNEL_ID"))
+    shutdown_timeout: float = field(default_factory=lambda: env.float("SHUTDOWN_TIMEOUT", 10.0))
+    broadcast_unreachable: bool = field(default_factory=lambda: env.bool("BROADCAST_UNREACHABLE", False))
+    participants_page_size: int = field(default_factory=lambda: env.int("PARTICIPANTS_PAGE_SIZE", 10))
+    inline_index_interval: float = field(default_factory=lambda: env.float("INLINE_INDEX_INTERVAL", 15.0))
+    inline_cache_time: int = field(default_factory=lambda: env.int("INLINE_CACHE_TIME", 10))
+    activity_flush_interval: float = field(default_factory=lambda: env.float("ACTIVITY_FLUSH_INTERVAL", 30.0))
+    activity_min_interval: float = field(default_factory=lambda: env.float("ACTIVITY_MIN_INTERVAL", 300.0))
+    maintenance_interval: float = field(default_factory=lambda: env.float("MAINTENANCE_INTERVAL", 600.0))
+    fsm_state_ttl: float = field(default_factory=lambda: env.float("FSM_STATE_TTL", 86400.0))
+    voter_check_ttl: float = field(default_factory=lambda: env.float("VOTER_CHECK_TTL", 300.0))
 
 
 @dataclass
 class MongoDBConfig:
     """MongoDB configuration."""
-    host: str = env.str("MONGODB_HOST", "localhost")
-    port: int = env.int("MONGODB_PORT", 27017)
-    username: str = env.str("MONGODB_USERNAME", "")
-    password: str = env.str("MONGODB_PASSWORD", "")
-    database: str = env.str("MONGODB_DATABASE", "xumotjbot")
+    # A full connection string wins over the separate host/port/credentials
+    mongo_uri: str = field(default_factory=lambda: env.str("MONGO_URI", ""))
+    host: str = field(default_factory=lambda: env.str("MONGODB_HOST", "localhost"))
+    port: int = field(default_factory=lambda: env.int("MONGODB_PORT", 27017))
+    username: str = field(default_factory=lambda: env.str("MONGODB_USERNAME", ""))
+    password: str = field(default_factory=lambda: env.str("MONGODB_PASSWORD", ""))
+    database: str = field(default_factory=lambda: env.str("MONGODB_DATABASE", "xumotjbot"))
+    max_pool_size: int = field(default_factory=lambda: env.int("MONGODB_MAX_POOL_SIZE", 100))
+    min_pool_size: int = field(default_factory=lambda: env.int("MONGODB_MIN_POOL_SIZE", 0))
+    connect_timeout_ms: int = field(default_factory=lambda: env.int("MONGODB_CONNECT_TIMEOUT_MS", 10000))
+    server_selection_timeout_ms: int = field(
+        default_factory=lambda: env.int("MONGODB_SERVER_SELECTION_TIMEOUT_MS", 30000)
+    )
+    socket_timeout_ms: int = field(default_factory=lambda: env.int("MONGODB_SOCKET_TIMEOUT_MS", 0))
+    compressors: list = field(default_factory=lambda: env.list("MONGODB_COMPRESSORS", []))
+    read_preference: str = field(default_factory=lambda: env.str("MONGODB_READ_PREFERENCE", "primary"))
+    max_staleness: int = field(default_factory=lambda: env.int("MONGODB_MAX_STALENESS", -1))
+    write_concern: str = field(default_factory=lambda: env.str("MONGODB_WRITE_CONCERN", ""))
+    write_timeout_ms: int = field(default_factory=lambda: env.int("MONGODB_WRITE_TIMEOUT_MS", 0))
+    nominations_ttl: float = field(default_factory=lambda: env.float("NOMINATIONS_CACHE_TTL", 30.0))
+    vote_map_size: int = field(default_factory=lambda: env.int("VOTE_MAP_CACHE_SIZE", 50000))
+    vote_map_ttl: float = field(default_factory=lambda: env.float("VOTE_MAP_CACHE_TTL", 600.0))
+    op_timeout: float = field(default_factory=lambda: env.float("MONGODB_OP_TIMEOUT", 5.0))
+    retries: int = field(default_factory=lambda: env.int("MONGODB_RETRIES", 2))
+    retry_backoff: float = field(default_factory=lambda: env.float("MONGODB_RETRY_BACKOFF", 0.1))
+    breaker_threshold: int = field(default_factory=lambda: env.int("MONGODB_BREAKER_THRESHOLD", 5))
+    breaker_reset: float = field(default_factory=lambda: env.float("MONGODB_BREAKER_RESET", 10.0))
     
     @property
     def uri(self):
         """Generate MongoDB URI from components or use direct URI if provided"""
-        if env.str("MONGO_URI", ""):
-            return env.str("MONGO_URI")
+        if self.mongo_uri:
+            return self.mongo_uri
         
         auth = f"{self.username}:{self.password}@" if self.username and self.password else ""
         return f"mongodb://{auth}{self.host}:{self.port}/{self.database}"
 
+    @property
+    def client_options(self) -> dict:
+        return client_options(
+            self.max_pool_size, self.min_pool_size, self.connect_timeout_ms, self.server_selection_timeout_ms,
+            self.socket_timeout_ms, ",".join(self.compressors), self.write_concern, self.write_timeout_ms,
+        )
+
 
 @dataclass
 class AdminConfig:
     """Admin panel configuration."""
-    username: str = env.str("ADMIN_USERNAME", "admin")
-    password: str = env.str("ADMIN_PASSWORD", "admin")
-    secret_key: str = env.str("SECRET_KEY", "default_secret_key")
-    host: str = env.str("HOST", "127.0.0.1")
-    port: int = env.int("PORT", 8000)
-    base_url: str = env.str("ADMIN_BASE_URL", "/admin")
+    username: str = field(default_factory=lambda: env.str("ADMIN_USERNAME", "admin"))
+    password: str = field(default_factory=lambda: env.str("ADMIN_PASSWORD", "admin"))
+    secret_key: str = field(default_factory=lambda: env.str("SECRET_KEY", "default_secret_key"))
+    host: str = field(default_factory=lambda: env.str("HOST", "127.0.0.1"))
+    port: int = field(default_factory=lambda: env.int("PORT", 8000))
+    base_url: str = field(default_factory=lambda: env.str("ADMIN_BASE_URL", "/admin"))
+
+
+@dataclass
+class RecorderConfig:
+    """Update recorder configuration."""
+    enabled: bool = field(default_factory=lambda: env.bool("RECORD_UPDATES", False))
+    path: str = field(default_factory=lambda: env.str("RECORD_UPDATES_PATH", "recordings/updates.jsonl.gz"))
+    salt: str = field(default_factory=lambda: env.str("RECORD_UPDATES_SALT", ""))
+
+
+@dataclass
+class DiagnosticsConfig:
+    """Event-loop lag monitor and profiler configuration."""
+    enabled: bool = field(default_factory=lambda: env.bool("DIAGNOSTICS", True))
+    lag_interval: float = field(default_factory=lambda: env.float("LOOP_LAG_INTERVAL", 0.5))
+    lag_threshold: float = field(default_factory=lambda: env.float("LOOP_LAG_THRESHOLD", 0.1))
+    slow_threshold: float = field(default_factory=lambda: env.float("SLOW_CALL_THRESHOLD", 1.0))
+    profile_dir: str = field(default_factory=lambda: env.str("PROFILE_DIR", "profiles"))
+    profile_interval: float = field(default_factory=lambda: env.float("PROFILE_INTERVAL", 0.005))
+    profile_duration: int = field(default_factory=lambda: env.int("PROFILE_DURATION", 30))
+
+
+@dataclass
+class LoggingConfig:
+    """Logging configuration."""
+    level: str = field(default_factory=lambda: env.str("LOG_LEVEL", "DEBUG" if env.bool("DEBUG", False) else "INFO"))
+    levels: dict = field(default_factory=lambda: env.dict("LOG_LEVELS", {"aiogram.event": "WARNING"}))
+    summary_every: int = field(default_factory=lambda: env.int("LOG_SUMMARY_EVERY", 1000))
+
+
+@dataclass
+class ResultsConfig:
+    """Live results publisher configuration."""
+    enabled: bool = field(default_factory=lambda: env.bool("RESULTS_PUBLISH", False))
+    chat_id: str = field(default_factory=lambda: env.str("RESULTS_CHAT_ID", "") or env.str("CHANNEL_ID"))
+    interval: float = field(default_factory=lambda: env.float("RESULTS_INTERVAL", 5.0))
+    refresh: float = field(default_factory=lambda: env.float("RESULTS_REFRESH", 60.0))
+    per_nomination: bool = field(default_factory=lambda: env.bool("RESULTS_PER_NOMINATION", False))
+    top: int = field(default_factory=lambda: env.int("RESULTS_TOP", 5))
+
+
+@dataclass
+class TenantsConfig:
+    """Multi-tenant mode: extra contest bots served by this process."""
+    enabled: bool = field(default_factory=lambda: env.bool("TENANTS_ENABLED", False))
+    refresh: float = field(default_factory=lambda: env.float("TENANTS_REFRESH", 60.0))
+    polling_timeout: int = field(default_factory=lambda: env.int("TENANTS_POLLING_TIMEOUT", 30))
+
+
+@dataclass
+class AdmissionConfig:
+    """Handler concurrency limits and load shedding."""
+    enabled: bool = field(default_factory=lambda: env.bool("ADMISSION_CONTROL", True))
+    concurrency: int = field(default_factory=lambda: env.int("ADMISSION_CONCURRENCY", 64))
+    limits: dict = field(default_factory=lambda: env.dict(
+        "ADMISSION_LIMITS", {"vote": 64, "registration": 16, "broadcast": 1}, subcast_values=int
+    ))
+    max_queue: int = field(default_factory=lambda: env.int("ADMISSION_MAX_QUEUE", 500))
+    queue_timeout: float = field(default_factory=lambda: env.float("ADMISSION_QUEUE_TIMEOUT", 10.0))
 
 
 @dataclass
 class Configuration:
     """All in one configuration's class."""
-    bot = BotConfig()
-    db = MongoDBConfig()
-    admin = AdminConfig()
+    bot: BotConfig = field(default_factory=BotConfig)
+    db: MongoDBConfig = field(default_factory=MongoDBConfig)
+    admin: AdminConfig = field(default_factory=AdminConfig)
+    recorder: RecorderConfig = field(default_factory=RecorderConfig)
+    diagnostics: DiagnosticsConfig = field(default_factory=DiagnosticsConfig)
+    logging: LoggingConfig = field(default_factory=LoggingConfig)
+    results: ResultsConfig = field(default_factory=ResultsConfig)
+    tenants: TenantsConfig = field(default_factory=TenantsConfig)
+    admission: AdmissionConfig = field(default_factory=AdmissionConfig)
+
+
+_loaded: Configuration | None = None
+
+
+def load_configuration(**sections: dict) -> Configuration:
+    """
+    Read the environment (and ``.env``) into the configuration ``conf`` serves.
+
+    Keyword arguments override fields per section, e.g.
+    ``load_configuration(db={"database": "scratch"})``; other fields still come
+    from the environment. Modules read ``conf`` when first used, many of them
+    at import, so tools call this before importing the bot's modules. Without
+    a call the environment is loaded on first use.
+    """
+    global _loaded
+    env.read_env()
+    section_types = {section.name: section.default_factory for section in fields(Configuration)}
+    _loaded = Configuration(**{name: section_types[name](**values) for name, values in sections.items()})
+    return _loaded
+
+
+class _Configuration:
+    """Stands in for the loaded :class:`Configuration` until it exists."""
+
+    def __getattr__(self, name):
+        return getattr(_loaded or load_configuration(), name)
 
 
-conf = Configuration()
\ No newline at end of file
+conf = _Configuration()
\ No newline at end of file
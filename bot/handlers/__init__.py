@@ -1,6 +1,28 @@
 from handlers.common import start_router
+from handlers.diagnostics import diagnostics_router
+from handlers.errors import errors_router
+from handlers.inline import inline_router
+from handlers.membership import membership_router
 from handlers.registration import register_router
 from handlers.broadcast import broadcast_router
 from handlers.nomination import router as nomination_router
 
-routers = (start_router, register_router, broadcast_router, nomination_router)
\ No newline at end of file
+routers = (
+    errors_router,
+    membership_router,
+    start_router,
+    diagnostics_router,
+    register_router,
+    broadcast_router,
+    nomination_router,
+    inline_router,
+)
+
+# Admission class of each router's handlers (see structures.admission); other routers are not queued.
+admission_classes = (
+    (nomination_router, "vote"),
+    (inline_router, "vote"),
+    (start_router, "registration"),
+    (register_router, "registration"),
+    (broadcast_router, "broadcast"),
+)
\ No newline at end of file
@@ -1,7 +1,8 @@
 from aiogram import Router, types, Bot
+from configuration import conf
 from structures.states import BroadcastState
 from structures.database import db
-from structures.broadcaster import copy_message
+from structures.broadcaster import copy_message, deliveries, ledger
 from aiogram.fsm.context import FSMContext
 
 
@@ -14,9 +15,11 @@ async def broadcast_command(message: types.Message, state: FSMContext, bot: Bot)
     text = message.text
     sended = blocked = 0
     await message.answer(text=f"🚀 Xabar yuborilmoqda...")
-    for user in await db.users_list():
+    include_unreachable = conf.bot.broadcast_unreachable
+    skipped = 0 if include_unreachable else await db.count_unreachable()
+    for user_id in await db.broadcast_targets(include_unreachable=include_unreachable):
         is_sended = await copy_message(
-            user_id=user["user_id"],
+            user_id=user_id,
             chat_id=message.chat.id,
             message_id=message.message_id,
             keyboard=message.reply_markup,
@@ -26,11 +29,14 @@ async def broadcast_command(message: types.Message, state: FSMContext, bot: Bot)
             blocked += 1
         else:
             sended += 1
+    deliveries.flush()
+    await ledger.flush()
 
     text = (
         f"<b>Xabar muvaffaqiyatli yuborildi!</b>\n\n"
         f"<b>🟢 Yuborilganlar soni:</b> {sended}\n"
-        f"<b>🔴 Yuborilmaganlar soni:</b> {blocked}"
+        f"<b>🔴 Yuborilmaganlar soni:</b> {blocked}\n"
+        f"<b>⚪️ O'tkazib yuborilganlar (bloklagan yoki o'chirilgan):</b> {skipped}"
     )
     await message.answer(text=text)
     return await state.clear()
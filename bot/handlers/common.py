@@ -4,6 +4,7 @@ from aiogram.fsm.context import FSMContext
 from keyboards.common_kb import contact_kb, remove_kb
 from structures.database import db
 from structures.states import RegState, BroadcastState
+from structures.tenancy import current_tenant
 from structures.subscription_checking import check_subscription, send_subscription_prompt
 from handlers.nomination import show_nominations_markup
 
@@ -22,12 +23,12 @@ async def start_command(
 
     user_info = await db.user_update(user_id=message.from_user.id, data=user_data)
 
-    if user_info.get("input_fullname") is None:
+    if user_info.input_fullname is None:
         text = "📝 Botdan to'liq foydalanish uchun avval ro'yxatdan o'tishingiz kerak. Iltimos, ism va familiyangizni kiriting:"
         await message.answer(text=text, reply_markup=remove_kb())
         return await state.set_state(RegState.fullname)
 
-    if user_info.get("input_phone") is None:
+    if user_info.input_phone is None:
         text = "📞 Iltimos, telefon raqamingizni kiriting. Biz siz bilan bog'lanishimiz uchun bu muhim!"
         await message.answer(text=text, reply_markup=contact_kb())
         return await state.set_state(RegState.phone_number)
@@ -36,7 +37,7 @@ async def start_command(
         await send_subscription_prompt(message, bot)
         return
 
-    await show_nominations_markup(message)
+    await show_nominations_markup(message, message.from_user.id)
 
 
 @start_router.callback_query(F.data == "check_subscription")
@@ -44,7 +45,7 @@ async def check_subscription_handler(callback: types.CallbackQuery, state: FSMCo
     if await check_subscription(bot, callback.from_user.id):
         await callback.message.edit_text("✅ Tabriklaymiz! Obunangiz muvaffaqiyatli tasdiqlandi!")
 
-        await show_nominations_markup(callback.message)
+        await show_nominations_markup(callback.message, callback.from_user.id)
     else:
         await callback.answer("❌ Afsuski, siz hali ham kanalga obuna bo'lmagansiz. Iltimos, obuna bo'lib yana bir bor urinib ko'ring!", show_alert=True)
 
@@ -52,6 +53,8 @@ async def check_subscription_handler(callback: types.CallbackQuery, state: FSMCo
 
 @start_router.message(Command("broadcast"))
 async def broadcast_command(message: types.Message, state: FSMContext):
+    if str(message.from_user.id) not in current_tenant.get().admins:
+        return
     text = "Xabar matnini kiriting:"
     await message.answer(text=text)
     return await state.set_state(BroadcastState.broadcast)
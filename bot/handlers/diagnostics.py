@@ -0,0 +1,35 @@
+from aiogram import Router, types
+from aiogram.filters import Command, CommandObject
+from aiogram.types import FSInputFile
+from configuration import conf
+from structures.diagnostics import diagnostics
+from structures.tenancy import current_tenant
+
+diagnostics_router = Router()
+
+MAX_PROFILE_SECONDS = 300
+
+
+@diagnostics_router.message(Command("profile"))
+async def profile_command(message: types.Message, command: CommandObject):
+    """Capture a sampled profile of the running bot and send it to the admin."""
+    if str(message.from_user.id) not in current_tenant.get().admins:
+        return
+
+    if diagnostics.profiler.running:
+        return await message.answer("⏳ Profil allaqachon yozilmoqda, biroz kuting.")
+
+    seconds = conf.diagnostics.profile_duration
+    if command.args and command.args.strip().isdigit():
+        seconds = min(int(command.args.strip()), MAX_PROFILE_SECONDS)
+
+    lag = diagnostics.lag.stats()
+    await message.answer(
+        f"⏱ {seconds} soniya davomida profil yozilmoqda...\n\n"
+        f"<b>Event loop kechikishi:</b> oxirgi {lag['last_lag_ms']} ms, "
+        f"o'rtacha {lag['avg_lag_ms']} ms, maksimal {lag['max_lag_ms']} ms"
+    )
+    path = await diagnostics.profiler.capture(seconds)
+    await message.answer_document(
+        FSInputFile(path), caption="🔥 Flamegraph uchun folded stack fayli"
+    )
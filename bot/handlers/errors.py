@@ -0,0 +1,22 @@
+import logging
+
+from aiogram import Router
+from aiogram.filters import ExceptionTypeFilter
+from aiogram.types import ErrorEvent
+from structures.resilience import DatabaseUnavailable
+
+logger = logging.getLogger(__name__)
+
+errors_router = Router()
+
+TRY_AGAIN_TEXT = "⏳ Hozirda tizimda vaqtinchalik uzilish. Iltimos, birozdan so'ng qayta urinib ko'ring."
+
+
+@errors_router.error(ExceptionTypeFilter(DatabaseUnavailable))
+async def database_unavailable(event: ErrorEvent):
+    """Answer quickly instead of leaving the user without a reply while MongoDB is down."""
+    logger.warning("Update %s not handled: %s", event.update.update_id, event.exception)
+    if event.update.callback_query:
+        await event.update.callback_query.answer(TRY_AGAIN_TEXT, show_alert=True)
+    elif event.update.message:
+        await event.update.message.answer(TRY_AGAIN_TEXT)
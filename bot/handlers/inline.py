@@ -0,0 +1,39 @@
+import html
+
+from aiogram import Router
+from aiogram.types import (
+    InlineKeyboardButton, InlineKeyboardMarkup, InlineQuery, InlineQueryResultArticle, InputTextMessageContent,
+)
+from configuration import conf
+from keyboards.common_kb import ParticipantCallback
+from structures.participant_index import participant_index
+
+inline_router = Router()
+
+# Telegram shows at most 50 results per answer.
+RESULTS_PER_ANSWER = 50
+
+
+@inline_router.inline_query()
+async def search_participants(query: InlineQuery):
+    """``@bot name``: matching participants with a vote button, answered from memory only."""
+    offset = int(query.offset) if query.offset.isdigit() else 0
+    entries = participant_index.search(query.query, RESULTS_PER_ANSWER, offset)
+
+    results = [
+        InlineQueryResultArticle(
+            id=entry.id,
+            title=entry.name,
+            description=f"{entry.nomination_title} — {entry.votes} ta ovoz",
+            input_message_content=InputTextMessageContent(
+                message_text=f"🏆 <b>{html.escape(entry.nomination_title)}</b>\n✨ {html.escape(entry.name)}",
+            ),
+            reply_markup=InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(
+                text="✅ Ovoz berish",
+                callback_data=ParticipantCallback(nomination_id=entry.nomination_id, key=entry.key).pack(),
+            )]]),
+        )
+        for entry in entries
+    ]
+    next_offset = str(offset + len(entries)) if len(entries) == RESULTS_PER_ANSWER else ""
+    await query.answer(results, cache_time=conf.bot.inline_cache_time, next_offset=next_offset)
@@ -0,0 +1,18 @@
+from aiogram import F, Router, types
+from aiogram.filters import KICKED, MEMBER, ChatMemberUpdatedFilter
+from structures.database import db
+
+membership_router = Router()
+membership_router.my_chat_member.filter(F.chat.type == "private")
+
+
+@membership_router.my_chat_member(ChatMemberUpdatedFilter(member_status_changed=KICKED))
+async def bot_blocked(event: types.ChatMemberUpdated):
+    """The user blocked the bot: leave them out of broadcasts."""
+    await db.set_reachable(event.from_user.id, reachable=False)
+
+
+@membership_router.my_chat_member(ChatMemberUpdatedFilter(member_status_changed=MEMBER))
+async def bot_unblocked(event: types.ChatMemberUpdated):
+    """The user unblocked or restarted the bot."""
+    await db.set_reachable(event.from_user.id, reachable=True)
@@ -1,19 +1,29 @@
-from aiogram import Router, F
+from aiogram import Bot, Router, F
+from aiogram.filters import Command
+from aiogram.fsm.context import FSMContext
 from aiogram.types import Message, CallbackQuery
 
-from keyboards.common_kb import nominations_kb, participants_kb, NominationCallback, ParticipantCallback
-from structures.database import db
+from configuration import conf
+from keyboards.common_kb import (
+    nominations_kb, participants_kb, search_results_kb, find_participant, my_votes_kb,
+    NominationCallback, ParticipantCallback, ParticipantsPageCallback, ParticipantSearchCallback,
+)
+from structures.database import VOTING_CLOSED, db
+from structures.results_publisher import results_publisher
+from structures.states import ParticipantSearchState
+from structures.subscription_checking import voter_check
 
 router = Router()
 
-async def show_nominations_markup(message: Message):
-    nominations = await db.get_nominations()
+async def show_nominations_markup(message: Message, user_id: int):
+    """Send the open nominations to ``message``'s chat, marking those ``user_id`` voted in."""
+    nominations = await db.get_open_nominations()
     
     if not nominations:
         return await message.answer("📋 Hozirda hech qanday faol nominatsiya mavjud emas. Tez orada yangilanishlarni kuting!")
 
     
-    btn = await nominations_kb(nominations)
+    btn = await nominations_kb(nominations, await db.get_vote_map(user_id))
     await message.answer(
         "🏆 Ovoz berib, sevimli ishtirokchingizni qo'llab-quvvatlang! Quyidagi nominatsiyalardan birini tanlang:",
         reply_markup=btn
@@ -24,36 +34,106 @@ async def show_participants(query: CallbackQuery, callback_data: NominationCallb
     await query.answer()
     
     nomination_id = callback_data.id
-    nomination = await db.get_nomination(nomination_id)
+    nomination = await db.find_nomination(nomination_id)
     
     if not nomination:
         await query.message.edit_text("❗️Kechirasiz, bu nominatsiya topilmadi. Iltimos, boshqa nominatsiyani tanlang.")
         return
-    
-    participants = await db.get_participants(nomination_id)
 
-    
     await query.message.edit_text(
-        f"📣 '{nomination['title']}' nominatsiyasida ishtirok etayotganlar:\n"
+        f"📣 '{nomination.title}' nominatsiyasida ishtirok etayotganlar:\n"
         f"👇 Quyidagi ishtirokchilardan biriga ovoz bering va g'olibni aniqlashga yordam bering:",
-        reply_markup=await participants_kb(participants, nomination_id)
+        reply_markup=await participants_kb(
+            nomination, chosen=(await db.get_vote_map(query.from_user.id)).get(nomination_id)
+        )
+    )
+
+@router.callback_query(ParticipantsPageCallback.filter())
+async def show_participants_page(query: CallbackQuery, callback_data: ParticipantsPageCallback, state: FSMContext):
+    """Switch page or sort order; only the keyboard changes."""
+    await query.answer()
+    await state.clear()
+
+    nomination = await db.find_nomination(callback_data.nomination_id)
+    if not nomination:
+        await query.message.edit_text("❗️Kechirasiz, bu nominatsiya topilmadi. Iltimos, boshqa nominatsiyani tanlang.")
+        return
+
+    await query.message.edit_reply_markup(
+        reply_markup=await participants_kb(
+            nomination, callback_data.page, callback_data.sort,
+            chosen=(await db.get_vote_map(query.from_user.id)).get(callback_data.nomination_id),
+        )
     )
 
+@router.callback_query(F.data == "noop")
+async def ignore_page_counter(query: CallbackQuery):
+    await query.answer()
+
+@router.callback_query(ParticipantSearchCallback.filter())
+async def ask_participant_search(query: CallbackQuery, callback_data: ParticipantSearchCallback, state: FSMContext):
+    await query.answer()
+    await state.set_state(ParticipantSearchState.query)
+    await state.update_data(nomination_id=callback_data.nomination_id)
+    await query.message.answer("🔍 Ishtirokchi ismini (yoki uning bir qismini) yozing:")
+
+@router.message(ParticipantSearchState.query, F.text, ~F.text.startswith("/"))
+async def search_participant(message: Message, state: FSMContext):
+    data = await state.get_data()
+    nomination = await db.find_nomination(data.get("nomination_id"))
+    if not nomination:
+        await state.clear()
+        await message.answer("❗️Kechirasiz, bu nominatsiya topilmadi. Iltimos, boshqa nominatsiyani tanlang.")
+        return
+
+    needle = message.text.strip().casefold()
+    matches = [p for p in nomination.participants if needle in p.name.casefold()]
+    if not matches:
+        await message.answer("🤷 Hech kim topilmadi. Boshqa ism bilan urinib ko'ring:")
+        return
+
+    await state.clear()
+    limit = conf.bot.participants_page_size
+    text = f"🔍 '{nomination.title}' nominatsiyasida topilganlar:"
+    if len(matches) > limit:
+        text += f"\n(birinchi {limit} tasi ko'rsatildi, aniqroq yozing)"
+    await message.answer(text, reply_markup=search_results_kb(nomination, matches[:limit]))
+
 @router.callback_query(F.data == "back_to_nominations")
 async def back_to_nominations(query: CallbackQuery):
     """Return to the nominations list"""
     await query.answer()
-    nominations = await db.get_nominations()
+    nominations = await db.get_open_nominations()
 
-    btn = await nominations_kb(nominations)
+    btn = await nominations_kb(nominations, await db.get_vote_map(query.from_user.id))
     await query.message.edit_text("🔙 Asosiy ro'yxatga qaytib, yana bir nominatsiyani tanlang yoki sevimli ishtirokchingiz uchun ovoz bering:", reply_markup=btn)
 
 @router.callback_query(ParticipantCallback.filter())
-async def vote_for_participant(query: CallbackQuery, callback_data: ParticipantCallback):
+async def vote_for_participant(query: CallbackQuery, callback_data: ParticipantCallback, bot: Bot):
     user_id = query.from_user.id
     nomination_id = callback_data.nomination_id
-    participant_name = callback_data.name
-    
+
+    refusal = await voter_check.refusal(bot, user_id)
+    if refusal is not None:
+        if query.message is None:
+            # Pressed on an inline result in another chat: open the bot, /start walks them through the rest.
+            await query.answer(url=f"https://t.me/{(await bot.me()).username}?start=vote")
+        else:
+            await query.answer(refusal, show_alert=True)
+        return
+
+    # Callback data only carries a short key; resolve it against the cached list first.
+    nomination = await db.find_nomination(nomination_id)
+    participant = find_participant(nomination.participants, callback_data.key) if nomination else None
+    if participant is None:
+        # Added since the list was loaded
+        nomination = await db.get_nomination(nomination_id)
+        participant = find_participant(nomination.participants, callback_data.key) if nomination else None
+    if participant is None:
+        await query.answer("❗️Bunday ishtirokchi topilmadi.", show_alert=True)
+        return
+    participant_name = participant.name
+
     # Record the vote using the proper parameters
     success, result_text = await db.add_vote(
         nomination_id=nomination_id,
@@ -62,28 +142,61 @@ async def vote_for_participant(query: CallbackQuery, callback_data: ParticipantC
     )
     
     if success:
+        results_publisher.mark_dirty(nomination_id)
         await query.answer(text=result_text, show_alert=True)
-        
-        btn = await nominations_kb(nominations=await db.get_nominations())
+        if query.message is None:
+            # Voted from an inline result; that message is shared in someone else's chat, leave it as is.
+            return
+
+        btn = await nominations_kb(await db.get_open_nominations(), await db.get_vote_map(user_id))
         await query.message.edit_text("📜 Yana boshqa nominatsiyalarga ham ovoz bering va sevimli ishtirokchingizga yordam bering!", reply_markup=btn)
         return
 
     if not success:
         await query.answer(result_text, show_alert=True)
-        
-        nomination = await db.get_nomination(nomination_id)
+        if query.message is None:
+            return
+
+        # A closed nomination has nothing left to vote on; go back to the open ones.
+        nomination = await db.find_nomination(nomination_id) if result_text != VOTING_CLOSED else None
 
         if nomination:
-            participants = await db.get_participants(nomination_id)
-            
             await query.message.edit_text(
-                f"🔍 '{nomination['title']}' nominatsiyasida yana kimlar borligini ko'rib chiqing va eng munosibiga ovoz bering:",
-                reply_markup=await participants_kb(participants, nomination_id)
+                f"🔍 '{nomination.title}' nominatsiyasida yana kimlar borligini ko'rib chiqing va eng munosibiga ovoz bering:",
+                reply_markup=await participants_kb(
+                    nomination, chosen=(await db.get_vote_map(user_id)).get(nomination_id)
+                )
             )
         else:
             # If nomination not found, just show all nominations
-            nominations = await db.get_nominations()
+            nominations = await db.get_open_nominations()
             await query.message.edit_text(
                 "📋 Quyidagi nominatsiyalardan birini tanlang:",
-                reply_markup=await nominations_kb(nominations)
-            )
\ No newline at end of file
+                reply_markup=await nominations_kb(nominations, await db.get_vote_map(user_id))
+            )
+
+
+async def _my_votes_text(user_id: int) -> str:
+    votes = await db.get_vote_map(user_id)
+    if not votes:
+        return "🗳 Siz hali hech bir nominatsiyada ovoz bermagansiz."
+    titles = {str(nomination.id): nomination.title for nomination in await db.get_nominations()}
+    open_ids = {str(nomination.id) for nomination in await db.get_open_nominations()}
+    lines = ["🗳 Sizning ovozlaringiz:", ""]
+    for nomination_id, participant_name in votes.items():
+        title = titles.get(nomination_id)
+        if title is None:
+            continue
+        closed = "" if nomination_id in open_ids else " (ovoz berish yopilgan)"
+        lines.append(f"🏆 {title}{closed}\n   ✅ {participant_name}")
+    return "\n".join(lines)
+
+@router.message(Command("myvotes"))
+async def my_votes_command(message: Message):
+    """The user's vote in every nomination, from their cached vote map."""
+    await message.answer(await _my_votes_text(message.from_user.id), reply_markup=my_votes_kb())
+
+@router.callback_query(F.data == "my_votes")
+async def my_votes(query: CallbackQuery):
+    await query.answer()
+    await query.message.edit_text(await _my_votes_text(query.from_user.id), reply_markup=my_votes_kb())
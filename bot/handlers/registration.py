@@ -38,4 +38,4 @@ async def input_phone(message: types.Message, state: FSMContext, bot: Bot):
         return
 
     await message.answer("🎯 Sizning ro'yxatdan o'tishingiz muvaffaqiyatli yakunlandi! Endi ovoz berishda qatnashishingiz mumkin. ✅")
-    await show_nominations_markup(message)
+    await show_nominations_markup(message, message.from_user.id)
@@ -1,6 +1,13 @@
-from aiogram.types import KeyboardButton, ReplyKeyboardMarkup, ReplyKeyboardRemove
+import hashlib
+from collections import OrderedDict
+
+from aiogram.types import (
+    InlineKeyboardButton, InlineKeyboardMarkup, KeyboardButton, ReplyKeyboardMarkup, ReplyKeyboardRemove,
+)
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from aiogram.filters.callback_data import CallbackData
+from configuration import conf
+from models import Nomination, Participant
 
 
 class NominationCallback(CallbackData, prefix="nomination"):
@@ -10,7 +17,52 @@ class NominationCallback(CallbackData, prefix="nomination"):
 
 class ParticipantCallback(CallbackData, prefix="participant"):
     nomination_id: str
-    name: str
+    # participant_key() of the name; buttons sent before paging carry the name itself
+    key: str
+
+
+class ParticipantsPageCallback(CallbackData, prefix="participants"):
+    nomination_id: str
+    page: int
+    sort: str  # "votes" or "name"
+
+
+class ParticipantSearchCallback(CallbackData, prefix="participant_search"):
+    nomination_id: str
+
+
+SORT_ORDERS = ("votes", "name")
+
+
+def participant_key(name: str) -> str:
+    """Short stable key for a participant name, so callback data stays far below 64 bytes."""
+    return hashlib.blake2b(name.encode(), digest_size=6).hexdigest()
+
+
+def find_participant(participants: list[Participant], key: str) -> Participant | None:
+    """Participant matching a callback key, or an old-style callback carrying the name."""
+    for participant in participants:
+        if participant_key(participant.name) == key:
+            return participant
+    for participant in participants:
+        if participant.name == key:
+            return participant
+    return None
+
+
+def _marked(markup: InlineKeyboardMarkup, callbacks: set, mark: str) -> InlineKeyboardMarkup:
+    """Copy of a shared cached markup with ``mark`` replacing the emoji of the buttons in ``callbacks``."""
+    if not callbacks:
+        return markup
+    rows = [
+        [
+            button.model_copy(update={"text": mark + button.text.split(" ", 1)[-1]})
+            if button.callback_data in callbacks else button
+            for button in row
+        ]
+        for row in markup.inline_keyboard
+    ]
+    return InlineKeyboardMarkup(inline_keyboard=rows)
 
 
 def remove_kb():
@@ -29,34 +81,144 @@ def contact_kb():
     return keyboard
 
 
-async def nominations_kb(nominations: list):
+# Last built nominations keyboard, keyed by the (id, title) pairs it shows.
+_nominations_markup = (None, None)
+
+
+async def nominations_kb(nominations: list[Nomination], voted: dict | None = None):
+    """Nominations list; those in ``voted`` (the user's vote map) are marked ✅."""
+    global _nominations_markup
+    key = tuple((str(nomination.id), nomination.title) for nomination in nominations)
+    if _nominations_markup[0] == key:
+        return _mark_voted(_nominations_markup[1], key, voted)
+
     builder = InlineKeyboardBuilder()
     
-    for nomination in nominations:
-        callback_data = NominationCallback(id=str(nomination['_id']), name=nomination['title']).pack()
-        builder.button(text=f"🏆 {nomination['title']}", callback_data=callback_data)
+    for nomination_id, title in key:
+        callback_data = NominationCallback(id=nomination_id, name=title).pack()
+        builder.button(text=f"🏆 {title}", callback_data=callback_data)
+    builder.button(text="🗳 Mening ovozlarim", callback_data="my_votes")
     
     builder.adjust(1)
     
-    return builder.as_markup()
+    markup = builder.as_markup()
+    _nominations_markup = (key, markup)
+    return _mark_voted(markup, key, voted)
+
+
+def _mark_voted(markup: InlineKeyboardMarkup, key: tuple, voted: dict | None) -> InlineKeyboardMarkup:
+    if not voted:
+        return markup
+    callbacks = {
+        NominationCallback(id=nomination_id, name=title).pack() for nomination_id, title in key if nomination_id in voted
+    }
+    return _marked(markup, callbacks, "✅ ")
 
 
-async def participants_kb(participants: list, nomination_id: str = None):
+def my_votes_kb():
     builder = InlineKeyboardBuilder()
-    
-    for participant in participants:
-        participant_name = participant.get('name')
-        votes = participant.get('votes', 0)
-        
-        callback_data = ParticipantCallback(nomination_id=str(nomination_id),name=participant_name).pack()
-        
-        builder.button(
-            text=f"✨ {participant_name} — {votes} ta ovoz",
-            callback_data=callback_data
-        )
-    
     builder.button(text="🔙 Nominatsiyalarga qaytish", callback_data="back_to_nominations")
-    
-    builder.adjust(1)
-    
-    return builder.as_markup()
\ No newline at end of file
+    return builder.as_markup()
+
+
+def _participant_text(participant: Participant) -> str:
+    return f"✨ {participant.name} — {participant.votes} ta ovoz"
+
+
+def _participant_button(nomination_id: str, participant: Participant) -> InlineKeyboardButton:
+    return InlineKeyboardButton(
+        text=_participant_text(participant),
+        callback_data=ParticipantCallback(nomination_id=nomination_id, key=participant_key(participant.name)).pack(),
+    )
+
+
+def _build_pages(nomination_id: str, names: tuple, sort: str) -> list:
+    """Pages as ``(names on the page, markup)``; participant buttons get their counts in :func:`participants_kb`."""
+    size = conf.bot.participants_page_size
+    chunks = [names[i:i + size] for i in range(0, len(names), size)] or [()]
+    other_sort = "name" if sort == "votes" else "votes"
+
+    pages = []
+    for number, chunk in enumerate(chunks):
+        rows = [[InlineKeyboardButton(
+            text=f"✨ {name}",
+            callback_data=ParticipantCallback(nomination_id=nomination_id, key=participant_key(name)).pack(),
+        )] for name in chunk]
+        if len(chunks) > 1:
+            navigation = []
+            if number > 0:
+                navigation.append(InlineKeyboardButton(text="⬅️", callback_data=ParticipantsPageCallback(
+                    nomination_id=nomination_id, page=number - 1, sort=sort).pack()))
+            navigation.append(InlineKeyboardButton(text=f"{number + 1}/{len(chunks)}", callback_data="noop"))
+            if number + 1 < len(chunks):
+                navigation.append(InlineKeyboardButton(text="➡️", callback_data=ParticipantsPageCallback(
+                    nomination_id=nomination_id, page=number + 1, sort=sort).pack()))
+            rows.append(navigation)
+        if len(names) > 1:
+            rows.append([InlineKeyboardButton(
+                text="🔤 Alifbo bo'yicha" if other_sort == "name" else "🔢 Ovozlar bo'yicha",
+                callback_data=ParticipantsPageCallback(nomination_id=nomination_id, page=0, sort=other_sort).pack(),
+            )])
+        if len(chunks) > 1:
+            rows.append([InlineKeyboardButton(
+                text="🔍 Ishtirokchini qidirish",
+                callback_data=ParticipantSearchCallback(nomination_id=nomination_id).pack(),
+            )])
+        rows.append([InlineKeyboardButton(text="🔙 Nominatsiyalarga qaytish", callback_data="back_to_nominations")])
+        pages.append((chunk, InlineKeyboardBuilder(markup=rows).as_markup()))
+    return pages
+
+
+# (nomination_id, sort) -> (participant names in display order, pages), least recently used first.
+_participant_pages: "OrderedDict[tuple, tuple]" = OrderedDict()
+MAX_CACHED_PAGE_SETS = 256
+
+
+async def participants_kb(nomination: Nomination, page: int = 0, sort: str = "votes", chosen: str | None = None):
+    """
+    One page of a nomination's participants with navigation, sort and search buttons.
+
+    All pages of a nomination are laid out at once and reused until the
+    participants or their order change; votes only change the order when
+    sorting by votes. The counts are filled in on a copy of the page's
+    participant buttons, where the user's ``chosen`` participant is also
+    marked ✅.
+    """
+    nomination_id = str(nomination.id)
+    sort = sort if sort in SORT_ORDERS else "votes"
+    if sort == "name":
+        ordered = sorted(nomination.participants, key=lambda p: p.name.casefold())
+    else:
+        ordered = sorted(nomination.participants, key=lambda p: -p.votes)
+    names = tuple(participant.name for participant in ordered)
+
+    cache_key = (nomination_id, sort)
+    cached = _participant_pages.get(cache_key)
+    if cached is None or cached[0] != names:
+        cached = (names, _build_pages(nomination_id, names, sort))
+        _participant_pages[cache_key] = cached
+        while len(_participant_pages) > MAX_CACHED_PAGE_SETS:
+            _participant_pages.popitem(last=False)
+    _participant_pages.move_to_end(cache_key)
+
+    pages = cached[1]
+    page_names, markup = pages[max(0, min(page, len(pages) - 1))]
+    by_name = {participant.name: participant for participant in ordered}
+    rows = [
+        [row[0].model_copy(update={"text": _participant_text(by_name[name])})]
+        for name, row in zip(page_names, markup.inline_keyboard)
+    ]
+    markup = InlineKeyboardMarkup(inline_keyboard=rows + markup.inline_keyboard[len(page_names):])
+    if chosen is None:
+        return markup
+    return _marked(markup, {ParticipantCallback(nomination_id=nomination_id, key=participant_key(chosen)).pack()}, "✅ ")
+
+
+def search_results_kb(nomination: Nomination, matches: list[Participant]):
+    nomination_id = str(nomination.id)
+    rows = [[_participant_button(nomination_id, participant)] for participant in matches]
+    rows.append([InlineKeyboardButton(
+        text="🔙 Barcha ishtirokchilar",
+        callback_data=ParticipantsPageCallback(nomination_id=nomination_id, page=0, sort="votes").pack(),
+    )])
+    return InlineKeyboardBuilder(markup=rows).as_markup()
\ No newline at end of file
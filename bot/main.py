@@ -1,7 +1,5 @@
 """This file represent startup bot logic."""
 import asyncio
-import logging
-import sys
 
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
@@ -9,8 +7,23 @@ from aiogram.fsm.storage.base import BaseEventIsolation, BaseStorage
 from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.fsm.strategy import FSMStrategy
 from configuration import conf
-from handlers import routers
-from structures.schedule import on_startup
+from handlers import admission_classes, routers
+from keyboards.common_kb import nominations_kb
+from middlewares.activity import ActivityMiddleware
+from middlewares.admission import AdmissionMiddleware
+from middlewares.diagnostics import SlowHandlerMiddleware
+from middlewares.inflight import InFlightMiddleware
+from middlewares.recorder import UpdateRecorder, UpdateRecorderMiddleware
+from models.logs import setup_logging
+from structures.activity import activity
+from structures.admission import admission
+from structures.database import db
+from structures.diagnostics import diagnostics
+from structures.maintenance import maintenance
+from structures.participant_index import participant_index
+from structures.results_publisher import results_publisher
+from structures.schedule import on_startup, scheduler
+from structures.tenants import tenant_manager
 
 
 def get_dispatcher(
@@ -27,22 +40,67 @@ def get_dispatcher(
     for router in routers:
         dp.include_router(router)
 
+    inflight = InFlightMiddleware(timeout=conf.bot.shutdown_timeout)
+    dp.update.outer_middleware(inflight)
+    dp.shutdown.register(inflight.drain)
+
+    dp.update.outer_middleware(ActivityMiddleware(activity))
+    dp.shutdown.register(activity.flush)
+
+    slow_handlers = SlowHandlerMiddleware()
+    for name, observer in dp.observers.items():
+        if name not in ("update", "error"):
+            observer.middleware(slow_handlers)
+
+    if conf.admission.enabled:
+        for router, kind in admission_classes:
+            gate = AdmissionMiddleware(admission, kind)
+            for observer in (router.message, router.callback_query, router.inline_query):
+                observer.middleware(gate)
+
+    if conf.recorder.enabled:
+        recorder = UpdateRecorder(path=conf.recorder.path, salt=conf.recorder.salt)
+        dp.update.outer_middleware(UpdateRecorderMiddleware(recorder))
+        dp.shutdown.register(recorder.close)
+
     return dp
 
 
+async def warm_up():
+    """Build what the first users need so a restart does not serve them from a cold start."""
+    await nominations_kb(await db.get_open_nominations())
+    participant_index.update(await db.get_nominations())
+
+
 async def start_bot():
     """This function will start bot with polling mode."""
     bot = Bot(token=conf.bot.token, default=DefaultBotProperties(parse_mode='HTML'))
+    diagnostics.start()
+    await db.connect()
+    await warm_up()
     await on_startup(bot)
     dp = get_dispatcher()
+    if conf.results.enabled:
+        results_publisher.attach(bot)
+    participant_index.attach()
+    activity.attach()
+    maintenance.attach(dp)
+    if conf.tenants.enabled:
+        tenant_manager.attach(dp, warm_up)
+        await tenant_manager.sync()
+    scheduler.start()
 
     try:
         await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
     finally:
+        await tenant_manager.stop()
+        await scheduler.shutdown()
+        await diagnostics.stop()
         await dp.storage.close()
         await bot.session.close()
+        db.close()
 
 
 if __name__ == "__main__":
-    logging.basicConfig(level=logging.DEBUG, stream=sys.stdout)
+    setup_logging(conf.logging.level, conf.logging.levels)
     asyncio.run(start_bot())
@@ -0,0 +1,23 @@
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, User
+from structures.activity import ActivityTracker
+
+
+class ActivityMiddleware(BaseMiddleware):
+    """Outer update middleware marking the sender of every update as active."""
+
+    def __init__(self, tracker: ActivityTracker):
+        self.tracker = tracker
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        user: User | None = data.get("event_from_user")
+        if user is not None and not user.is_bot:
+            self.tracker.touch(user.id)
+        return await handler(event, data)
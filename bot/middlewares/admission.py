@@ -0,0 +1,40 @@
+from contextlib import suppress
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.exceptions import TelegramAPIError
+from aiogram.types import CallbackQuery, Message, TelegramObject
+from structures.admission import AdmissionControl, Overloaded
+
+BUSY = "⏳ Hozir bot juda band. Iltimos, birozdan so'ng qayta urinib ko'ring."
+
+
+class AdmissionMiddleware(BaseMiddleware):
+    """
+    Inner middleware running a router's handlers as admission class ``kind``.
+
+    A shed update gets a short busy reply without touching the database;
+    inline queries are left unanswered.
+    """
+
+    def __init__(self, admission: AdmissionControl, kind: str):
+        self.admission = admission
+        self.kind = kind
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        try:
+            await self.admission.acquire(self.kind)
+        except Overloaded:
+            if isinstance(event, (CallbackQuery, Message)):
+                with suppress(TelegramAPIError):
+                    await event.answer(BUSY)
+            return None
+        try:
+            return await handler(event, data)
+        finally:
+            self.admission.release(self.kind)
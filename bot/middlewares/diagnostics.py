@@ -0,0 +1,21 @@
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+from structures.diagnostics import diagnostics
+
+
+class SlowHandlerMiddleware(BaseMiddleware):
+    """Inner middleware reporting handlers that exceed the slow-call threshold."""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        handler_object = data.get("handler")
+        callback = getattr(handler_object, "callback", None)
+        name = getattr(callback, "__qualname__", type(event).__name__)
+        async with diagnostics.watch(f"Handler {name}"):
+            return await handler(event, data)
@@ -0,0 +1,50 @@
+"""Tracks updates being handled so shutdown can wait for them."""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+logger = logging.getLogger(__name__)
+
+
+class InFlightMiddleware(BaseMiddleware):
+    """
+    Outer update middleware counting updates that are still being handled.
+
+    Polling handles every update in its own task and does not wait for them
+    when it stops. Registering :meth:`drain` on ``dp.shutdown`` lets a vote
+    that is halfway through its writes finish before the database client closes.
+    """
+
+    def __init__(self, timeout: float):
+        self.timeout = timeout
+        self.running = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        self.running += 1
+        self._idle.clear()
+        try:
+            return await handler(event, data)
+        finally:
+            self.running -= 1
+            if not self.running:
+                self._idle.set()
+
+    async def drain(self) -> None:
+        """Wait up to ``timeout`` seconds for in-flight updates to finish."""
+        if not self.running:
+            return
+        logger.info("Waiting for %d in-flight updates", self.running)
+        try:
+            await asyncio.wait_for(self._idle.wait(), self.timeout)
+        except asyncio.TimeoutError:
+            logger.warning("%d updates still running after %.1fs, shutting down anyway", self.running, self.timeout)
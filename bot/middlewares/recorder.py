@@ -0,0 +1,142 @@
+"""Opt-in recorder of incoming updates for offline replay."""
+import asyncio
+import gzip
+import hashlib
+import hmac
+import json
+import logging
+import os
+import secrets
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+logger = logging.getLogger(__name__)
+
+# Objects whose ``id`` identifies a Telegram user or chat.
+IDENTITY_KEYS = {"from", "user", "chat", "sender_chat"}
+# Personal fields replaced with stable pseudonyms.
+PERSONAL_KEYS = {"first_name", "last_name", "username", "phone_number"}
+# Telegram timestamps, rebased to the start of the recording.
+DATE_KEYS = {"date", "edit_date"}
+
+
+class UpdateRecorder:
+    """
+    Append-only writer of anonymized updates.
+
+    Every record is a JSON line ``{"ts": <seconds since start>, "update": {...}}``.
+    Lines are buffered in memory and flushed from a worker thread, each flush
+    appending a new gzip member to the file so a crash never corrupts earlier data.
+    """
+
+    def __init__(self, path: str, salt: str = "", flush_interval: float = 1.0, batch_size: int = 500):
+        self.path = path
+        self.salt = (salt or secrets.token_hex(16)).encode()
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._started = time.monotonic()
+        self._started_at = int(time.time())
+        self._buffer: list[str] = []
+        self._task: asyncio.Task | None = None
+        self._wakeup = asyncio.Event()
+
+    def anonymize_id(self, value: int) -> int:
+        """Map a Telegram ID to a stable pseudonymous ID of the same sign."""
+        digest = hmac.new(self.salt, str(abs(value)).encode(), hashlib.sha256).digest()
+        anonymized = int.from_bytes(digest[:6], "big") % 10 ** 12 + 1
+        return -anonymized if value < 0 else anonymized
+
+    def _pseudonym(self, key: str, value: str) -> str:
+        digest = hmac.new(self.salt, value.encode(), hashlib.sha256).hexdigest()[:10]
+        if key == "phone_number":
+            digits = str(int(digest, 16))[:7]
+            return f"{value[:5]}{digits}"
+        return f"{key[0]}{digest}"
+
+    def _scrub(self, obj: Any, key: str | None = None) -> Any:
+        if isinstance(obj, dict):
+            scrubbed = {k: self._scrub(v, k) for k, v in obj.items()}
+            if key in IDENTITY_KEYS and isinstance(scrubbed.get("id"), int):
+                scrubbed["id"] = self.anonymize_id(scrubbed["id"])
+            return scrubbed
+        if isinstance(obj, list):
+            return [self._scrub(item, key) for item in obj]
+        if key == "user_id" and isinstance(obj, int):
+            return self.anonymize_id(obj)
+        if key in PERSONAL_KEYS and isinstance(obj, str):
+            return self._pseudonym(key, obj)
+        if key in DATE_KEYS and isinstance(obj, int):
+            return max(0, obj - self._started_at)
+        return obj
+
+    def record(self, update: Update, private_text: bool = False) -> None:
+        """Queue an update for writing."""
+        raw = self._scrub(update.model_dump(mode="json", by_alias=True, exclude_none=True))
+        if private_text and "text" in raw.get("message", {}):
+            raw["message"]["text"] = self._pseudonym("text", raw["message"]["text"])
+        line = json.dumps(
+            {"ts": round(time.monotonic() - self._started, 3), "update": raw},
+            ensure_ascii=False,
+            separators=(",", ":"),
+        )
+        self._buffer.append(line)
+        if self._task is None:
+            self._task = asyncio.create_task(self._writer())
+        if len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+
+    def _write(self, lines: list[str]) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with gzip.open(self.path, "at", encoding="utf-8") as fh:
+            fh.write("\n".join(lines) + "\n")
+
+    async def flush(self) -> None:
+        if not self._buffer:
+            return
+        lines, self._buffer = self._buffer, []
+        try:
+            await asyncio.to_thread(self._write, lines)
+        except OSError:
+            logger.exception("Failed to write %d recorded updates to %s", len(lines), self.path)
+
+    async def _writer(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def close(self) -> None:
+        """Stop the writer and flush what is left in the buffer."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+
+class UpdateRecorderMiddleware(BaseMiddleware):
+    """Outer update middleware feeding every incoming update to the recorder."""
+
+    def __init__(self, recorder: UpdateRecorder):
+        self.recorder = recorder
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        try:
+            # Messages typed during registration carry the user's real name.
+            raw_state = data.get("raw_state") or ""
+            self.recorder.record(event, private_text=raw_state.startswith("RegState"))
+        except Exception:
+            logger.exception("Failed to record update %s", getattr(event, "update_id", None))
+        return await handler(event, data)
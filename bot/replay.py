@@ -0,0 +1,201 @@
+"""
+Replay recorded updates through the dispatcher against a scratch database.
+
+Run from the ``bot`` directory:
+
+    python replay.py recordings/updates.jsonl.gz --database xumotjbot_replay --speed 10
+
+Telegram API calls are answered locally by a dry-run session, so nothing is
+ever sent to real users. Nominations are copied from the production database
+into the scratch one before the replay starts.
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+from collections import Counter
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Replay recorded updates against a scratch database.")
+    parser.add_argument("path", help="Recording produced by the update recorder")
+    parser.add_argument("--database", default="xumotjbot_replay", help="Scratch database name")
+    parser.add_argument("--seed-from", default=None, help="Database to copy nominations from")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay speed multiplier, 0 for max speed")
+    parser.add_argument("--concurrency", type=int, default=1000, help="Maximum updates processed at once")
+    parser.add_argument("--keep-data", action="store_true", help="Do not reset the scratch database")
+    parser.add_argument("--force", action="store_true", help="Allow replaying into the production database")
+    parser.add_argument("--output", default=None, help="Write the summary as JSON to this file")
+    return parser.parse_args()
+
+
+def read_records(path: str):
+    """Yield ``(offset, update)`` pairs, stitching restarts into one timeline."""
+    base = last = 0.0
+    with gzip.open(path, "rt", encoding="utf-8") as fh:
+        for line in fh:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            ts = record["ts"]
+            if ts < last:
+                # The recorder was restarted and its clock began again from zero.
+                base += last
+            last = ts
+            yield base + ts, record["update"]
+
+
+def percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def replay(args: argparse.Namespace) -> dict:
+    from aiogram import Bot
+    from aiogram.client.default import DefaultBotProperties
+    from aiogram.client.session.base import BaseSession
+    from aiogram.types import Update
+
+    from configuration import conf
+    from main import get_dispatcher
+    from structures.database import db
+
+    class DryRunSession(BaseSession):
+        """Session answering every API method locally with a minimal valid result."""
+
+        def __init__(self):
+            super().__init__()
+            self.calls = Counter()
+            self._message_id = 0
+
+        def _candidates(self, bot, method):
+            self._message_id += 1
+            chat_id = getattr(method, "chat_id", None) or getattr(method, "user_id", None)
+            if not isinstance(chat_id, int):
+                chat_id = bot.id
+            user = {"id": chat_id, "is_bot": False, "first_name": "replay"}
+            return (
+                True,
+                {"message_id": self._message_id, "date": int(time.time()),
+                 "chat": {"id": chat_id, "type": "private"}},
+                {"message_id": self._message_id},
+                {"status": "member", "user": user},
+                {"invite_link": "https://t.me/+replay", "creator": user, "creates_join_request": False,
+                 "is_primary": False, "is_revoked": False},
+                {"id": bot.id, "is_bot": True, "first_name": "replay", "username": "replay_bot"},
+                [],
+            )
+
+        async def make_request(self, bot, method, timeout=None):
+            self.calls[type(method).__name__] += 1
+            for candidate in self._candidates(bot, method):
+                content = json.dumps({"ok": True, "result": candidate})
+                try:
+                    return self.check_response(bot, method, 200, content).result
+                except Exception:
+                    continue
+            return None
+
+        async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+            return
+            yield b""
+
+        async def close(self):
+            pass
+
+    if not args.keep_data:
+        await db.client.drop_database(args.database)
+        nominations = await db.client[args.seed_from].nominations.find().to_list(length=None)
+        if nominations:
+            await db.db.nominations.insert_many(nominations)
+        logging.info("Seeded %d nominations from %s", len(nominations), args.seed_from)
+    await db.connect()
+
+    session = DryRunSession()
+    bot = Bot(token=conf.bot.token, session=session, default=DefaultBotProperties(parse_mode="HTML"))
+    dp = get_dispatcher()
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies: list = []
+    errors = Counter()
+    loop = asyncio.get_running_loop()
+
+    async def process(update: Update) -> None:
+        async with semaphore:
+            started = loop.time()
+            try:
+                await dp.feed_update(bot, update)
+            except Exception as e:
+                errors[type(e).__name__] += 1
+            latencies.append(loop.time() - started)
+
+    tasks = []
+    started = loop.time()
+    for offset, raw in read_records(args.path):
+        if args.speed > 0:
+            delay = started + offset / args.speed - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        update = Update.model_validate(raw, context={"bot": bot})
+        tasks.append(asyncio.create_task(process(update)))
+    await asyncio.gather(*tasks)
+    elapsed = loop.time() - started
+    await dp.emit_shutdown(bot=bot)
+    db.close()
+
+    return {
+        "recording": args.path,
+        "database": args.database,
+        "speed": args.speed or "max",
+        "updates": len(latencies),
+        "elapsed_s": round(elapsed, 3),
+        "throughput_ups": round(len(latencies) / elapsed, 1) if elapsed else None,
+        "latency_ms": {
+            "mean": round(statistics.fmean(latencies) * 1000, 2) if latencies else 0.0,
+            "p50": round(percentile(latencies, 50) * 1000, 2),
+            "p95": round(percentile(latencies, 95) * 1000, 2),
+            "p99": round(percentile(latencies, 99) * 1000, 2),
+            "max": round(max(latencies, default=0.0) * 1000, 2),
+        },
+        "errors": dict(errors),
+        "api_calls": dict(session.calls),
+    }
+
+
+def main() -> None:
+    args = parse_args()
+    from environs import Env
+
+    Env().read_env()
+    production = os.environ.get("MONGODB_DATABASE", "xumotjbot")
+    if args.database == production and not args.force:
+        sys.exit(f"Refusing to replay into the production database '{production}', pass --force to override")
+    if args.seed_from is None:
+        args.seed_from = production
+
+    from configuration import load_configuration
+
+    # The dry-run session never reaches Telegram, so the bot's settings may be placeholders.
+    placeholders = {"token": ("TELEGRAM_TOKEN", "42:replay"), "admins": ("ADMIN_IDS", []), "channel_id": ("CHANNEL_ID", "@replay")}
+    bot = {name: value for name, (variable, value) in placeholders.items() if variable not in os.environ}
+    results = {} if {"CHANNEL_ID", "RESULTS_CHAT_ID"} & os.environ.keys() else {"chat_id": "@replay"}
+    load_configuration(db={"database": args.database}, recorder={"enabled": False}, bot=bot, results=results)
+
+    logging.basicConfig(level=logging.INFO, stream=sys.stdout)
+    logging.getLogger("aiogram").setLevel(logging.WARNING)
+    summary = asyncio.run(replay(args))
+    print(json.dumps(summary, indent=2))
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(summary, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Coalesced ``last_active_at`` tracking for users."""
+import datetime
+import logging
+import time
+
+from configuration import conf
+from structures.database import db
+from structures.schedule import IntervalTrigger, scheduler
+from structures.tenancy import Tenant, current_tenant, using_tenant
+
+logger = logging.getLogger(__name__)
+
+
+class ActivityTracker:
+    """
+    Remembers when users were last seen and stores it in batches.
+
+    :meth:`touch` only updates memory. A scheduler job flushes every
+    ``ACTIVITY_FLUSH_INTERVAL`` seconds with one unordered bulk write of
+    ``$max`` updates per tenant, so a late flush never moves a timestamp
+    backwards. A user is queued again only after ``ACTIVITY_MIN_INTERVAL``
+    seconds, which bounds the writes per user however chatty they are.
+    """
+
+    def __init__(self, min_interval: float):
+        self.min_interval = min_interval
+        self._pending: dict[Tenant, dict[int, datetime.datetime]] = {}
+        self._queued_at: dict[tuple, float] = {}
+
+    def attach(self) -> None:
+        scheduler.add_job("activity_flush", self.flush, IntervalTrigger(conf.bot.activity_flush_interval), lease=False)
+
+    def touch(self, user_id: int) -> None:
+        tenant = current_tenant.get()
+        key = (tenant.database, user_id)
+        now = time.monotonic()
+        queued_at = self._queued_at.get(key)
+        if queued_at is not None and now - queued_at < self.min_interval:
+            return
+        self._queued_at[key] = now
+        self._pending.setdefault(tenant, {})[user_id] = datetime.datetime.now(datetime.timezone.utc)
+
+    async def flush(self) -> None:
+        pending, self._pending = self._pending, {}
+        for tenant, seen in pending.items():
+            with using_tenant(tenant):
+                try:
+                    await db.record_activity(seen)
+                except Exception:
+                    logger.warning("Failed to store activity of %d users, retrying next flush", len(seen),
+                                   exc_info=True)
+                    retry = self._pending.setdefault(tenant, {})
+                    for user_id, seen_at in seen.items():
+                        retry[user_id] = max(seen_at, retry.get(user_id, seen_at))
+        # Forget users whose interval has passed so the map does not grow with the audience.
+        cutoff = time.monotonic() - self.min_interval
+        self._queued_at = {key: at for key, at in self._queued_at.items() if at > cutoff}
+
+
+activity = ActivityTracker(min_interval=conf.bot.activity_min_interval)
@@ -0,0 +1,131 @@
+"""Admission control: bounded handler concurrency with priorities and load shedding."""
+import asyncio
+import logging
+import time
+from collections import Counter, deque
+from contextlib import suppress
+
+from configuration import conf
+
+logger = logging.getLogger(__name__)
+
+# Handler classes, most important first.
+PRIORITIES = ("vote", "registration", "broadcast")
+SHED_LOG_INTERVAL = 10.0
+
+
+class Overloaded(Exception):
+    """The call was shed instead of being admitted."""
+
+
+class AdmissionControl:
+    """
+    Admits handler calls by class under one shared concurrency limit.
+
+    Each class also has its own limit, so a long broadcast never holds more
+    than its share of the database and Telegram connections. A call that
+    cannot start waits in its class's FIFO queue and a freed slot goes to
+    the most important class that may use it.
+
+    Once ``max_queue`` calls are waiting, a new call is shed, unless it
+    outranks a waiter of a less important class, which is shed in its place.
+    A waiter also gives up after ``queue_timeout`` seconds: by then the user
+    has usually tapped again, and a busy reply is better than a late answer.
+    """
+
+    def __init__(self, concurrency: int, limits: dict, max_queue: int, queue_timeout: float):
+        self.concurrency = concurrency
+        self.limits = limits
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.running: Counter = Counter()
+        self.shed: Counter = Counter()
+        self._queues = {kind: deque() for kind in PRIORITIES}
+        self._logged_at = 0.0
+
+    @property
+    def waiting(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def _can_start(self, kind: str) -> bool:
+        return self.active < self.concurrency and self.running[kind] < self.limits.get(kind, self.concurrency)
+
+    def _start(self, kind: str) -> None:
+        self.active += 1
+        self.running[kind] += 1
+
+    def _record_shed(self, kind: str) -> None:
+        self.shed[kind] += 1
+        now = time.monotonic()
+        if now - self._logged_at >= SHED_LOG_INTERVAL:
+            self._logged_at = now
+            logger.warning(
+                "Shedding load: %d running, %d waiting, shed so far %s", self.active, self.waiting, dict(self.shed)
+            )
+
+    def _shed_below(self, kind: str) -> bool:
+        """Shed the newest waiter of the least important class ranked below ``kind``."""
+        for other in reversed(PRIORITIES):
+            if other == kind:
+                return False
+            queue = self._queues[other]
+            while queue:
+                waiter = queue.pop()
+                if not waiter.done():
+                    waiter.set_exception(Overloaded())
+                    self._record_shed(other)
+                    return True
+        return False
+
+    async def acquire(self, kind: str) -> None:
+        """Wait for a slot of ``kind``; raises :class:`Overloaded` when the call is shed."""
+        queue = self._queues[kind]
+        if not queue and self._can_start(kind):
+            self._start(kind)
+            return
+        if self.waiting >= self.max_queue and not self._shed_below(kind):
+            self._record_shed(kind)
+            raise Overloaded()
+
+        waiter = asyncio.get_running_loop().create_future()
+        queue.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except BaseException as error:
+            if waiter.done() and not waiter.cancelled() and waiter.exception() is None:
+                # Admitted just as the wait ended; hand the slot on.
+                self.release(kind)
+            else:
+                with suppress(ValueError):
+                    queue.remove(waiter)
+            if isinstance(error, asyncio.TimeoutError):
+                self._record_shed(kind)
+                raise Overloaded() from None
+            raise
+
+    def release(self, kind: str) -> None:
+        self.active -= 1
+        self.running[kind] -= 1
+        for candidate in PRIORITIES:
+            queue = self._queues[candidate]
+            while queue and self._can_start(candidate):
+                waiter = queue.popleft()
+                if not waiter.done():
+                    self._start(candidate)
+                    waiter.set_result(None)
+
+    def stats(self) -> dict:
+        return {
+            "running": dict(self.running),
+            "waiting": {kind: len(queue) for kind, queue in self._queues.items()},
+            "shed": dict(self.shed),
+        }
+
+
+admission = AdmissionControl(
+    concurrency=conf.admission.concurrency,
+    limits=conf.admission.limits,
+    max_queue=conf.admission.max_queue,
+    queue_timeout=conf.admission.queue_timeout,
+)
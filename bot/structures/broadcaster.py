@@ -9,6 +9,68 @@ from aiogram.exceptions import (
     TelegramRetryAfter,
 )
 from aiogram.types import InlineKeyboardMarkup, ReplyKeyboardMarkup
+from configuration import conf
+from structures.database import db
+from structures.logger import LogSummary
+from structures.tenancy import Tenant, current_tenant, using_tenant
+
+logger = logging.getLogger(__name__)
+
+# One summary line per batch of sends instead of one line per recipient.
+deliveries = LogSummary(logger, "Deliveries", every=conf.logging.summary_every)
+
+
+class DeliveryLedger:
+    """
+    Collects the delivery outcome of every recipient and stores it on ``users``.
+
+    Outcomes are buffered per tenant and user and written with one bulk
+    update per ``batch_size`` recipients, so a broadcast costs a handful of
+    writes. Each tenant's batch goes to that tenant's database.
+    """
+
+    def __init__(self, batch_size: int = 500):
+        self.batch_size = batch_size
+        self._outcomes: dict[Tenant, dict[int, str]] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    def record(self, user_id, outcome: str) -> None:
+        tenant = current_tenant.get()
+        outcomes = self._outcomes.setdefault(tenant, {})
+        try:
+            outcomes[int(user_id)] = outcome
+        except (TypeError, ValueError):
+            return
+        if len(outcomes) >= self.batch_size:
+            task = asyncio.create_task(self._flush_tenant(tenant))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def flush(self) -> None:
+        for tenant in list(self._outcomes):
+            await self._flush_tenant(tenant)
+
+    async def _flush_tenant(self, tenant: Tenant) -> None:
+        outcomes = self._outcomes.pop(tenant, None)
+        if not outcomes:
+            return
+        with using_tenant(tenant):
+            try:
+                await db.record_deliveries(outcomes)
+            except Exception:
+                logger.exception("Failed to store delivery state of %d users", len(outcomes))
+
+
+ledger = DeliveryLedger()
+
+
+def failure_outcome(error: TelegramAPIError) -> str:
+    """Tell a blocked bot from a deleted account; anything else is a plain failure."""
+    if isinstance(error, TelegramForbiddenError):
+        return "deactivated" if "deactivated" in error.message else "blocked"
+    if isinstance(error, TelegramNotFound):
+        return "deactivated"
+    return "failed"
 
 
 async def copy_message(
@@ -28,22 +90,26 @@ async def copy_message(
     """
     try:
         await bot.copy_message(user_id, chat_id, message_id, reply_markup=keyboard)
-    except TelegramForbiddenError:
-        logging.info(f"Target [ID:{user_id}]: blocked by user")
-    except TelegramNotFound:
-        logging.info(f"Target [ID:{user_id}]: invalid user ID")
+    except TelegramForbiddenError as e:
+        deliveries.add("blocked")
+        ledger.record(user_id, failure_outcome(e))
+    except TelegramNotFound as e:
+        deliveries.add("not_found")
+        ledger.record(user_id, failure_outcome(e))
     except TelegramRetryAfter as e:
-        logging.info(
-            f"Target [ID:{user_id}]: Flood limit is exceeded. Sleep {e.timeout} seconds."
-        )
-        await asyncio.sleep(e.timeout)
+        deliveries.add("retry_after")
+        logger.warning("Flood limit is exceeded. Sleep %s seconds.", e.retry_after)
+        await asyncio.sleep(e.retry_after)
         return await copy_message(
-            user_id, chat_id, message_id, keyboard
+            user_id, chat_id, message_id, keyboard, bot
         )  # Recursive call
     except TelegramAPIError:
-        logging.info(f"Target [ID:{user_id}]: failed")
+        deliveries.add("failed")
+        ledger.record(user_id, "failed")
+        logger.debug("Target [ID:%s]: failed", user_id, exc_info=True)
     else:
-        logging.info(f"Target [ID:{user_id}]: success")
+        deliveries.add("success")
+        ledger.record(user_id, "success")
         return True
     return False
 
@@ -63,20 +129,24 @@ async def send_message(
     """
     try:
         await bot.send_message(user_id, text, reply_markup=keyboard)
-    except TelegramForbiddenError:
-        logging.error(f"Target [ID:{user_id}]: blocked by user")
-    except TelegramNotFound:
-        logging.error(f"Target [ID:{user_id}]: invalid user ID")
+    except TelegramForbiddenError as e:
+        deliveries.add("blocked")
+        ledger.record(user_id, failure_outcome(e))
+    except TelegramNotFound as e:
+        deliveries.add("not_found")
+        ledger.record(user_id, failure_outcome(e))
     except TelegramRetryAfter as e:
-        logging.error(
-            f"Target [ID:{user_id}]: Flood limit is exceeded. Sleep {e.timeout} seconds."
-        )
-        await asyncio.sleep(e.timeout)
-        return await send_message(user_id, text)  # Recursive call
+        deliveries.add("retry_after")
+        logger.warning("Flood limit is exceeded. Sleep %s seconds.", e.retry_after)
+        await asyncio.sleep(e.retry_after)
+        return await send_message(user_id, text, keyboard, bot)  # Recursive call
     except TelegramAPIError:
-        logging.exception(f"Target [ID:{user_id}]: failed")
+        deliveries.add("failed")
+        ledger.record(user_id, "failed")
+        logger.debug("Target [ID:%s]: failed", user_id, exc_info=True)
     else:
-        logging.info(f"Target [ID:{user_id}]: success")
+        deliveries.add("success")
+        ledger.record(user_id, "success")
         return True
     return False
 
@@ -97,19 +167,23 @@ async def send_photo(
     """
     try:
         await bot.send_photo(user_id, photo, caption=caption, reply_markup=keyboard)
-    except TelegramForbiddenError:
-        logging.error(f"Target [ID:{user_id}]: blocked by user")
-    except TelegramNotFound:
-        logging.error(f"Target [ID:{user_id}]: invalid user ID")
+    except TelegramForbiddenError as e:
+        deliveries.add("blocked")
+        ledger.record(user_id, failure_outcome(e))
+    except TelegramNotFound as e:
+        deliveries.add("not_found")
+        ledger.record(user_id, failure_outcome(e))
     except TelegramRetryAfter as e:
-        logging.error(
-            f"Target [ID:{user_id}]: Flood limit is exceeded. Sleep {e.timeout} seconds."
-        )
-        await asyncio.sleep(e.timeout)
-        return await send_photo(user_id, photo, caption, keyboard)
+        deliveries.add("retry_after")
+        logger.warning("Flood limit is exceeded. Sleep %s seconds.", e.retry_after)
+        await asyncio.sleep(e.retry_after)
+        return await send_photo(user_id, photo, caption, keyboard, bot)
     except TelegramAPIError:
-        logging.exception(f"Target [ID:{user_id}]: failed")
+        deliveries.add("failed")
+        ledger.record(user_id, "failed")
+        logger.debug("Target [ID:%s]: failed", user_id, exc_info=True)
     else:
-        logging.info(f"Target [ID:{user_id}]: success")
+        deliveries.add("success")
+        ledger.record(user_id, "success")
         return True
     return False
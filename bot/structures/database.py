@@ -1,26 +1,186 @@
+from collections import OrderedDict
 from urllib.parse import quote_plus
+import asyncio
 import datetime
+import functools
+import math
+import time
 
 from bson.objectid import ObjectId
 from configuration import conf
+from models import Nomination, Participant, User, Vote
+from models.mongo import make_read_preference
+from models.nomination import as_utc
 from motor import motor_asyncio
+from pymongo import ASCENDING, IndexModel, UpdateOne
+from pymongo.errors import DuplicateKeyError, OperationFailure, PyMongoError
+from structures.diagnostics import diagnostics
+from structures.resilience import DatabaseUnavailable, resilience
+from structures.tenancy import current_tenant
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+# Indexes the bot's own queries rely on, named the way the admin models name them.
+INDEXES = {
+    "users": [IndexModel([("user_id", ASCENDING)], name="user_id_1", unique=True)],
+    "votes": [
+        IndexModel([("user_id", ASCENDING), ("nomination_id", ASCENDING)], name="user_id_1_nomination_id_1", unique=True)
+    ],
+}
+
+
+# Delivery state kept on ``users`` by the broadcaster.
+DELIVERY_UPDATES = {
+    "success": {"$set": {"is_blocked": False, "is_deactivated": False, "delivery_failures": 0}},
+    "blocked": {"$set": {"is_blocked": True}, "$inc": {"delivery_failures": 1}},
+    "deactivated": {"$set": {"is_deactivated": True}, "$inc": {"delivery_failures": 1}},
+    "failed": {"$inc": {"delivery_failures": 1}},
+}
+UNREACHABLE_EXCLUDED = {"is_blocked": {"$ne": True}, "is_deactivated": {"$ne": True}}
+
+VOTING_CLOSED = "⏳ Bu nominatsiyada ovoz berish hozir yopiq."
+NOT_REGISTERED = "📝 Ovoz berish uchun avval botda ro'yxatdan o'ting: /start"
+VOTE_RETRY = "🔄 Ovozingizni saqlab bo'lmadi. Iltimos, yana bir bor urinib ko'ring."
+ALREADY_VOTED = "🚨 Siz ushbu ishtirokchi uchun allaqachon ovoz bergansiz! Boshqa ishtirokchiga ovoz bermoqchimisiz?"
+
+
+class OpenNominations:
+    """
+    Nominations accepting votes, built from one loaded nominations list.
+
+    Valid until that list is replaced or the next ``opens_at``/``closes_at``
+    of an active nomination passes, whichever comes first.
+    """
+
+    def __init__(self, nominations: list[Nomination]):
+        now = datetime.datetime.now(datetime.timezone.utc)
+        self.source = nominations
+        self.ordered = [nomination for nomination in nominations if nomination.is_open(now)]
+        self.by_id = {str(nomination.id): nomination for nomination in self.ordered}
+        self.known = {str(nomination.id) for nomination in nominations}
+        boundaries = [
+            as_utc(moment).timestamp()
+            for nomination in nominations if nomination.is_active
+            for moment in (nomination.opens_at, nomination.closes_at)
+            if moment is not None and as_utc(moment) > now
+        ]
+        self.expires = min(boundaries, default=math.inf)
+
+    def valid_for(self, nominations: list[Nomination]) -> bool:
+        return self.source is nominations and time.time() < self.expires
+
+
+class TenantDatabase:
+    """Database handles and the nominations cache of one tenant."""
+
+    def __init__(self, client: motor_asyncio.AsyncIOMotorClient, name: str):
+        self.name = name
+        # Votes, users and bookkeeping: primary with the configured write concern
+        self.db = client[name]
+        # Read-mostly data (nominations, standings, user lists), may be served by secondaries
+        self.read_db = client.get_database(
+            name, read_preference=make_read_preference(conf.db.read_preference, conf.db.max_staleness)
+        )
+        self.nominations = None
+        self.nominations_at = 0.0
+        self.open_nominations: OpenNominations | None = None
+        self.lock = asyncio.Lock()
+        # user_id -> (loaded_at, {nomination_id: participant_name}), least recently used first
+        self.vote_maps: OrderedDict[int, tuple[float, dict]] = OrderedDict()
+
+
 class MongoDB:
+    """
+    Data access for the bot.
+
+    The Motor client is created on first use inside a running event loop and
+    re-created if a later loop uses it (``asyncio.run`` in tools and scripts),
+    so importing this module never opens connections. :meth:`connect` is the
+    explicit startup step.
+
+    Every tenant shares the client and its connection pool; ``db``, ``read_db``
+    and the nominations cache resolve to the database of ``current_tenant``.
+    """
+
     def __init__(self):
-        print(f"Connecting to MongoDB: {conf.db.uri}")
-        self.client = motor_asyncio.AsyncIOMotorClient(conf.db.uri)
-        self.db = self.client[conf.db.database]
-        logger.info(f"Connected to MongoDB: {conf.db.uri}")
+        self._client = None
+        self._loop = None
+        self._tenants: dict[str, TenantDatabase] = {}
+        # Called with each freshly loaded nominations list, in the tenant's context
+        self.nominations_listeners: list = []
+
+    def _ensure_client(self) -> motor_asyncio.AsyncIOMotorClient:
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            if self._client is not None:
+                self._client.close()
+            self._client = motor_asyncio.AsyncIOMotorClient(conf.db.uri, io_loop=loop, **conf.db.client_options)
+            self._loop = loop
+            self._tenants = {}
+        return self._client
+
+    @property
+    def tenant(self) -> TenantDatabase:
+        client = self._ensure_client()
+        name = current_tenant.get().database
+        tenant = self._tenants.get(name)
+        if tenant is None:
+            tenant = self._tenants[name] = TenantDatabase(client, name)
+        return tenant
+
+    @property
+    def client(self) -> motor_asyncio.AsyncIOMotorClient:
+        return self._ensure_client()
+
+    @property
+    def db(self):
+        return self.tenant.db
+
+    @property
+    def read_db(self):
+        return self.tenant.read_db
+
+    async def connect(self) -> None:
+        """Check that MongoDB answers, verify indexes and load the nominations cache."""
+        started = time.monotonic()
+        await self.client.admin.command("ping")
+        await self.ensure_indexes()
+        nominations = await self.get_nominations(fresh=True)
+        logger.info(
+            "MongoDB ready: database %s, %d nominations cached in %.3fs",
+            self.tenant.name, len(nominations), time.monotonic() - started,
+        )
 
-    async def get_user(self, user_id):
-        """Get user by Telegram ID, compatible with User model"""
-        return await self.db.users.find_one({"user_id": user_id})
+    async def ensure_indexes(self) -> None:
+        for collection, indexes in INDEXES.items():
+            try:
+                await self.db[collection].create_indexes(indexes)
+            except OperationFailure as e:
+                # An index with other options already exists, or existing data violates uniqueness.
+                logger.error("Could not verify indexes on %s: %s", collection, e)
 
-    async def user_update(self, user_id, data=None):
+    def forget(self, database: str) -> None:
+        """Drop the cached handles of a tenant that was removed."""
+        self._tenants.pop(database, None)
+
+    def close(self) -> None:
+        if self._client is not None:
+            self._client.close()
+        self._client = self._loop = None
+        self._tenants = {}
+
+    @diagnostics.watched("db.get_user")
+    @resilience.guarded("db.get_user", idempotent=True)
+    async def get_user(self, user_id) -> User | None:
+        """Get user by Telegram ID"""
+        document = await self.db.users.find_one({"user_id": user_id})
+        return User.from_document(document) if document else None
+
+    @diagnostics.watched("db.user_update")
+    @resilience.guarded("db.user_update", idempotent=True)
+    async def user_update(self, user_id, data=None) -> User:
         """
         Update user data, maintaining compatibility with User model
         """
@@ -45,90 +205,363 @@ class MongoDB:
 
         return user_info
 
-    async def users_list(self):
-        return await self.db.users.find().to_list(length=None)
+    @diagnostics.watched("db.users_list")
+    async def users_list(self) -> list[User]:
+        return [User.from_document(document) async for document in self.read_db.users.find()]
+
+    @diagnostics.watched("db.broadcast_targets")
+    async def broadcast_targets(self, include_unreachable=False):
+        """User IDs to broadcast to, without users who blocked the bot or deleted their account."""
+        query = {} if include_unreachable else UNREACHABLE_EXCLUDED
+        users = await self.read_db.users.find(query, {"user_id": 1, "_id": 0}).to_list(length=None)
+        return [user["user_id"] for user in users]
+
+    @diagnostics.watched("db.count_unreachable")
+    async def count_unreachable(self):
+        return await self.read_db.users.count_documents({"$or": [{"is_blocked": True}, {"is_deactivated": True}]})
+
+    @diagnostics.watched("db.record_deliveries")
+    @resilience.guarded("db.record_deliveries")
+    async def record_deliveries(self, outcomes):
+        """
+        Store the latest delivery outcome per user in one bulk write.
+
+        :param outcomes: ``{user_id: outcome}`` with outcomes from ``DELIVERY_UPDATES``
+        """
+        now = datetime.datetime.now(datetime.timezone.utc)
+        operations = []
+        for user_id, outcome in outcomes.items():
+            update = DELIVERY_UPDATES[outcome]
+            # Every write bumps updated_at, or incremental backups would miss it.
+            fields = {**update.get("$set", {}), "updated_at": now}
+            if outcome == "success":
+                fields["last_delivery_at"] = now
+            update = {**update, "$set": fields}
+            operations.append(UpdateOne({"user_id": user_id}, update))
+        if operations:
+            await self.db.users.bulk_write(operations, ordered=False)
+
+    @diagnostics.watched("db.set_reachable")
+    @resilience.guarded("db.set_reachable", idempotent=True)
+    async def set_reachable(self, user_id, reachable):
+        """Reflect a private chat block/unblock reported by ``my_chat_member``."""
+        update = {"is_blocked": not reachable, "updated_at": datetime.datetime.now(datetime.timezone.utc)}
+        if reachable:
+            update.update(is_deactivated=False, delivery_failures=0)
+        await self.db.users.update_one({"user_id": user_id}, {"$set": update})
+
+    @diagnostics.watched("db.record_activity")
+    @resilience.guarded("db.record_activity", idempotent=True)
+    async def record_activity(self, seen):
+        """
+        Move ``last_active_at`` forward for many users in one unordered bulk write.
+
+        :param seen: ``{user_id: datetime}``
+        """
+        operations = [
+            UpdateOne({"user_id": user_id}, {"$max": {"last_active_at": seen_at}})
+            for user_id, seen_at in seen.items()
+        ]
+        if operations:
+            await self.db.users.bulk_write(operations, ordered=False)
+
+    @resilience.guarded("db.load_nominations", idempotent=True)
+    async def _load_nominations(self, filter_query=None) -> list[Nomination]:
+        cursor = self.read_db.nominations.find(filter_query or {}, Nomination.LISTING)
+        return [Nomination.from_document(document) async for document in cursor]
+
+    def _cached_nominations(self, nomination_id=None):
+        """Last loaded nominations, used while the database is unavailable."""
+        nominations = self.tenant.nominations
+        if nominations is None:
+            return None
+        if nomination_id is None:
+            return nominations
+        return [n for n in nominations if n.id == nomination_id]
+
+    @diagnostics.watched("db.get_nominations")
+    async def get_nominations(self, fresh=False) -> list[Nomination]:
+        """
+        All nominations, served from memory for ``NOMINATIONS_CACHE_TTL`` seconds.
+
+        Pass ``fresh=True`` where current vote counts matter. While the database
+        is unavailable the last loaded list is returned, however old.
+        """
+        tenant = self.tenant
+        async with tenant.lock:
+            expired = time.monotonic() - tenant.nominations_at > conf.db.nominations_ttl
+            if fresh or tenant.nominations is None or expired:
+                previous = tenant.nominations
+                try:
+                    tenant.nominations = await self._load_nominations()
+                except DatabaseUnavailable:
+                    if tenant.nominations is None:
+                        raise
+                    logger.warning("Serving cached nominations while the database is unavailable")
+                    return tenant.nominations
+                tenant.nominations_at = time.monotonic()
+                if previous is not None:
+                    self._forget_invalidated_votes(tenant, previous, tenant.nominations)
+                for listener in self.nominations_listeners:
+                    listener(tenant.nominations)
+            return tenant.nominations
 
-    async def get_nominations(self):
-        return await self.db.nominations.find().to_list(length=None)
+    async def _open_index(self) -> OpenNominations:
+        nominations = await self.get_nominations()
+        tenant = self.tenant
+        if tenant.open_nominations is None or not tenant.open_nominations.valid_for(nominations):
+            tenant.open_nominations = OpenNominations(nominations)
+        return tenant.open_nominations
+
+    async def get_open_nominations(self) -> list[Nomination]:
+        """Nominations inside their voting window, from memory; they open and close on time."""
+        return (await self._open_index()).ordered
+
+    async def is_open(self, nomination_id) -> bool:
+        """
+        Whether a nomination accepts votes now, without a round trip for known nominations.
 
-    async def get_nomination(self, nomination_id):
+        A nomination created after the cache was loaded is read from the database.
+        """
+        index = await self._open_index()
+        if str(nomination_id) in index.by_id:
+            return True
+        if str(nomination_id) in index.known:
+            return False
+        nomination = await self.get_nomination(nomination_id)
+        return nomination is not None and nomination.is_open(datetime.datetime.now(datetime.timezone.utc))
+
+    async def find_nomination(self, nomination_id) -> Nomination | None:
+        """
+        A nomination from the cached list, vote counts up to ``NOMINATIONS_CACHE_TTL`` old.
+
+        Only a nomination created after the list was loaded is read from the database.
+        """
+        for nomination in await self.get_nominations():
+            if str(nomination.id) == str(nomination_id):
+                return nomination
+        return await self.get_nomination(nomination_id)
+
+    @diagnostics.watched("db.get_nomination")
+    async def get_nomination(self, nomination_id) -> Nomination | None:
         if isinstance(nomination_id, str) and ObjectId.is_valid(nomination_id):
             nomination_id = ObjectId(nomination_id)
-        return await self.db.nominations.find_one({"_id": nomination_id})
+        try:
+            nominations = await self._load_nominations({"_id": nomination_id})
+        except DatabaseUnavailable:
+            nominations = self._cached_nominations(nomination_id)
+            if nominations is None:
+                raise
+        return nominations[0] if nominations else None
 
-    async def get_participants(self, nomination_id=None):
+    @diagnostics.watched("db.get_participants")
+    async def get_participants(self, nomination_id=None) -> list[Participant]:
         filter_query = {}
         if nomination_id:
             if isinstance(nomination_id, str) and ObjectId.is_valid(nomination_id):
                 nomination_id = ObjectId(nomination_id)
             filter_query["_id"] = nomination_id
         
-        nominations = await self.db.nominations.find(filter_query).to_list(length=None)
-        participants = []
-        for nomination in nominations:
-            if "participants" in nomination:
-                participants.extend(nomination["participants"])
-
-        return participants
+        try:
+            nominations = await self._load_nominations(filter_query)
+        except DatabaseUnavailable:
+            nominations = self._cached_nominations(nomination_id)
+            if nominations is None:
+                raise
+        return [participant for nomination in nominations for participant in nomination.participants]
     
+    def _cached_vote_map(self, user_id) -> dict | None:
+        vote_maps = self.tenant.vote_maps
+        entry = vote_maps.get(user_id)
+        if entry is None:
+            return None
+        if time.monotonic() - entry[0] > conf.db.vote_map_ttl:
+            del vote_maps[user_id]
+            return None
+        vote_maps.move_to_end(user_id)
+        return entry[1]
+
+    def forget_vote_map(self, user_id) -> None:
+        self.tenant.vote_maps.pop(user_id, None)
+
+    @staticmethod
+    def _forget_invalidated_votes(tenant: TenantDatabase, previous, nominations) -> None:
+        """Drop the vote maps that mention a nomination whose votes the admin panel removed since ``previous``."""
+        before = {nomination.id: nomination.votes_invalidated_at for nomination in previous}
+        changed = {
+            str(nomination.id) for nomination in nominations
+            if nomination.votes_invalidated_at is not None
+            and nomination.votes_invalidated_at != before.get(nomination.id)
+        }
+        if not changed:
+            return
+        stale = [user_id for user_id, (_, votes) in tenant.vote_maps.items() if not changed.isdisjoint(votes)]
+        for user_id in stale:
+            del tenant.vote_maps[user_id]
+        logger.info("Votes removed in %d nominations, dropped %d cached vote maps", len(changed), len(stale))
+
+    @resilience.guarded("db.load_vote_map", idempotent=True)
+    async def _load_vote_map(self, user_id) -> dict:
+        cursor = self.db.votes.find({"user_id": user_id}, Vote.CHOICE)
+        return {str(document["nomination_id"]): document["participant_name"] async for document in cursor}
+
+    @diagnostics.watched("db.get_vote_map")
+    async def get_vote_map(self, user_id) -> dict:
+        """
+        The user's votes as ``{nomination_id: participant_name}``, kept in memory.
+
+        Up to ``VOTE_MAP_CACHE_SIZE`` users are cached, least recently used
+        evicted first, and a map is reloaded after ``VOTE_MAP_CACHE_TTL``
+        seconds to pick up votes changed by the admin panel or scripts. Votes
+        removed by a fraud invalidation drop the affected maps at the next
+        nominations reload instead. The returned dict is the cached one; do
+        not modify it.
+        """
+        votes = self._cached_vote_map(user_id)
+        if votes is None:
+            votes = await self._load_vote_map(user_id)
+            vote_maps = self.tenant.vote_maps
+            vote_maps[user_id] = (time.monotonic(), votes)
+            while len(vote_maps) > conf.db.vote_map_size:
+                vote_maps.popitem(last=False)
+        return votes
+
+    @diagnostics.watched("db.add_vote")
     async def add_vote(self, nomination_id, participant_name, user_id):
         """
         Record a vote, structured to maintain compatibility with Vote model
+
+        Repeat and changed votes are told apart from the user's cached vote
+        map. The unique ``(user_id, nomination_id)`` index and a delete that
+        matches the previous choice catch a stale map; it is then reloaded
+        and the vote tried once more.
+
+        Only the reads carry retrying deadlines. The writes of one attempt run
+        shielded (see :meth:`Resilience.shielded`), so a timeout never leaves
+        a vote stored without its counter update.
         """
         if isinstance(nomination_id, str) and ObjectId.is_valid(nomination_id):
             nomination_id = ObjectId(nomination_id)
         
-        # Ensure user exists
-        user = await self.get_user(user_id)
-        if not user:
-            return False, "User not found"
-            
-        # Check for existing vote
-        existing_vote = await self.db.votes.find_one({
-            "nomination_id": nomination_id,
-            "user_id": user_id
-        })
-        
-        if existing_vote and existing_vote.get("participant_name") == participant_name:
-            return False, "🚨 Siz ushbu ishtirokchi uchun allaqachon ovoz bergansiz! Boshqa ishtirokchiga ovoz bermoqchimisiz?"
+        if not await self.is_open(nomination_id):
+            return False, VOTING_CLOSED
+
+        # A user with a cached vote map has been seen voting already.
+        if self._cached_vote_map(user_id) is None and not await self.get_user(user_id):
+            return False, NOT_REGISTERED
+
+        try:
+            for attempt in range(2):
+                votes = await self.get_vote_map(user_id)
+                previous = votes.get(str(nomination_id))
+                if previous == participant_name:
+                    return False, ALREADY_VOTED
+                replaced = await resilience.shielded(
+                    "db.add_vote", functools.partial(self._replace_vote, nomination_id, participant_name, user_id, previous)
+                )
+                if replaced:
+                    break
+                self.forget_vote_map(user_id)
+            else:
+                logger.warning("Vote of user %s in %s kept changing concurrently", user_id, nomination_id)
+                return False, VOTE_RETRY
+        except BaseException:
+            self.forget_vote_map(user_id)
+            raise
+        votes[str(nomination_id)] = participant_name
+        self._count_cached(nomination_id, previous, participant_name)
         
-        # Handle vote change
-        if existing_vote:
-            previous_participant = existing_vote.get("participant_name")
+        # Generate appropriate message
+        message = "🎯 Ajoyib tanlov! Ovozingiz muvaffaqiyatli qabul qilindi."
+        if previous is not None:
+            message = f"🔄 Sizning ovozingiz {previous} ishtirokchisidan {participant_name} ishtirokchisiga muvofaqqiyatli o'zgartirildi!"
+            
+        return True, message
+
+    def _count_cached(self, nomination_id, previous, participant_name) -> None:
+        """Apply this process's own vote to the cached nominations, so the voter sees it before the next reload."""
+        for nomination in self.tenant.nominations or ():
+            if nomination.id == nomination_id:
+                for participant in nomination.participants:
+                    if participant.name == previous:
+                        participant.votes -= 1
+                    elif participant.name == participant_name:
+                        participant.votes += 1
+                return
+
+    async def _replace_vote(self, nomination_id, participant_name, user_id, previous) -> bool:
+        """
+        Swap the stored vote from ``previous`` (``None`` for a first vote); ``False`` if the database disagrees.
+
+        If a write fails after the first one was sent, the nomination's
+        counters are rebuilt from its votes before the error propagates.
+        """
+        try:
+            if previous is not None:
+                deleted = await self.db.votes.delete_one({
+                    "nomination_id": nomination_id,
+                    "user_id": user_id,
+                    "participant_name": previous,
+                })
+                if not deleted.deleted_count:
+                    return False
+                await self.db.nominations.update_one(
+                    {
+                        "_id": nomination_id,
+                        "participants.name": previous
+                    },
+                    {"$inc": {"participants.$.votes": -1}}
+                )
+
+            # Create new vote with fields compatible with Vote model
+            now = datetime.datetime.now(datetime.timezone.utc)
+            vote = Vote(user_id, nomination_id, participant_name, now)
+            try:
+                await self.db.votes.insert_one(vote.to_document())
+            except DuplicateKeyError:
+                return False
+
+            # Update participant vote count
             await self.db.nominations.update_one(
                 {
                     "_id": nomination_id,
-                    "participants.name": previous_participant
+                    "participants.name": participant_name
                 },
-                {"$inc": {"participants.$.votes": -1}}
+                {"$inc": {"participants.$.votes": 1}}
             )
-            await self.db.votes.delete_one({"_id": existing_vote["_id"]})
-        
-        # Create new vote with fields compatible with Vote model
-        now = datetime.datetime.now(datetime.timezone.utc)
-        vote = {
-            "nomination_id": nomination_id,
-            "participant_name": participant_name,
-            "user_id": user_id,
-            "voted_at": now
-        }
-        await self.db.votes.insert_one(vote)
-        
-        # Update participant vote count
-        await self.db.nominations.update_one(
-            {
-                "_id": nomination_id,
-                "participants.name": participant_name
-            },
-            {"$inc": {"participants.$.votes": 1}}
-        )
-        
-        # Generate appropriate message
-        message = "🎯 Ajoyib tanlov! Ovozingiz muvaffaqiyatli qabul qilindi."
-        if existing_vote:
-            message = f"🔄 Sizning ovozingiz {existing_vote.get('participant_name')} ishtirokchisidan {participant_name} ishtirokchisiga muvofaqqiyatli o'zgartirildi!"
-            
-        return True, message
+            return True
+        except PyMongoError:
+            try:
+                await self.recount(nomination_id)
+            except PyMongoError:
+                logger.exception("Could not recount nomination %s after a failed vote", nomination_id)
+            raise
+
+    async def recount(self, nomination_id) -> int:
+        """
+        Set every participant's counter of a nomination to the number of its stored votes.
 
+        Only counters that are off are written; returns how many were.
+        """
+        pipeline = [
+            {"$match": {"nomination_id": nomination_id}},
+            {"$group": {"_id": "$participant_name", "votes": {"$sum": 1}}},
+        ]
+        counts = {row["_id"]: row["votes"] async for row in self.db.votes.aggregate(pipeline)}
+        nomination = await self.db.nominations.find_one({"_id": nomination_id}, Nomination.LISTING)
+        if nomination is None:
+            return 0
+        operations = [
+            UpdateOne(
+                {"_id": nomination_id, "participants.name": participant["name"]},
+                {"$set": {"participants.$.votes": counts.get(participant["name"], 0)}},
+            )
+            for participant in nomination.get("participants", ())
+            if participant.get("votes", 0) != counts.get(participant["name"], 0)
+        ]
+        if operations:
+            await self.db.nominations.bulk_write(operations, ordered=False)
+            logger.warning("Recounted %d vote counters of nomination %s", len(operations), nomination_id)
+        return len(operations)
 
 db = MongoDB()
\ No newline at end of file
@@ -0,0 +1,230 @@
+"""Runtime diagnostics: event-loop lag, slow calls and on-demand sampling profiles."""
+import asyncio
+import functools
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from contextlib import asynccontextmanager, suppress
+
+from configuration import conf
+from structures.tenancy import current_tenant
+
+logger = logging.getLogger(__name__)
+
+
+def _frame_label(frame) -> str:
+    module = frame.f_globals.get("__name__", "?")
+    return f"{module}:{frame.f_code.co_qualname}"
+
+
+def _await_chain(task: asyncio.Task) -> list:
+    """Follow ``cr_await`` from the task's coroutine down to where it is suspended."""
+    frames = []
+    awaitable = task.get_coro()
+    while awaitable is not None:
+        frame = getattr(awaitable, "cr_frame", None) or getattr(awaitable, "ag_frame", None)
+        if frame is None:
+            break
+        frames.append(frame)
+        awaitable = getattr(awaitable, "cr_await", None) or getattr(awaitable, "ag_await", None)
+    return frames
+
+
+def _format_frames(frames: list) -> str:
+    return "".join(
+        traceback.format_list([(f.f_code.co_filename, f.f_lineno, f.f_code.co_name, None) for f in frames])
+    )
+
+
+class LoopLagMonitor:
+    """
+    Measures how late the event loop wakes up a periodic timer.
+
+    A watchdog thread complements the in-loop timer: when the loop stops ticking
+    for longer than the threshold it captures the loop thread's current stack,
+    which points straight at the blocking code.
+    """
+
+    def __init__(self, interval: float, threshold: float):
+        self.interval = interval
+        self.threshold = threshold
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.total_lag = 0.0
+        self.samples = 0
+        self._last_tick = time.monotonic()
+        self._loop_thread_id = None
+        self._task = None
+        self._watchdog = None
+        self._stopped = threading.Event()
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            self._last_tick = time.monotonic()
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            self.total_lag += lag
+            self.samples += 1
+            if lag > self.threshold:
+                logger.warning("Event loop lag %.3fs (threshold %.3fs)", lag, self.threshold)
+
+    def _watch(self) -> None:
+        reported = False
+        while not self._stopped.wait(self.interval):
+            stalled = time.monotonic() - self._last_tick - self.interval
+            if stalled <= self.threshold:
+                reported = False
+                continue
+            if reported:
+                continue
+            reported = True
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame else "unavailable\n"
+            logger.warning("Event loop blocked for %.3fs, loop thread stack:\n%s", stalled, stack)
+
+    def start(self) -> None:
+        self._loop_thread_id = threading.get_ident()
+        self._last_tick = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._run())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-lag-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self) -> None:
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "last_lag_ms": round(self.last_lag * 1000, 1),
+            "max_lag_ms": round(self.max_lag * 1000, 1),
+            "avg_lag_ms": round(self.total_lag / self.samples * 1000, 1) if self.samples else 0.0,
+        }
+
+
+class SamplingProfiler:
+    """Samples the event-loop thread's stack and writes folded stacks for flamegraph tools."""
+
+    def __init__(self, directory: str, interval: float):
+        self.directory = directory
+        self.interval = interval
+        self._lock = asyncio.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+    def _sample(self, thread_id: int, duration: float) -> Counter:
+        stacks = Counter()
+        deadline = time.monotonic() + duration
+        while time.monotonic() < deadline:
+            frame = sys._current_frames().get(thread_id)
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            if labels:
+                stacks[";".join(reversed(labels))] += 1
+            time.sleep(self.interval)
+        return stacks
+
+    def _write(self, stacks: Counter) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"profile-{time.strftime('%Y%m%d-%H%M%S')}.folded")
+        with open(path, "w") as fh:
+            for stack, count in stacks.most_common():
+                fh.write(f"{stack} {count}\n")
+        return path
+
+    async def capture(self, duration: float) -> str:
+        """Profile the running bot for ``duration`` seconds and return the output path."""
+        async with self._lock:
+            logger.info("Sampling profile for %.1fs", duration)
+            stacks = await asyncio.to_thread(self._sample, threading.get_ident(), duration)
+            path = await asyncio.to_thread(self._write, stacks)
+            logger.info("Profile with %d samples written to %s", sum(stacks.values()), path)
+            return path
+
+
+class Diagnostics:
+    """Entry point tying the lag monitor, slow-call reports and the profiler together."""
+
+    def __init__(self):
+        self.enabled = conf.diagnostics.enabled
+        self.slow_threshold = conf.diagnostics.slow_threshold
+        self.lag = LoopLagMonitor(conf.diagnostics.lag_interval, conf.diagnostics.lag_threshold)
+        self.profiler = SamplingProfiler(conf.diagnostics.profile_dir, conf.diagnostics.profile_interval)
+
+    def start(self) -> None:
+        if not self.enabled:
+            return
+        self.lag.start()
+        loop = asyncio.get_running_loop()
+        with suppress(NotImplementedError, AttributeError):
+            loop.add_signal_handler(signal.SIGUSR1, self._on_signal)
+
+    async def stop(self) -> None:
+        if not self.enabled:
+            return
+        with suppress(NotImplementedError, AttributeError):
+            asyncio.get_running_loop().remove_signal_handler(signal.SIGUSR1)
+        await self.lag.stop()
+
+    def _on_signal(self) -> None:
+        if self.profiler.running:
+            logger.warning("Profile already in progress, ignoring SIGUSR1")
+            return
+        asyncio.create_task(self.profiler.capture(conf.diagnostics.profile_duration))
+
+    def _report_slow(self, name: str, tenant: str, task: asyncio.Task, started: float) -> None:
+        elapsed = time.monotonic() - started
+        logger.warning(
+            "%s (tenant %s) still running after %.3fs, awaiting at:\n%s",
+            name, tenant, elapsed, _format_frames(_await_chain(task)),
+        )
+
+    @asynccontextmanager
+    async def watch(self, name: str):
+        """Report ``name`` with its await stack if it runs longer than the slow-call threshold."""
+        task = asyncio.current_task()
+        if not self.enabled or task is None:
+            yield
+            return
+        started = time.monotonic()
+        tenant = current_tenant.get().id
+        timer = asyncio.get_running_loop().call_later(
+            self.slow_threshold, self._report_slow, name, tenant, task, started
+        )
+        try:
+            yield
+        finally:
+            timer.cancel()
+            elapsed = time.monotonic() - started
+            if elapsed > self.slow_threshold:
+                logger.warning("%s (tenant %s) took %.3fs", name, tenant, elapsed)
+
+    def watched(self, name: str):
+        """Decorator form of :meth:`watch` for coroutine functions."""
+        def decorator(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                async with self.watch(name):
+                    return await func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+
+diagnostics = Diagnostics()
@@ -0,0 +1,92 @@
+"""Housekeeping jobs: vote counter reconciliation and stale FSM state cleanup."""
+import datetime
+import logging
+import time
+
+from aiogram import Dispatcher
+from aiogram.fsm.storage.memory import MemoryStorage
+from configuration import conf
+from models import Nomination
+from pymongo.errors import PyMongoError
+from structures.database import db
+from structures.schedule import IntervalTrigger, scheduler
+from structures.tenancy import DEFAULT_TENANT, Tenant, using_tenant
+from structures.tenants import tenant_manager
+
+logger = logging.getLogger(__name__)
+
+
+class Maintenance:
+    """
+    Periodic housekeeping, both jobs every ``MAINTENANCE_INTERVAL`` seconds.
+
+    ``reconcile_counters`` runs on one replica and rebuilds the participant
+    counters of every closed nomination from its stored votes, once per
+    nomination and process. A closed nomination takes no votes, so the recount
+    cannot race one; archived nominations have no votes left to count and are
+    skipped. Open nominations are recounted after a failed vote write instead.
+
+    ``fsm_cleanup`` runs on every replica, since FSM state lives in the
+    process. :class:`MemoryStorage` keeps a record for every chat it has seen:
+    empty records are dropped, and a state left untouched for
+    ``FSM_STATE_TTL`` seconds (an abandoned registration, broadcast or
+    search) is cleared.
+    """
+
+    def __init__(self):
+        self.dp: Dispatcher | None = None
+        self._reconciled: dict[str, set] = {}
+        # storage key -> (state and data when first seen, first seen at)
+        self._states: dict = {}
+
+    def attach(self, dp: Dispatcher) -> None:
+        self.dp = dp
+        interval = conf.bot.maintenance_interval
+        scheduler.add_job("reconcile_counters", self.reconcile_counters, IntervalTrigger(interval), lease_ttl=interval * 2)
+        scheduler.add_job("fsm_cleanup", self.clean_states, IntervalTrigger(interval), lease=False)
+
+    async def reconcile_counters(self) -> None:
+        for tenant in {DEFAULT_TENANT, *tenant_manager.tenants.values()}:
+            with using_tenant(tenant):
+                try:
+                    await self._reconcile_tenant(tenant)
+                except PyMongoError:
+                    logger.exception("Could not reconcile vote counters of %s", tenant.id)
+
+    async def _reconcile_tenant(self, tenant: Tenant) -> None:
+        reconciled = self._reconciled.setdefault(tenant.database, set())
+        now = datetime.datetime.now(datetime.timezone.utc)
+        cursor = db.db.nominations.find({"votes_archived_at": None}, Nomination.LISTING)
+        async for document in cursor:
+            nomination = Nomination.from_document(document)
+            if nomination.id in reconciled or nomination.is_open(now):
+                continue
+            await db.recount(nomination.id)
+            reconciled.add(nomination.id)
+
+    async def clean_states(self) -> None:
+        storage = self.dp.storage if self.dp else None
+        if not isinstance(storage, MemoryStorage):
+            # Other storages expire their keys themselves
+            return
+        now = time.monotonic()
+        states = {}
+        cleared = 0
+        for key, record in list(storage.storage.items()):
+            if record.state is None and not record.data:
+                del storage.storage[key]
+                continue
+            snapshot = (record.state, repr(record.data))
+            seen = self._states.get(key)
+            since = seen[1] if seen and seen[0] == snapshot else now
+            if now - since >= conf.bot.fsm_state_ttl:
+                del storage.storage[key]
+                cleared += 1
+                continue
+            states[key] = (snapshot, since)
+        self._states = states
+        if cleared:
+            logger.info("Cleared %d stale FSM states", cleared)
+
+
+maintenance = Maintenance()
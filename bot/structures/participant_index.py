@@ -0,0 +1,185 @@
+"""In-memory participant search for inline queries."""
+import datetime
+import heapq
+import logging
+from dataclasses import dataclass
+
+from configuration import conf
+from keyboards.common_kb import participant_key
+from models import Nomination, Participant
+from structures.database import db
+from structures.resilience import DatabaseUnavailable
+from structures.schedule import IntervalTrigger, scheduler
+from structures.tenancy import Tenant, current_tenant, using_tenant
+
+logger = logging.getLogger(__name__)
+
+# Uzbek Latin is typed with any of these in place of the apostrophe in o' and g'.
+APOSTROPHES = str.maketrans({"‘": "'", "’": "'", "ʻ": "'", "ʼ": "'", "`": "'"})
+PREFIX_LENGTH = 2
+
+
+def normalize(text: str) -> str:
+    return " ".join(text.translate(APOSTROPHES).casefold().split())
+
+
+def trigrams(text: str) -> set:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+@dataclass
+class Entry:
+    id: str
+    nomination_id: str
+    nomination_title: str
+    name: str
+    key: str
+    votes: int
+    text: str
+
+
+class TenantIndex:
+    """
+    Participants of one tenant's open nominations, searchable by substring.
+
+    Names are indexed by trigram for queries of three or more characters and
+    by word prefix for shorter ones. Only nominations whose title or
+    participant names changed are re-indexed on :meth:`update`, vote counts
+    are updated in place.
+    """
+
+    def __init__(self):
+        self.entries: dict[str, Entry] = {}
+        self._nominations: dict[str, tuple] = {}
+        self._trigrams: dict[str, set] = {}
+        self._prefixes: dict[str, set] = {}
+
+    def update(self, nominations: list[Nomination]) -> None:
+        seen = set()
+        now = datetime.datetime.now(datetime.timezone.utc)
+        for nomination in nominations:
+            if not nomination.is_open(now):
+                continue
+            nomination_id = str(nomination.id)
+            seen.add(nomination_id)
+            participants = nomination.participants
+            signature = (nomination.title, tuple(p.name for p in participants))
+            indexed = self._nominations.get(nomination_id)
+            if indexed is not None and indexed[0] == signature:
+                for entry_id, participant in zip(indexed[1], participants):
+                    self.entries[entry_id].votes = participant.votes
+                continue
+            if indexed is not None:
+                self._remove(nomination_id)
+            self._add(nomination_id, signature, nomination.title, participants)
+        for nomination_id in [n for n in self._nominations if n not in seen]:
+            self._remove(nomination_id)
+
+    def _add(self, nomination_id: str, signature: tuple, title: str, participants: list[Participant]) -> None:
+        entry_ids = []
+        for participant in participants:
+            key = participant_key(participant.name)
+            entry = Entry(
+                id=f"{nomination_id}:{key}",
+                nomination_id=nomination_id,
+                nomination_title=title,
+                name=participant.name,
+                key=key,
+                votes=participant.votes,
+                text=normalize(participant.name),
+            )
+            self.entries[entry.id] = entry
+            entry_ids.append(entry.id)
+            for gram in trigrams(entry.text):
+                self._trigrams.setdefault(gram, set()).add(entry.id)
+            for word in entry.text.split():
+                for length in range(1, PREFIX_LENGTH + 1):
+                    self._prefixes.setdefault(word[:length], set()).add(entry.id)
+        self._nominations[nomination_id] = (signature, entry_ids)
+
+    def _remove(self, nomination_id: str) -> None:
+        _, entry_ids = self._nominations.pop(nomination_id)
+        for entry_id in entry_ids:
+            entry = self.entries.pop(entry_id, None)
+            if entry is None:
+                continue
+            for gram in trigrams(entry.text):
+                self._discard(self._trigrams, gram, entry_id)
+            for word in entry.text.split():
+                for length in range(1, PREFIX_LENGTH + 1):
+                    self._discard(self._prefixes, word[:length], entry_id)
+
+    @staticmethod
+    def _discard(index: dict, token: str, entry_id: str) -> None:
+        ids = index.get(token)
+        if ids is not None:
+            ids.discard(entry_id)
+            if not ids:
+                del index[token]
+
+    def search(self, query: str, limit: int, offset: int = 0) -> list[Entry]:
+        """
+        Participants whose name contains ``query``, names starting with it first, then by votes.
+
+        An empty query lists the most voted participants.
+        """
+        text = normalize(query)
+        if not text:
+            return heapq.nlargest(offset + limit, self.entries.values(), key=lambda e: e.votes)[offset:]
+        if len(text) <= PREFIX_LENGTH:
+            candidates = self._prefixes.get(text, ())
+        else:
+            postings = sorted((self._trigrams.get(gram, set()) for gram in trigrams(text)), key=len)
+            candidates = set.intersection(*postings) if postings[0] else ()
+        matches = [self.entries[entry_id] for entry_id in candidates]
+        matches = [entry for entry in matches if text in entry.text]
+        matches.sort(key=lambda e: (not e.text.startswith(text), -e.votes, e.name))
+        return matches[offset:offset + limit]
+
+
+class ParticipantIndex:
+    """
+    Inline search without a database round trip, one :class:`TenantIndex` per tenant.
+
+    Every nominations list the database layer loads is indexed right away;
+    a scheduler job also re-reads the (cached) nominations of every indexed
+    tenant each ``INLINE_INDEX_INTERVAL`` seconds, which keeps vote counts
+    moving and opens or closes voting windows on time.
+    """
+
+    def __init__(self):
+        self._indexes: dict[Tenant, TenantIndex] = {}
+
+    def attach(self) -> None:
+        db.nominations_listeners.append(self.update)
+        scheduler.add_job("participant_index", self.refresh, IntervalTrigger(conf.bot.inline_index_interval), lease=False)
+
+    @property
+    def current(self) -> TenantIndex:
+        tenant = current_tenant.get()
+        index = self._indexes.get(tenant)
+        if index is None:
+            index = self._indexes[tenant] = TenantIndex()
+        return index
+
+    async def refresh(self) -> None:
+        for tenant in list(self._indexes):
+            with using_tenant(tenant):
+                try:
+                    nominations = await db.get_nominations()
+                except DatabaseUnavailable:
+                    logger.warning("Participant index of %s not refreshed, database unavailable", tenant.id)
+                    continue
+                self.update(nominations)
+
+    def update(self, nominations: list[Nomination]) -> None:
+        self.current.update(nominations)
+
+    def search(self, query: str, limit: int, offset: int = 0) -> list[Entry]:
+        return self.current.search(query, limit, offset)
+
+    def forget(self, tenant: Tenant) -> None:
+        self._indexes.pop(tenant, None)
+
+
+participant_index = ParticipantIndex()
@@ -0,0 +1,160 @@
+"""Deadlines, retries and a circuit breaker around database calls."""
+import asyncio
+import functools
+import logging
+import random
+import time
+
+from configuration import conf
+from pymongo.errors import ConnectionFailure, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+
+class DatabaseUnavailable(Exception):
+    """MongoDB is failing or too slow; the caller should ask the user to try again shortly."""
+
+
+def is_transient(error: PyMongoError) -> bool:
+    """Network errors, elections and anything the server labels as safe to retry."""
+    if isinstance(error, ConnectionFailure):
+        return True
+    return error.has_error_label("RetryableWriteError") or error.has_error_label("TransientTransactionError")
+
+
+class CircuitBreaker:
+    """
+    Opens after ``threshold`` consecutive failures and rejects calls for ``reset_timeout`` seconds.
+
+    After that it is half-open: calls go through again, the first success
+    closes it and the first failure opens it for another ``reset_timeout``.
+    """
+
+    def __init__(self, threshold: int, reset_timeout: float):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.reset_timeout:
+            return "open"
+        return "half-open"
+
+    def allow(self) -> bool:
+        return self.state != "open"
+
+    def record_success(self) -> None:
+        if self.opened_at is not None:
+            logger.info("Database circuit closed")
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == "half-open" or (self.opened_at is None and self.failures >= self.threshold):
+            logger.warning("Database circuit open for %.1fs after %d failures", self.reset_timeout, self.failures)
+            self.opened_at = time.monotonic()
+
+
+class Resilience:
+    """Wraps ``MongoDB`` methods with a deadline, bounded retries and the circuit breaker."""
+
+    def __init__(self):
+        self.timeout = conf.db.op_timeout
+        self.retries = conf.db.retries
+        self.backoff = conf.db.retry_backoff
+        self.breaker = CircuitBreaker(conf.db.breaker_threshold, conf.db.breaker_reset)
+        # Shielded writes whose caller stopped waiting; kept referenced until they finish.
+        self._abandoned: set[asyncio.Task] = set()
+
+    async def call(self, name: str, operation, idempotent: bool = False):
+        """
+        Run ``operation()`` within ``timeout`` seconds.
+
+        Transient errors are retried with jittered exponential backoff when the
+        operation is idempotent, within the same deadline. Timeouts, exhausted
+        retries and an open breaker raise :class:`DatabaseUnavailable`. Other
+        errors (duplicate keys, bad queries) propagate unchanged.
+        """
+        if not self.breaker.allow():
+            raise DatabaseUnavailable(f"{name}: circuit open")
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        attempts = 1 + (self.retries if idempotent else 0)
+        for attempt in range(attempts):
+            try:
+                result = await asyncio.wait_for(operation(), max(deadline - loop.time(), 0))
+            except asyncio.TimeoutError:
+                self.breaker.record_failure()
+                raise DatabaseUnavailable(f"{name}: no answer within {self.timeout}s") from None
+            except PyMongoError as e:
+                if not is_transient(e):
+                    raise
+                self.breaker.record_failure()
+                delay = self.backoff * 2 ** attempt * random.uniform(0.5, 1.5)
+                if attempt + 1 >= attempts or not self.breaker.allow() or loop.time() + delay >= deadline:
+                    raise DatabaseUnavailable(f"{name}: {e}") from e
+                logger.info("%s failed (%s), retry %d in %.2fs", name, e, attempt + 1, delay)
+                await asyncio.sleep(delay)
+            else:
+                self.breaker.record_success()
+                return result
+
+    async def shielded(self, name: str, operation):
+        """
+        Run a multi-step write ``operation()`` to completion, whatever happens to the caller.
+
+        The caller waits at most ``timeout`` seconds and then gets
+        :class:`DatabaseUnavailable`, but the operation itself is never
+        cancelled: a timeout or a cancelled caller leaves it running in the
+        background, so it never stops between two of its writes. Nothing is retried.
+        """
+        if not self.breaker.allow():
+            raise DatabaseUnavailable(f"{name}: circuit open")
+
+        task = asyncio.ensure_future(operation())
+        try:
+            result = await asyncio.wait_for(asyncio.shield(task), self.timeout)
+        except asyncio.TimeoutError:
+            self._abandon(name, task)
+            self.breaker.record_failure()
+            raise DatabaseUnavailable(f"{name}: no answer within {self.timeout}s") from None
+        except PyMongoError as e:
+            if not is_transient(e):
+                raise
+            self.breaker.record_failure()
+            raise DatabaseUnavailable(f"{name}: {e}") from e
+        except asyncio.CancelledError:
+            self._abandon(name, task)
+            raise
+        self.breaker.record_success()
+        return result
+
+    def _abandon(self, name: str, task: asyncio.Task) -> None:
+        if task.done():
+            return
+        logger.info("%s still running after its caller stopped waiting, finishing in the background", name)
+        self._abandoned.add(task)
+        task.add_done_callback(lambda finished: self._settle(name, finished))
+
+    def _settle(self, name: str, task: asyncio.Task) -> None:
+        self._abandoned.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("%s failed in the background", name, exc_info=task.exception())
+
+    def guarded(self, name: str, idempotent: bool = False):
+        """Decorator form of :meth:`call` for coroutine methods."""
+        def decorator(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                return await self.call(name, functools.partial(func, *args, **kwargs), idempotent)
+            return wrapper
+        return decorator
+
+
+resilience = Resilience()
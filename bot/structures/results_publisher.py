@@ -0,0 +1,165 @@
+"""Keeps live standings in the channel without turning vote spikes into edit storms."""
+import hashlib
+import html
+import logging
+import time
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+from configuration import conf
+from models import Nomination, Participant
+from structures.database import db
+from structures.schedule import IntervalTrigger, scheduler
+from structures.tenancy import DEFAULT_TENANT, Tenant, current_tenant, using_tenant
+from structures.tenants import tenant_manager
+
+logger = logging.getLogger(__name__)
+
+MESSAGE_LIMIT = 4096
+MEDALS = ("🥇", "🥈", "🥉")
+
+
+def render_participants(participants: list[Participant], limit: int | None = None) -> list:
+    ranked = sorted(participants, key=lambda p: p.votes, reverse=True)
+    lines = []
+    for place, participant in enumerate(ranked[:limit], start=1):
+        badge = MEDALS[place - 1] if place <= len(MEDALS) else f"{place}."
+        lines.append(f"{badge} {html.escape(participant.name)} — {participant.votes}")
+    return lines
+
+
+def render_summary(nominations: list[Nomination], top: int) -> str:
+    blocks = ["🏆 <b>Jonli natijalar</b>"]
+    for nomination in nominations:
+        lines = render_participants(nomination.participants, top)
+        blocks.append(f"<b>{html.escape(nomination.title)}</b>\n" + "\n".join(lines))
+    return _truncate("\n\n".join(blocks))
+
+
+def render_nomination(nomination: Nomination) -> str:
+    lines = render_participants(nomination.participants)
+    return _truncate(f"🏆 <b>{html.escape(nomination.title)}</b>\n\n" + "\n".join(lines))
+
+
+def _truncate(text: str) -> str:
+    if len(text) <= MESSAGE_LIMIT:
+        return text
+    return text[:text.rfind("\n", 0, MESSAGE_LIMIT - 2)] + "\n…"
+
+
+class ResultsPublisher:
+    """
+    Publishes vote counts to the results chat.
+
+    Votes only call :meth:`mark_dirty`. A scheduler job wakes up every
+    ``RESULTS_INTERVAL`` seconds and, if anything is dirty (or ``RESULTS_REFRESH``
+    seconds passed, which also picks up votes handled by other replicas),
+    renders the messages and edits those whose content actually changed.
+    Message IDs and content digests live in ``channel_messages`` so a restart
+    keeps editing the same pinned message.
+
+    Every tenant is published to its own ``results_chat_id`` by its own bot;
+    its dirty nominations and ``channel_messages`` are kept apart from the
+    others'.
+    """
+
+    def __init__(self):
+        self.bot: Bot | None = None
+        self._dirty: dict[Tenant, set[str]] = {}
+        self._last_refresh = 0.0
+        # (database, message key) -> channel_messages document
+        self._state: dict[tuple, dict] = {}
+
+    def attach(self, bot: Bot) -> None:
+        self.bot = bot
+        scheduler.add_job(
+            "results_publisher",
+            self.publish,
+            IntervalTrigger(conf.results.interval),
+            lease_ttl=max(30.0, conf.results.interval * 6),
+        )
+
+    def mark_dirty(self, nomination_id) -> None:
+        """Queue a nomination of the current tenant for the next publish."""
+        self._dirty.setdefault(current_tenant.get(), set()).add(str(nomination_id))
+
+    def _bot(self, tenant: Tenant) -> Bot | None:
+        if tenant == DEFAULT_TENANT:
+            return self.bot
+        return tenant_manager.bots.get(tenant.id)
+
+    async def publish(self) -> None:
+        refresh = time.monotonic() - self._last_refresh >= conf.results.refresh
+        if not self._dirty and not refresh:
+            return
+        dirty, self._dirty = self._dirty, {}
+        tenants = set(dirty)
+        if refresh:
+            self._last_refresh = time.monotonic()
+            tenants |= {DEFAULT_TENANT, *tenant_manager.tenants.values()}
+
+        error = None
+        for tenant in tenants:
+            with using_tenant(tenant):
+                try:
+                    await self._publish_tenant(tenant, dirty.get(tenant, set()), refresh)
+                except Exception as e:
+                    error = e
+        if error is not None:
+            raise error
+
+    async def _publish_tenant(self, tenant: Tenant, dirty: set, refresh: bool) -> None:
+        bot = self._bot(tenant)
+        if bot is None:
+            # Tenant stopped since its votes came in
+            return
+        try:
+            nominations = await db.get_nominations(fresh=True)
+            await self._sync(bot, tenant, "results:summary", render_summary(nominations, conf.results.top), pin=True)
+            if conf.results.per_nomination:
+                for nomination in nominations:
+                    nomination_id = str(nomination.id)
+                    if refresh or nomination_id in dirty:
+                        await self._sync(bot, tenant, f"results:{nomination_id}", render_nomination(nomination))
+        except TelegramRetryAfter as e:
+            logger.warning("Results publisher hit the flood limit, retrying in %s seconds", e.retry_after)
+            self._dirty.setdefault(tenant, set()).update(dirty)
+        except TelegramBadRequest:
+            logger.exception("Failed to publish results of %s to %s", tenant.id, tenant.results_chat_id)
+        except Exception:
+            self._dirty.setdefault(tenant, set()).update(dirty)
+            raise
+
+    async def _sync(self, bot: Bot, tenant: Tenant, key: str, text: str, pin: bool = False) -> None:
+        chat_id = tenant.results_chat_id
+        digest = hashlib.sha1(text.encode()).hexdigest()
+        state = self._state.get((tenant.database, key))
+        if state is None:
+            state = await db.db.channel_messages.find_one({"_id": key})
+        if state and str(state.get("chat_id")) != str(chat_id):
+            state = None
+        if state and state.get("digest") == digest:
+            self._state[tenant.database, key] = state
+            return
+
+        if state:
+            try:
+                await bot.edit_message_text(text=text, chat_id=chat_id, message_id=state["message_id"])
+            except TelegramBadRequest as e:
+                if "message is not modified" not in e.message:
+                    if "message to edit not found" not in e.message:
+                        raise
+                    state = None
+
+        if not state:
+            message = await bot.send_message(chat_id, text, disable_notification=True)
+            if pin:
+                await bot.pin_chat_message(chat_id, message.message_id, disable_notification=True)
+            state = {"_id": key, "chat_id": chat_id, "message_id": message.message_id}
+
+        state["digest"] = digest
+        self._state[tenant.database, key] = state
+        await db.db.channel_messages.replace_one({"_id": key}, state, upsert=True)
+
+
+results_publisher = ResultsPublisher()
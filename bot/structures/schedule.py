@@ -1,17 +1,241 @@
+import asyncio
+import datetime
+import logging
+import os
+import random
+import secrets
+import socket
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Awaitable, Callable
+
 from aiogram import Bot, types
 from configuration import conf
+from pymongo.errors import DuplicateKeyError, PyMongoError
 from structures.broadcaster import send_message
+from structures.database import db
+from structures.tenancy import current_tenant
+
+logger = logging.getLogger(__name__)
 
 
 async def on_startup(bot: Bot) -> None:
-    """Actions that need to be completed before the bot starts"""
-    for admin in conf.bot.admins:
+    """Actions that need to be completed before the bot starts; run once per tenant bot"""
+    for admin in current_tenant.get().admins:
         await send_message(
             user_id=admin, text="Bot ishga tushdi ✅", keyboard=None, bot=bot
         )
     await bot.delete_my_commands()
     commands = [
         types.BotCommand(command="start", description="🚀 Botni ishga tushurish"),
+        types.BotCommand(command="myvotes", description="🗳 Mening ovozlarim"),
         types.BotCommand(command="help", description="🆘 Yordam"),
     ]
     await bot.set_my_commands(commands=commands)
+
+
+class IntervalTrigger:
+    """Fires every ``seconds`` seconds."""
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+
+    def next_run(self, after: datetime.datetime) -> datetime.datetime:
+        return after + datetime.timedelta(seconds=self.seconds)
+
+    def __repr__(self) -> str:
+        return f"every {self.seconds}s"
+
+
+@dataclass
+class JobStats:
+    runs: int = 0
+    failures: int = 0
+    skipped_overlap: int = 0
+    skipped_lease: int = 0
+    last_duration: float = 0.0
+    max_duration: float = 0.0
+    total_duration: float = 0.0
+    last_run_at: datetime.datetime | None = None
+    last_error: str | None = None
+
+
+@dataclass
+class Job:
+    name: str
+    func: Callable[[], Awaitable[Any]]
+    trigger: IntervalTrigger
+    jitter: float = 0.0
+    lease: bool = True
+    lease_ttl: float = 60.0
+    running: bool = False
+    next_run_at: datetime.datetime | None = None
+    stats: JobStats = field(default_factory=JobStats)
+
+
+class Scheduler:
+    """
+    In-process async job scheduler.
+
+    Each job runs on its own timer. A run is skipped while the previous one is
+    still in progress, and jobs with ``lease=True`` only run on the replica that
+    holds the job's lease in the ``scheduler_leases`` collection. The holder renews
+    it at the start of every run and every third of ``lease_ttl`` while the run
+    lasts; ``lease_ttl`` must exceed the interval, so the lease outlives the gap
+    between runs and the job stays on one replica until it stops.
+    Run-time metrics are kept in memory and mirrored to ``scheduler_jobs``.
+    """
+
+    def __init__(self):
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{secrets.token_hex(4)}"
+        self.jobs: dict[str, Job] = {}
+        self._timers: list[asyncio.Task] = []
+        self._runs: set[asyncio.Task] = set()
+        self._started = False
+
+    def add_job(
+        self,
+        name: str,
+        func: Callable[[], Awaitable[Any]],
+        trigger: IntervalTrigger,
+        jitter: float = 0.0,
+        lease: bool = True,
+        lease_ttl: float = 60.0,
+    ) -> Job:
+        """
+        Register a job.
+
+        :param name: Unique job name, also the lease key
+        :param func: Coroutine function called without arguments
+        :param trigger: When the job fires
+        :param jitter: Random delay of up to this many seconds added to every run
+        :param lease: Run on a single replica only
+        :param lease_ttl: Seconds before another replica may take over the lease, longer than the interval
+        """
+        if name in self.jobs:
+            raise ValueError(f"Job {name!r} is already registered")
+        if lease and lease_ttl <= trigger.seconds + jitter:
+            raise ValueError(f"Lease of job {name!r} would expire between runs: lease_ttl must exceed {trigger!r}")
+        job = Job(name=name, func=func, trigger=trigger, jitter=jitter, lease=lease, lease_ttl=lease_ttl)
+        self.jobs[name] = job
+        if self._started:
+            self._timers.append(asyncio.create_task(self._timer(job)))
+        return job
+
+    def start(self) -> None:
+        self._started = True
+        for job in self.jobs.values():
+            self._timers.append(asyncio.create_task(self._timer(job)))
+        logger.info("Scheduler started with %d jobs as %s", len(self.jobs), self.owner)
+
+    async def shutdown(self, timeout: float = 10.0) -> None:
+        """Stop timers, wait for running jobs and hand leases over to other replicas."""
+        self._started = False
+        for timer in self._timers:
+            timer.cancel()
+        self._timers.clear()
+        if self._runs:
+            await asyncio.wait(self._runs, timeout=timeout)
+        try:
+            await db.db.scheduler_leases.update_many(
+                {"owner": self.owner}, {"$set": {"expires_at": _utcnow()}}
+            )
+        except PyMongoError:
+            logger.exception("Failed to release scheduler leases")
+
+    def stats(self) -> dict:
+        return {name: asdict(job.stats) for name, job in self.jobs.items()}
+
+    async def _timer(self, job: Job) -> None:
+        while True:
+            job.next_run_at = job.trigger.next_run(_utcnow())
+            delay = (job.next_run_at - _utcnow()).total_seconds() + random.uniform(0, job.jitter)
+            await asyncio.sleep(max(0.0, delay))
+            if job.running:
+                job.stats.skipped_overlap += 1
+                logger.info("Job %s is still running, skipping this run", job.name)
+                continue
+            job.running = True
+            run = asyncio.create_task(self._execute(job))
+            self._runs.add(run)
+            run.add_done_callback(self._runs.discard)
+
+    async def _acquire_lease(self, job: Job) -> bool:
+        now = _utcnow()
+        try:
+            await db.db.scheduler_leases.find_one_and_update(
+                {"_id": job.name, "$or": [{"expires_at": {"$lte": now}}, {"owner": self.owner}]},
+                {"$set": {"owner": self.owner, "expires_at": now + datetime.timedelta(seconds=job.lease_ttl)}},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            # Another replica holds an unexpired lease.
+            return False
+        except PyMongoError:
+            logger.exception("Failed to acquire lease for job %s", job.name)
+            return False
+        return True
+
+    async def _heartbeat(self, job: Job) -> None:
+        """Keep renewing the lease while a long run is in progress."""
+        while True:
+            await asyncio.sleep(job.lease_ttl / 3)
+            if not await self._acquire_lease(job):
+                logger.warning("Job %s lost its lease while running", job.name)
+
+    async def _execute(self, job: Job) -> None:
+        heartbeat = None
+        try:
+            if job.lease:
+                if not await self._acquire_lease(job):
+                    job.stats.skipped_lease += 1
+                    return
+                heartbeat = asyncio.create_task(self._heartbeat(job))
+            started = time.monotonic()
+            error = None
+            try:
+                await job.func()
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                logger.exception("Job %s failed", job.name)
+            await self._record(job, time.monotonic() - started, error)
+        finally:
+            if heartbeat is not None:
+                heartbeat.cancel()
+            job.running = False
+
+    async def _record(self, job: Job, duration: float, error: str | None) -> None:
+        stats = job.stats
+        stats.runs += 1
+        stats.failures += error is not None
+        stats.last_duration = duration
+        stats.max_duration = max(stats.max_duration, duration)
+        stats.total_duration += duration
+        stats.last_run_at = _utcnow()
+        stats.last_error = error
+        logger.debug("Job %s finished in %.3fs", job.name, duration)
+        try:
+            await db.db.scheduler_jobs.update_one(
+                {"_id": job.name},
+                {
+                    "$inc": {"runs": 1, "failures": int(error is not None), "total_duration": duration},
+                    "$max": {"max_duration": duration},
+                    "$set": {
+                        "trigger": repr(job.trigger),
+                        "last_duration": duration,
+                        "last_run_at": stats.last_run_at,
+                        "last_owner": self.owner,
+                        "last_error": error,
+                    },
+                },
+                upsert=True,
+            )
+        except PyMongoError:
+            logger.warning("Failed to store metrics for job %s", job.name, exc_info=True)
+
+
+def _utcnow() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+scheduler = Scheduler()
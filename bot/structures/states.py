@@ -9,3 +9,7 @@ class RegState(StatesGroup):
 
 class BroadcastState(StatesGroup):
     broadcast = State()
+
+
+class ParticipantSearchState(StatesGroup):
+    query = State()
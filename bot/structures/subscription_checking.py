@@ -1,20 +1,65 @@
+import time
+from collections import OrderedDict
+
 from aiogram import types, Bot
 from aiogram.exceptions import TelegramBadRequest
 from configuration import conf
+from structures.database import NOT_REGISTERED, db
+from structures.tenancy import current_tenant
+
+NOT_SUBSCRIBED = "📢 Ovoz berish uchun avval kanalga a'zo bo'ling, so'ng /start ni bosing."
 
-CHANNEL_ID = conf.bot.channel_id
 
 async def check_subscription(bot: Bot, user_id: int) -> bool:
     try:
-        chat_member = await bot.get_chat_member(CHANNEL_ID, user_id)
+        chat_member = await bot.get_chat_member(current_tenant.get().channel_id, user_id)
         return chat_member.status in ["member", "administrator", "creator"]
     except TelegramBadRequest:
         return False
 
 
+class VoterCheck:
+    """
+    The /start gate applied to votes: registered (name and phone) and subscribed to the channel.
+
+    Votes can come from buttons outside the bot's chat (inline results), so
+    they are checked on their own. A passed check is remembered per tenant
+    for ``ttl`` seconds, bounded like the vote maps; failures are not, so a
+    user who just subscribed can vote right away.
+    """
+
+    def __init__(self, ttl: float, size: int):
+        self.ttl = ttl
+        self.size = size
+        self._passed: OrderedDict[tuple, float] = OrderedDict()
+
+    async def refusal(self, bot: Bot, user_id: int) -> str | None:
+        """``None`` if the user may vote, otherwise the reason to show them."""
+        key = (current_tenant.get().database, user_id)
+        passed_at = self._passed.get(key)
+        if passed_at is not None and time.monotonic() - passed_at < self.ttl:
+            self._passed.move_to_end(key)
+            return None
+
+        user = await db.get_user(user_id)
+        if user is None or not user.is_registered:
+            return NOT_REGISTERED
+        if not await check_subscription(bot, user_id):
+            return NOT_SUBSCRIBED
+        self._passed[key] = time.monotonic()
+        self._passed.move_to_end(key)
+        while len(self._passed) > self.size:
+            self._passed.popitem(last=False)
+        return None
+
+
+voter_check = VoterCheck(ttl=conf.bot.voter_check_ttl, size=conf.db.vote_map_size)
+
+
 async def send_subscription_prompt(message: types.Message, bot: Bot):
+    channel_id = current_tenant.get().channel_id
     try:
-        invite_link = await bot.create_chat_invite_link(CHANNEL_ID)
+        invite_link = await bot.create_chat_invite_link(channel_id)
         
         text = (
             "📢 <b>Botdan foydalanish uchun avval quyidagi kanalga a'zo bo'lishingiz lozim.</b>\n"
@@ -30,7 +75,7 @@ async def send_subscription_prompt(message: types.Message, bot: Bot):
         await message.answer(text, reply_markup=inline_kb, disable_web_page_preview=True, parse_mode="HTML")
         
     except TelegramBadRequest as e:
-        channel_name = CHANNEL_ID.lstrip('@')
+        channel_name = channel_id.lstrip('@')
         text = (
             "📢 <b>Botdan foydalanish uchun quyidagi kanalga a'zo bo'lishingiz lozim.</b>\n"
             "⚡️ Bu orqali siz <i>yangiliklardan xabardor</i> bo'lasiz va <u>maxsus imkoniyatlarga ega</u> bo'lasiz! 🔥\n"
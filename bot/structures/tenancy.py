@@ -0,0 +1,51 @@
+"""Which contest the current update belongs to."""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from configuration import conf
+
+
+@dataclass(frozen=True)
+class Tenant:
+    """One contest bot: its token, database, the channel users must join and where its results go."""
+    id: str
+    token: str
+    database: str
+    channel_id: str
+    admins: tuple = ()
+    results_chat_id: str = ""
+
+    @classmethod
+    def from_document(cls, doc: dict) -> "Tenant":
+        """Build from a ``tenants`` document; missing fields fall back to the process configuration."""
+        return cls(
+            id=str(doc["_id"]),
+            token=doc["token"],
+            database=doc.get("database") or f"{conf.db.database}_{doc['_id']}",
+            channel_id=doc.get("channel_id") or conf.bot.channel_id,
+            admins=tuple(str(admin) for admin in doc.get("admins", conf.bot.admins)),
+            results_chat_id=doc.get("results_chat_id") or doc.get("channel_id") or conf.bot.channel_id,
+        )
+
+
+DEFAULT_TENANT = Tenant(
+    id="default",
+    token=conf.bot.token,
+    database=conf.db.database,
+    channel_id=conf.bot.channel_id,
+    admins=tuple(conf.bot.admins),
+    results_chat_id=conf.results.chat_id,
+)
+
+# Set once per polling loop; tasks handling its updates inherit it.
+current_tenant: ContextVar[Tenant] = ContextVar("current_tenant", default=DEFAULT_TENANT)
+
+
+@contextmanager
+def using_tenant(tenant: Tenant):
+    token = current_tenant.set(tenant)
+    try:
+        yield tenant
+    finally:
+        current_tenant.reset(token)
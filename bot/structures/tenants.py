@@ -0,0 +1,168 @@
+"""Serves extra contest bots, listed in the ``tenants`` collection, from this process."""
+import asyncio
+import logging
+from typing import Awaitable, Callable
+
+from aiogram import Bot, Dispatcher
+from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.exceptions import TelegramUnauthorizedError
+from aiogram.types import Update
+from configuration import conf
+from pymongo.errors import PyMongoError
+from structures.database import db
+from structures.participant_index import participant_index
+from structures.resilience import DatabaseUnavailable
+from structures.schedule import IntervalTrigger, on_startup, scheduler
+from structures.tenancy import DEFAULT_TENANT, Tenant, current_tenant
+
+logger = logging.getLogger(__name__)
+
+MAX_POLLING_BACKOFF = 60.0
+
+
+class TenantManager:
+    """
+    Runs one long-polling loop per active tenant on the shared dispatcher.
+
+    The ``tenants`` collection of the main database holds one document per
+    contest: ``{_id, token, database, channel_id, admins, results_chat_id,
+    is_active}``. A scheduler job re-reads it every ``TENANTS_REFRESH`` seconds
+    and starts, restarts or stops loops to match, so adding a contest needs no
+    restart. Each loop runs the startup actions for its tenant's admins first.
+
+    Each loop sets ``current_tenant`` before feeding updates to the dispatcher;
+    the handler tasks inherit it and every database call resolves to that
+    tenant's database. All tenant bots share one HTTP session, and all
+    tenants share the Motor client, the scheduler and the handlers.
+    """
+
+    def __init__(self):
+        self.dp: Dispatcher | None = None
+        self.warm_up: Callable[[], Awaitable[None]] | None = None
+        self.tenants: dict[str, Tenant] = {}
+        # Bots of the running loops, for work outside an update such as publishing results
+        self.bots: dict[str, Bot] = {}
+        self._loops: dict[str, asyncio.Task] = {}
+        self._handling: set[asyncio.Task] = set()
+        self._session: AiohttpSession | None = None
+
+    def attach(self, dp: Dispatcher, warm_up: Callable[[], Awaitable[None]]) -> None:
+        self.dp = dp
+        self.warm_up = warm_up
+        scheduler.add_job("tenants", self.sync, IntervalTrigger(conf.tenants.refresh), lease=False)
+
+    async def sync(self) -> None:
+        """Bring the running loops in line with the ``tenants`` collection."""
+        try:
+            documents = await db.db.tenants.find({"is_active": {"$ne": False}}).to_list(length=None)
+        except (PyMongoError, DatabaseUnavailable):
+            logger.warning("Could not load tenants, keeping %d running", len(self.tenants), exc_info=True)
+            return
+
+        wanted = {}
+        for document in documents:
+            try:
+                tenant = Tenant.from_document(document)
+            except KeyError:
+                logger.error("Tenant %s has no token, skipping", document.get("_id"))
+                continue
+            if tenant.token == DEFAULT_TENANT.token:
+                # Telegram allows one getUpdates consumer per token; the main loop already has it.
+                continue
+            wanted[tenant.id] = tenant
+
+        for tenant_id, tenant in list(self.tenants.items()):
+            if wanted.get(tenant_id) != tenant:
+                await self._stop(tenant_id)
+        for tenant_id, tenant in wanted.items():
+            if tenant_id not in self.tenants:
+                self._start(tenant)
+
+    def _start(self, tenant: Tenant) -> None:
+        if self._session is None:
+            self._session = AiohttpSession()
+        self.tenants[tenant.id] = tenant
+        self._loops[tenant.id] = asyncio.create_task(self._run(tenant), name=f"tenant:{tenant.id}")
+        logger.info("Tenant %s started on database %s", tenant.id, tenant.database)
+
+    async def _stop(self, tenant_id: str) -> None:
+        tenant = self.tenants.pop(tenant_id)
+        self.bots.pop(tenant_id, None)
+        task = self._loops.pop(tenant_id)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        participant_index.forget(tenant)
+        if tenant.database not in {t.database for t in self.tenants.values()} | {DEFAULT_TENANT.database}:
+            db.forget(tenant.database)
+        logger.info("Tenant %s stopped", tenant_id)
+
+    async def _run(self, tenant: Tenant) -> None:
+        current_tenant.set(tenant)
+        bot = Bot(token=tenant.token, session=self._session, default=DefaultBotProperties(parse_mode='HTML'))
+        allowed_updates = self.dp.resolve_used_update_types()
+        offset = None
+        backoff = 1.0
+
+        while True:
+            try:
+                await db.ensure_indexes()
+                await self.warm_up()
+                break
+            except (PyMongoError, DatabaseUnavailable):
+                logger.warning("Tenant %s database not ready, retrying in %.0fs", tenant.id, backoff)
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, MAX_POLLING_BACKOFF)
+
+        try:
+            await on_startup(bot)
+        except TelegramUnauthorizedError:
+            logger.error("Tenant %s token was rejected by Telegram, polling stopped", tenant.id)
+            return
+        except Exception:
+            logger.exception("Startup actions of tenant %s failed", tenant.id)
+        self.bots[tenant.id] = bot
+
+        backoff = 1.0
+        while True:
+            try:
+                updates = await bot.get_updates(
+                    offset=offset, timeout=conf.tenants.polling_timeout, allowed_updates=allowed_updates
+                )
+            except TelegramUnauthorizedError:
+                logger.error("Tenant %s token was rejected by Telegram, polling stopped", tenant.id)
+                self.bots.pop(tenant.id, None)
+                return
+            except Exception as e:
+                logger.warning("Tenant %s polling failed (%s), retrying in %.0fs", tenant.id, e, backoff)
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, MAX_POLLING_BACKOFF)
+                continue
+            backoff = 1.0
+            for update in updates:
+                offset = update.update_id + 1
+                task = asyncio.create_task(self._handle(bot, update))
+                self._handling.add(task)
+                task.add_done_callback(self._handling.discard)
+
+    async def _handle(self, bot: Bot, update: Update) -> None:
+        try:
+            await self.dp.feed_update(bot, update)
+        except Exception:
+            logger.exception("Tenant %s failed to handle update %s", current_tenant.get().id, update.update_id)
+
+    async def stop(self) -> None:
+        """Stop every tenant loop and wait up to ``SHUTDOWN_TIMEOUT`` seconds for their updates."""
+        for tenant_id in list(self.tenants):
+            await self._stop(tenant_id)
+        if self._handling:
+            await asyncio.wait(self._handling, timeout=conf.bot.shutdown_timeout)
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+tenant_manager = TenantManager()
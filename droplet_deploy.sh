@@ -135,7 +135,7 @@ sudo systemctl enable xumotjbot.service
 
 # Setup automatic backups
 echo "📊 Setting up automatic backups..."
-(crontab -l 2>/dev/null; echo "0 3 * * * /home/$USER/xumotjbot/backup.sh > /home/$USER/xumotjbot/backup.log 2>&1") | crontab -
+(crontab -l 2>/dev/null; echo "0 3 * * * cd /home/$USER/xumotjbot && ./backup.sh > /home/$USER/xumotjbot/backup.log 2>&1") | crontab -
 
 # Check if containers are running
 echo "🔍 Checking container status..."
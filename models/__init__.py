@@ -0,0 +1,18 @@
+"""
+Documents shared by the bot and the admin panel.
+
+Slotted dataclasses decoded straight from the dicts pymongo/Motor return.
+Missing keys fall back to the field defaults, so a document loaded with a
+projection (see ``projection``) decodes to a smaller object with the rest
+left at their defaults. Collection names and field limits live here too;
+the admin panel's mongoengine documents take theirs from these classes.
+
+``models.logs`` and ``models.mongo`` hold the logging setup and MongoDB
+client settings both apps start with.
+"""
+from models.base import projection
+from models.nomination import Nomination, Participant, voting_open
+from models.user import User
+from models.vote import Vote
+
+__all__ = ["Nomination", "Participant", "User", "Vote", "projection", "voting_open"]
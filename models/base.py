@@ -0,0 +1,8 @@
+def projection(*fields: str) -> dict:
+    """Find projection returning only ``fields`` (dotted paths allowed) and ``_id``."""
+    return {field: 1 for field in fields}
+
+
+def without_none(document: dict) -> dict:
+    """Drop unset fields, so inserts don't store nulls the admin models never wrote."""
+    return {key: value for key, value in document.items() if value is not None}
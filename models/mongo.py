@@ -0,0 +1,37 @@
+"""MongoDB client settings read from the same ``MONGODB_*`` variables by both apps."""
+from pymongo import read_preferences
+
+
+def client_options(
+    max_pool_size: int,
+    min_pool_size: int,
+    connect_timeout_ms: int,
+    server_selection_timeout_ms: int,
+    socket_timeout_ms: int,
+    compressors: str = "",
+    write_concern: str = "",
+    write_timeout_ms: int = 0,
+) -> dict:
+    """Keyword arguments for the MongoDB client; they take precedence over URI options."""
+    options = {
+        "maxPoolSize": max_pool_size,
+        "minPoolSize": min_pool_size,
+        "connectTimeoutMS": connect_timeout_ms,
+        "serverSelectionTimeoutMS": server_selection_timeout_ms,
+        "socketTimeoutMS": socket_timeout_ms or None,
+    }
+    if compressors:
+        options["compressors"] = compressors
+    if write_concern:
+        options["w"] = int(write_concern) if write_concern.isdigit() else write_concern
+    if write_timeout_ms:
+        options["wTimeoutMS"] = write_timeout_ms
+    return options
+
+
+def make_read_preference(name: str, max_staleness: int = -1):
+    """Build a pymongo read preference from its name, e.g. ``secondaryPreferred``."""
+    mode = read_preferences.read_pref_mode_from_name(name)
+    if mode == read_preferences.ReadPreference.PRIMARY.mode:
+        return read_preferences.Primary()
+    return read_preferences.make_read_preference(mode, None, max_staleness)
@@ -0,0 +1,92 @@
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import ClassVar, Optional
+
+from bson import ObjectId
+
+from models.base import projection
+
+
+def as_utc(moment: Optional[datetime]) -> Optional[datetime]:
+    """pymongo returns naive UTC datetimes unless the client is ``tz_aware``."""
+    if moment is not None and moment.tzinfo is None:
+        return moment.replace(tzinfo=timezone.utc)
+    return moment
+
+
+def voting_open(is_active: bool, opens_at: Optional[datetime], closes_at: Optional[datetime], now: datetime) -> bool:
+    """Whether votes are accepted at ``now``: active and inside the (optional) window, ``closes_at`` exclusive."""
+    if not is_active:
+        return False
+    if opens_at is not None and now < as_utc(opens_at):
+        return False
+    return closes_at is None or now < as_utc(closes_at)
+
+
+@dataclass(slots=True)
+class Participant:
+    """A participant embedded in a nomination, with its running vote count."""
+    NAME_MAX_LENGTH: ClassVar[int] = 100
+
+    name: str
+    votes: int = 0
+    created_at: Optional[datetime] = None
+
+    @classmethod
+    def from_document(cls, doc: dict) -> "Participant":
+        return cls(doc.get("name", ""), doc.get("votes", 0), doc.get("created_at"))
+
+
+@dataclass(slots=True)
+class Nomination:
+    """A nomination and its participants (``nominations`` collection)."""
+    COLLECTION: ClassVar[str] = "nominations"
+    TITLE_MAX_LENGTH: ClassVar[int] = 200
+    DESCRIPTION_MAX_LENGTH: ClassVar[int] = 500
+    # What the bot shows and votes on; description and timestamps are left out.
+    LISTING: ClassVar[dict] = projection(
+        "title", "is_active", "opens_at", "closes_at", "participants.name", "participants.votes",
+        "votes_invalidated_at",
+    )
+
+    id: ObjectId
+    title: str = ""
+    participants: list = field(default_factory=list)
+    is_active: bool = True
+    # Voting window; either end may be open. Naive values are UTC.
+    opens_at: Optional[datetime] = None
+    closes_at: Optional[datetime] = None
+    description: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    # Set by scripts/archive_votes.py while the votes live in vote_archive.
+    votes_archived_at: Optional[datetime] = None
+    archived_votes: int = 0
+    # Set by the admin panel when it removes votes; the bot then drops its cached vote maps.
+    votes_invalidated_at: Optional[datetime] = None
+
+    @classmethod
+    def from_document(cls, doc: dict) -> "Nomination":
+        return cls(
+            doc["_id"],
+            doc.get("title", ""),
+            [Participant.from_document(participant) for participant in doc.get("participants", ())],
+            doc.get("is_active", True),
+            doc.get("opens_at"),
+            doc.get("closes_at"),
+            doc.get("description"),
+            doc.get("created_at"),
+            doc.get("updated_at"),
+            doc.get("votes_archived_at"),
+            doc.get("archived_votes", 0),
+            doc.get("votes_invalidated_at"),
+        )
+
+    def is_open(self, now: datetime) -> bool:
+        return voting_open(self.is_active, self.opens_at, self.closes_at, now)
+
+    def participant(self, name: str) -> Optional[Participant]:
+        for participant in self.participants:
+            if participant.name == name:
+                return participant
+        return None
@@ -0,0 +1,52 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import ClassVar, Optional
+
+from bson import ObjectId
+
+
+@dataclass(slots=True)
+class User:
+    """A Telegram user of the bot (``users`` collection)."""
+    COLLECTION: ClassVar[str] = "users"
+    FULLNAME_MAX_LENGTH: ClassVar[int] = 255
+    USERNAME_MAX_LENGTH: ClassVar[int] = 64
+    PHONE_MAX_LENGTH: ClassVar[int] = 20
+
+    user_id: int
+    fullname: Optional[str] = None
+    username: Optional[str] = None
+    input_fullname: Optional[str] = None
+    input_phone: Optional[str] = None
+    # Delivery state maintained by the bot's broadcaster
+    is_blocked: bool = False
+    is_deactivated: bool = False
+    delivery_failures: int = 0
+    last_delivery_at: Optional[datetime] = None
+    # Last update received from the user, flushed in batches by the bot
+    last_active_at: Optional[datetime] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    id: Optional[ObjectId] = None
+
+    @classmethod
+    def from_document(cls, doc: dict) -> "User":
+        return cls(
+            doc["user_id"],
+            doc.get("fullname"),
+            doc.get("username"),
+            doc.get("input_fullname"),
+            doc.get("input_phone"),
+            doc.get("is_blocked", False),
+            doc.get("is_deactivated", False),
+            doc.get("delivery_failures", 0),
+            doc.get("last_delivery_at"),
+            doc.get("last_active_at"),
+            doc.get("created_at"),
+            doc.get("updated_at"),
+            doc.get("_id"),
+        )
+
+    @property
+    def is_registered(self) -> bool:
+        return bool(self.input_fullname and self.input_phone)
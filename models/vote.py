@@ -0,0 +1,42 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import ClassVar, Optional
+
+from bson import ObjectId
+
+from models.base import projection, without_none
+from models.nomination import Participant
+
+
+@dataclass(slots=True)
+class Vote:
+    """One user's vote in one nomination (``votes`` collection, unique per user and nomination)."""
+    COLLECTION: ClassVar[str] = "votes"
+    PARTICIPANT_NAME_MAX_LENGTH: ClassVar[int] = Participant.NAME_MAX_LENGTH
+    # Enough to know which participant a user chose in each nomination.
+    CHOICE: ClassVar[dict] = projection("nomination_id", "participant_name")
+
+    user_id: int
+    nomination_id: ObjectId
+    participant_name: str
+    voted_at: Optional[datetime] = None
+    id: Optional[ObjectId] = None
+
+    @classmethod
+    def from_document(cls, doc: dict) -> "Vote":
+        return cls(
+            doc.get("user_id", 0),
+            doc.get("nomination_id"),
+            doc.get("participant_name", ""),
+            doc.get("voted_at"),
+            doc.get("_id"),
+        )
+
+    def to_document(self) -> dict:
+        return without_none({
+            "_id": self.id,
+            "nomination_id": self.nomination_id,
+            "participant_name": self.participant_name,
+            "user_id": self.user_id,
+            "voted_at": self.voted_at,
+        })
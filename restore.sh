@@ -6,32 +6,30 @@ set -e
 # Configuration
 BACKUP_DIR="./backups"
 
-# Check if a backup file is provided
+run_tool() {
+  docker-compose run --rm -T \
+    -v "$(pwd)/scripts:/scripts:ro" \
+    -v "$(pwd)/${BACKUP_DIR}:/backups" \
+    bot python /scripts/backup.py --output /backups "$@"
+}
+
+# Check if a snapshot is provided
 if [ -z "$1" ]; then
-  echo "❌ Error: No backup file specified."
-  echo "Usage: ./restore.sh <backup_filename>"
-  echo "Available backups:"
-  ls -1 "${BACKUP_DIR}"/*.gz 2>/dev/null || echo "  No backups found in ${BACKUP_DIR}"
+  echo "❌ Error: No snapshot specified."
+  echo "Usage: ./restore.sh <snapshot> (incremental snapshots bring their base snapshots along)"
+  echo "Available snapshots:"
+  run_tool list
   exit 1
 fi
 
-BACKUP_FILE="${BACKUP_DIR}/$1"
-
-# Check if backup file exists
-if [ ! -f "${BACKUP_FILE}" ]; then
-  echo "❌ Error: Backup file not found: ${BACKUP_FILE}"
+# Check if the snapshot exists
+if [ ! -f "${BACKUP_DIR}/$1/manifest.json" ]; then
+  echo "❌ Error: Snapshot not found or incomplete: ${BACKUP_DIR}/$1"
   exit 1
 fi
 
-echo "🔄 Restoring MongoDB from backup: ${BACKUP_FILE}"
+echo "🔄 Restoring MongoDB from snapshot: $1"
 
-# Restore MongoDB data
-cat "${BACKUP_FILE}" | docker-compose exec -T mongodb mongorestore --archive --gzip --drop
+run_tool restore "$1" --drop
 
-# Check if restore was successful
-if [ $? -eq 0 ]; then
-  echo "✅ Restore completed successfully!"
-else
-  echo "❌ Error: Restore failed."
-  exit 1
-fi
+echo "✅ Restore completed successfully!"
@@ -0,0 +1,242 @@
+"""
+Move the votes of closed nominations out of the hot ``votes`` collection.
+
+Each closed nomination's votes are packed into one ``vote_archive`` document
+per day: zlib-compressed arrays of user IDs, participant indexes and vote
+times, plus per-participant counts that stay queryable. Nothing but the
+vote ``_id`` is lost, and ``restore`` puts the votes back.
+
+    python scripts/archive_votes.py archive --all-closed
+    python scripts/archive_votes.py archive --nomination 65f0c0ffee0000000000beef --dry-run
+    python scripts/archive_votes.py stats --nomination 65f0c0ffee0000000000beef
+    python scripts/archive_votes.py restore --nomination 65f0c0ffee0000000000beef
+
+Archiving is safe to re-run: buckets are upserted by id, and votes are only
+deleted once every one of them has been written to a bucket.
+"""
+import argparse
+import datetime
+import os
+import sys
+import zlib
+from array import array
+
+from bson import Binary, ObjectId
+from pymongo import ASCENDING, MongoClient
+from pymongo.errors import BulkWriteError
+
+from backup import default_uri
+from models.nomination import as_utc
+
+ARCHIVE_COLLECTION = "vote_archive"
+# Votes per bucket document; keeps a bucket far below the 16 MB BSON limit.
+BUCKET_LIMIT = 250000
+BATCH_SIZE = 10000
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Archive and restore votes of closed nominations.")
+    parser.add_argument("--uri", default=default_uri(), help="MongoDB URI (default from MONGO_URI / MONGODB_*)")
+    parser.add_argument("--database", default=os.getenv("MONGODB_DATABASE", "xumotjbot"), help="Database name")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    archive = commands.add_parser("archive", help="Pack votes into daily buckets and remove them from votes")
+    target = archive.add_mutually_exclusive_group(required=True)
+    target.add_argument("--nomination", action="append", help="Nomination id (repeatable)")
+    target.add_argument("--all-closed", action="store_true", help="Every nomination past its closes_at")
+    archive.add_argument("--dry-run", action="store_true", help="Report what would be archived, change nothing")
+
+    restore = commands.add_parser("restore", help="Put archived votes back into votes")
+    restore.add_argument("--nomination", action="append", required=True, help="Nomination id (repeatable)")
+
+    stats = commands.add_parser("stats", help="Archived vote counts per participant")
+    stats.add_argument("--nomination", action="append", help="Nomination id (repeatable), default all")
+    return parser.parse_args()
+
+
+def pack(typecode: str, values) -> Binary:
+    packed = array(typecode, values)
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return Binary(zlib.compress(packed.tobytes(), 6))
+
+
+def unpack(typecode: str, data: bytes) -> array:
+    values = array(typecode)
+    values.frombytes(zlib.decompress(data))
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+def day_start(moment: datetime.datetime) -> datetime.datetime:
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def make_bucket(nomination_id: ObjectId, day: datetime.datetime, seq: int, votes: list) -> dict:
+    """
+    One archive document for up to ``BUCKET_LIMIT`` votes of a nomination on one day.
+
+    ``participants`` is the bucket's own name table; ``choices`` holds indexes
+    into it and ``counts`` the number of votes per entry. ``offsets`` are the
+    millisecond gaps between consecutive votes, starting from ``day``.
+    """
+    names, choices, counts, user_ids, offsets = {}, [], [], [], []
+    previous = 0
+    for vote in votes:
+        index = names.setdefault(vote["participant_name"], len(names))
+        if index == len(counts):
+            counts.append(0)
+        counts[index] += 1
+        choices.append(index)
+        user_ids.append(vote["user_id"])
+        at = int((vote["voted_at"] - day).total_seconds() * 1000)
+        offsets.append(at - previous)
+        previous = at
+    return {
+        "_id": f"{nomination_id}:{day:%Y%m%d}:{seq}",
+        "nomination_id": nomination_id,
+        "day": day,
+        "participants": list(names),
+        "counts": counts,
+        "total": len(votes),
+        "user_ids": pack("q", user_ids),
+        "choices": pack("H", choices),
+        "offsets": pack("I", offsets),
+        "archived_at": datetime.datetime.now(datetime.timezone.utc),
+    }
+
+
+def expand_bucket(bucket: dict) -> list:
+    """Vote documents (without their original ``_id``) stored in an archive bucket."""
+    names = bucket["participants"]
+    day = bucket["day"]
+    votes, at = [], 0
+    for user_id, choice, gap in zip(
+        unpack("q", bucket["user_ids"]), unpack("H", bucket["choices"]), unpack("I", bucket["offsets"])
+    ):
+        at += gap
+        votes.append({
+            "nomination_id": bucket["nomination_id"],
+            "participant_name": names[choice],
+            "user_id": user_id,
+            "voted_at": day + datetime.timedelta(milliseconds=at),
+        })
+    return votes
+
+
+def archive_nomination(database, nomination: dict, dry_run: bool) -> int:
+    nomination_id = nomination["_id"]
+    expected = database.votes.count_documents({"nomination_id": nomination_id})
+    if not expected:
+        return 0
+    if dry_run:
+        print(f"  {nomination['title']}: {expected} votes would be archived")
+        return expected
+
+    archive = database[ARCHIVE_COLLECTION]
+    written, day, seq, pending = 0, None, 0, []
+
+    def flush():
+        nonlocal written, pending
+        if pending:
+            bucket = make_bucket(nomination_id, day, seq, pending)
+            archive.replace_one({"_id": bucket["_id"]}, bucket, upsert=True)
+            written += len(pending)
+            pending = []
+
+    cursor = database.votes.find(
+        {"nomination_id": nomination_id},
+        {"_id": 0, "participant_name": 1, "user_id": 1, "voted_at": 1},
+        batch_size=BATCH_SIZE,
+    ).sort("voted_at", ASCENDING)
+    for vote in cursor:
+        vote_day = day_start(vote["voted_at"])
+        if vote_day != day:
+            flush()
+            day, seq = vote_day, 0
+        elif len(pending) >= BUCKET_LIMIT:
+            flush()
+            seq += 1
+        pending.append(vote)
+    flush()
+
+    if written != expected or database.votes.count_documents({"nomination_id": nomination_id}) != expected:
+        print(f"  {nomination['title']}: votes changed while archiving, kept them in votes; re-run later")
+        return 0
+    database.votes.delete_many({"nomination_id": nomination_id})
+    database.nominations.update_one(
+        {"_id": nomination_id},
+        {"$set": {"votes_archived_at": datetime.datetime.now(datetime.timezone.utc)},
+         "$inc": {"archived_votes": written}},
+    )
+    print(f"  {nomination['title']}: archived {written} votes")
+    return written
+
+
+def restore_nomination(database, nomination_id: ObjectId) -> int:
+    archive = database[ARCHIVE_COLLECTION]
+    restored = 0
+    for bucket in archive.find({"nomination_id": nomination_id}).sort("_id", ASCENDING):
+        votes = expand_bucket(bucket)
+        for start in range(0, len(votes), BATCH_SIZE):
+            try:
+                database.votes.insert_many(votes[start:start + BATCH_SIZE], ordered=False)
+            except BulkWriteError as e:
+                # Votes restored by an earlier, interrupted run hit the unique (user_id, nomination_id) index
+                if any(error["code"] != 11000 for error in e.details["writeErrors"]):
+                    raise
+        archive.delete_one({"_id": bucket["_id"]})
+        restored += len(votes)
+    database.nominations.update_one(
+        {"_id": nomination_id}, {"$unset": {"votes_archived_at": "", "archived_votes": ""}}
+    )
+    return restored
+
+
+def archived_counts(database, nomination_ids: list | None) -> list:
+    """Per-participant archived vote counts, computed by the server from the bucket ``counts``."""
+    match = {"nomination_id": {"$in": nomination_ids}} if nomination_ids else {}
+    return list(database[ARCHIVE_COLLECTION].aggregate([
+        {"$match": match},
+        {"$project": {"nomination_id": 1, "pairs": {"$zip": {"inputs": ["$participants", "$counts"]}}}},
+        {"$unwind": "$pairs"},
+        {"$group": {
+            "_id": {"nomination_id": "$nomination_id", "participant": {"$arrayElemAt": ["$pairs", 0]}},
+            "votes": {"$sum": {"$arrayElemAt": ["$pairs", 1]}},
+        }},
+        {"$sort": {"_id.nomination_id": 1, "votes": -1}},
+    ]))
+
+
+def main() -> None:
+    args = parse_args()
+    client = MongoClient(args.uri)
+    database = client[args.database]
+    database[ARCHIVE_COLLECTION].create_index([("nomination_id", ASCENDING), ("day", ASCENDING)])
+    ids = [ObjectId(value) for value in args.nomination or []]
+
+    if args.command == "archive":
+        now = datetime.datetime.now(datetime.timezone.utc)
+        query = {"_id": {"$in": ids}} if ids else {"closes_at": {"$lte": now}}
+        total = 0
+        for nomination in database.nominations.find(query, {"title": 1, "closes_at": 1}):
+            # is_active=false alone can be undone; only a passed closes_at ends voting for good.
+            if nomination.get("closes_at") is None or as_utc(nomination["closes_at"]) > now:
+                print(f"  {nomination['title']}: closes_at not reached, skipped")
+                continue
+            total += archive_nomination(database, nomination, args.dry_run)
+        print(f"{'Would archive' if args.dry_run else 'Archived'} {total} votes")
+    elif args.command == "restore":
+        for nomination_id in ids:
+            print(f"  {nomination_id}: restored {restore_nomination(database, nomination_id)} votes")
+    else:
+        titles = {n["_id"]: n["title"] for n in database.nominations.find({}, {"title": 1})}
+        for row in archived_counts(database, ids):
+            nomination_id = row["_id"]["nomination_id"]
+            print(f"  {titles.get(nomination_id, nomination_id)} | {row['_id']['participant']}: {row['votes']}")
+    client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,370 @@
+"""
+Back up and restore the bot database while the contest is running.
+
+Every collection is streamed straight from the cursor into its own gzip file
+of raw BSON, several collections at a time, with the combined read rate
+capped so a backup does not starve live traffic. Incremental snapshots only
+copy documents whose watermark field (``voted_at``, ``updated_at``, ...) moved
+since the previous snapshot. Restores load the data first and build the
+indexes last.
+
+    python scripts/backup.py backup                          # full snapshot
+    python scripts/backup.py backup --incremental --max-rate 10
+    python scripts/backup.py list
+    python scripts/backup.py restore                         # latest snapshot
+    python scripts/backup.py restore 20260301T030000 --drop
+
+A snapshot is a directory under ``--output`` with ``<collection>.bson.gz``,
+``<collection>.indexes.json`` and a ``manifest.json`` written last; a
+directory without a manifest is an interrupted backup and is ignored.
+"""
+import argparse
+import datetime
+import gzip
+import os
+import shutil
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bson import decode_file_iter, json_util
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+from pymongo import IndexModel, MongoClient, ReplaceOne
+from pymongo.errors import BulkWriteError
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RAW = CodecOptions(document_class=RawBSONDocument)
+# Fields that move whenever a document is written. Collections not listed here
+# (nominations, whose vote counters change without touching updated_at, and
+# small bookkeeping collections) are copied in full by every snapshot.
+WATERMARKS = {
+    "votes": ("voted_at",),
+    "users": ("updated_at", "last_active_at"),
+    "vote_archive": ("archived_at",),
+    "invalidated_votes": ("invalidated_at",),
+    "fraud_clusters": ("analyzed_at", "reviewed_at"),
+}
+# Re-read this much before the previous watermark, for writes that committed out of order.
+WATERMARK_OVERLAP = datetime.timedelta(minutes=1)
+BATCH_SIZE = 1000
+
+
+def default_uri() -> str:
+    """Same variables as the bot and the admin panel."""
+    if os.getenv("MONGO_URI"):
+        return os.getenv("MONGO_URI")
+    host = os.getenv("MONGODB_HOST", "localhost")
+    port = os.getenv("MONGODB_PORT", "27017")
+    user, password = os.getenv("MONGODB_USERNAME", ""), os.getenv("MONGODB_PASSWORD", "")
+    auth = f"{user}:{password}@" if user and password else ""
+    return f"mongodb://{auth}{host}:{port}/?authSource=admin" if auth else f"mongodb://{host}:{port}"
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Back up and restore the bot database.")
+    parser.add_argument("--uri", default=default_uri(), help="MongoDB URI (default from MONGO_URI / MONGODB_*)")
+    parser.add_argument("--database", default=os.getenv("MONGODB_DATABASE", "xumotjbot"), help="Database name")
+    parser.add_argument("--output", default=os.path.join(ROOT, "backups"), help="Directory holding the snapshots")
+    parser.add_argument("--jobs", type=int, default=3, help="Collections processed in parallel")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    backup = commands.add_parser("backup", help="Write a new snapshot")
+    backup.add_argument("--incremental", action="store_true", help="Only documents changed since the last snapshot")
+    backup.add_argument("--collections", nargs="+", help="Collections to dump, default all")
+    backup.add_argument("--max-rate", type=float, default=0, help="Read rate cap in MB/s over all jobs, 0 = none")
+    backup.add_argument("--read-preference", default="secondaryPreferred", help="Where to read from on a replica set")
+    backup.add_argument("--level", type=int, default=6, help="gzip compression level")
+    backup.add_argument("--keep", type=int, default=0, help="Full snapshots to keep with their increments, 0 = all")
+
+    commands.add_parser("list", help="Show the snapshots")
+
+    restore = commands.add_parser("restore", help="Load a snapshot and the snapshots it is based on")
+    restore.add_argument("snapshot", nargs="?", help="Snapshot name, default the latest")
+    restore.add_argument("--drop", action="store_true", help="Drop the collections before loading")
+    return parser.parse_args()
+
+
+class Throttle:
+    """Caps the combined read rate of all dump threads, in bytes per second."""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self._lock = threading.Lock()
+        self._next = time.monotonic()
+
+    def consume(self, size: int) -> None:
+        if not self.rate:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._next = max(self._next, now) + size / self.rate
+            delay = self._next - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+def load_manifest(output: str, name: str) -> dict | None:
+    path = os.path.join(output, name, "manifest.json")
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json_util.loads(f.read())
+
+
+def snapshots(output: str) -> list:
+    """Complete snapshots, oldest first."""
+    if not os.path.isdir(output):
+        return []
+    manifests = (load_manifest(output, name) for name in sorted(os.listdir(output)))
+    return [manifest for manifest in manifests if manifest is not None]
+
+
+def write_stream(path: str, documents, throttle: Throttle, level: int) -> tuple:
+    count = size = 0
+    with gzip.open(path, "wb", compresslevel=level) as out:
+        for document in documents:
+            raw = document.raw
+            throttle.consume(len(raw))
+            out.write(raw)
+            count += 1
+            size += len(raw)
+    return count, size
+
+
+def read_stream(path: str):
+    with gzip.open(path, "rb") as f:
+        yield from decode_file_iter(f, RAW)
+
+
+def batches(iterable, size: int = BATCH_SIZE):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def dump_collection(database, name: str, directory: str, previous: dict | None, throttle: Throttle, level: int) -> dict:
+    """Dump one collection; incremental when it has watermarks and ``previous`` recorded them."""
+    collection = database[name].with_options(codec_options=RAW)
+    fields = WATERMARKS.get(name, ())
+    since = (previous or {}).get("watermarks") or {}
+    query = {}
+    if fields and previous is not None:
+        # A field nobody had last time only matters on documents that have it now.
+        query = {"$or": [
+            {field: {"$gte": since[field] - WATERMARK_OVERLAP}} if since.get(field) else {field: {"$exists": True}}
+            for field in fields
+        ]}
+
+    watermarks = dict(since)
+
+    def documents():
+        for document in collection.find(query, batch_size=BATCH_SIZE):
+            for field in fields:
+                value = document.get(field)
+                if isinstance(value, datetime.datetime) and (watermarks.get(field) is None or value > watermarks[field]):
+                    watermarks[field] = value
+            yield document
+
+    started = time.monotonic()
+    count, size = write_stream(os.path.join(directory, f"{name}.bson.gz"), documents(), throttle, level)
+    entry = {"documents": count, "bytes": size, "incremental": bool(query), "watermarks": watermarks}
+    if query:
+        # Deletions leave no watermark behind; the live ids let a restore drop them.
+        entry["ids"], _ = write_stream(
+            os.path.join(directory, f"{name}.ids.bson.gz"),
+            collection.find({}, {"_id": 1}, batch_size=BATCH_SIZE * 10), throttle, level,
+        )
+    with open(os.path.join(directory, f"{name}.indexes.json"), "w") as f:
+        f.write(json_util.dumps(list(database[name].list_indexes()), indent=2))
+    print(f"  {name}: {count} documents, {size / 1e6:.1f} MB in {time.monotonic() - started:.1f}s")
+    return entry
+
+
+def backup(args, client) -> None:
+    database = client[args.database]
+    existing = snapshots(args.output)
+    base = existing[-1] if args.incremental and existing else None
+    if args.incremental and base is None:
+        print("No earlier snapshot, taking a full one")
+
+    names = args.collections or [
+        name for name in database.list_collection_names(filter={"type": "collection"})
+        if not name.startswith("system.")
+    ]
+    names.sort(key=lambda name: database[name].estimated_document_count(), reverse=True)
+    started_at = datetime.datetime.now(datetime.timezone.utc)
+    name = started_at.strftime("%Y%m%dT%H%M%S")
+    directory = os.path.join(args.output, name)
+    os.makedirs(directory)
+
+    throttle = Throttle(args.max_rate * 1e6)
+    previous = base["collections"] if base else {}
+    with ThreadPoolExecutor(max_workers=args.jobs) as pool:
+        futures = {
+            collection: pool.submit(
+                dump_collection, database, collection, directory, previous.get(collection), throttle, args.level
+            )
+            for collection in names
+        }
+        collections = {collection: future.result() for collection, future in futures.items()}
+
+    manifest = {
+        "name": name,
+        "database": args.database,
+        "kind": "incremental" if base else "full",
+        "base": base["name"] if base else None,
+        "started_at": started_at,
+        "finished_at": datetime.datetime.now(datetime.timezone.utc),
+        "collections": collections,
+    }
+    with open(os.path.join(directory, "manifest.json"), "w") as f:
+        f.write(json_util.dumps(manifest, indent=2))
+    total = sum(entry["bytes"] for entry in collections.values())
+    print(f"{manifest['kind'].capitalize()} snapshot {name}: {total / 1e6:.1f} MB read")
+
+    if args.keep:
+        prune(args.output, args.keep)
+
+
+def prune(output: str, keep: int) -> None:
+    """Delete everything older than the ``keep``-th newest full snapshot."""
+    complete = snapshots(output)
+    fulls = [manifest["name"] for manifest in complete if manifest["kind"] == "full"]
+    if len(fulls) <= keep:
+        return
+    cutoff = fulls[-keep]
+    for name in sorted(os.listdir(output)):
+        if name < cutoff and os.path.isdir(os.path.join(output, name)):
+            shutil.rmtree(os.path.join(output, name))
+            print(f"  removed {name}")
+
+
+def chain(output: str, name: str | None) -> list:
+    """The full snapshot and the increments leading to ``name``, oldest first."""
+    complete = {manifest["name"]: manifest for manifest in snapshots(output)}
+    if not complete:
+        sys.exit(f"No snapshots in {output}")
+    name = name or max(complete)
+    layers = []
+    while name is not None:
+        if name not in complete:
+            sys.exit(f"Snapshot {name} is missing or incomplete")
+        layers.append(complete[name])
+        name = complete[name]["base"]
+    return layers[::-1]
+
+
+def load_collection(database, name: str, directory: str, mode: str) -> int:
+    """
+    Load one collection's documents from a snapshot.
+
+    ``insert`` adds them (the full snapshot at the start of the chain),
+    ``replace`` swaps the collection's contents for them (a full copy inside an
+    increment) and ``upsert`` merges changed documents by ``_id``.
+    """
+    collection = database[name]
+    if mode == "replace":
+        collection.delete_many({})
+    count = 0
+    for batch in batches(read_stream(os.path.join(directory, f"{name}.bson.gz"))):
+        if mode == "upsert":
+            collection.bulk_write([ReplaceOne({"_id": doc["_id"]}, doc, upsert=True) for doc in batch], ordered=False)
+        else:
+            try:
+                collection.insert_many(batch, ordered=False)
+            except BulkWriteError as e:
+                # Already there when restoring over existing data without --drop
+                if any(error["code"] != 11000 for error in e.details["writeErrors"]):
+                    raise
+        count += len(batch)
+    return count
+
+
+def remove_deleted(database, name: str, directory: str) -> int:
+    """Delete documents that were gone when the snapshot was taken."""
+    live = {doc["_id"] for doc in read_stream(os.path.join(directory, f"{name}.ids.bson.gz"))}
+    stale = [doc["_id"] for doc in database[name].find({}, {"_id": 1}) if doc["_id"] not in live]
+    for batch in batches(stale, BATCH_SIZE * 10):
+        database[name].delete_many({"_id": {"$in": batch}})
+    return len(stale)
+
+
+def build_indexes(database, name: str, directory: str) -> int:
+    with open(os.path.join(directory, f"{name}.indexes.json")) as f:
+        specs = json_util.loads(f.read())
+    models = []
+    for spec in specs:
+        if spec["name"] == "_id_":
+            continue
+        options = {key: value for key, value in spec.items() if key not in ("v", "ns", "key")}
+        models.append(IndexModel(list(spec["key"].items()), **options))
+    if models:
+        database[name].create_indexes(models)
+    return len(models)
+
+
+def restore(args, client) -> None:
+    layers = chain(args.output, args.snapshot)
+    final = layers[-1]
+    database = client[args.database]
+    print(f"Restoring {final['name']} ({len(layers)} snapshot(s)) into {args.database}")
+
+    with ThreadPoolExecutor(max_workers=args.jobs) as pool:
+        if args.drop:
+            for name in set().union(*(layer["collections"] for layer in layers)):
+                database.drop_collection(name)
+        for layer in layers:
+            directory = os.path.join(args.output, layer["name"])
+            futures = {}
+            for name, entry in layer["collections"].items():
+                mode = "upsert" if entry["incremental"] else "insert" if layer is layers[0] else "replace"
+                futures[name] = pool.submit(load_collection, database, name, directory, mode)
+            for name, future in futures.items():
+                print(f"  {layer['name']} {name}: {future.result()} documents")
+
+        directory = os.path.join(args.output, final["name"])
+        for name in set().union(*(layer["collections"] for layer in layers[:-1])) - set(final["collections"]):
+            database.drop_collection(name)
+        tracked = [name for name, entry in final["collections"].items() if entry["incremental"]]
+        for name, removed in zip(tracked, pool.map(lambda n: remove_deleted(database, n, directory), tracked)):
+            print(f"  {name}: {removed} deleted documents removed")
+
+        names = list(final["collections"])
+        for name, built in zip(names, pool.map(lambda n: build_indexes(database, n, directory), names)):
+            print(f"  {name}: {built} indexes built")
+    print("Restore completed")
+
+
+def list_snapshots(args) -> None:
+    for manifest in snapshots(args.output):
+        documents = sum(entry["documents"] for entry in manifest["collections"].values())
+        size = sum(entry["bytes"] for entry in manifest["collections"].values())
+        base = f" on {manifest['base']}" if manifest["base"] else ""
+        print(f"  {manifest['name']}  {manifest['kind']}{base}  {documents} documents  {size / 1e6:.1f} MB")
+
+
+def main() -> None:
+    args = parse_args()
+    if args.command == "list":
+        list_snapshots(args)
+        return
+    options = {"readPreference": args.read_preference} if args.command == "backup" else {}
+    client = MongoClient(args.uri, **options)
+    try:
+        if args.command == "backup":
+            backup(args, client)
+        else:
+            restore(args, client)
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+"""
+Micro-benchmarks for the MongoDB data-access layer.
+
+Seeds a scratch database on a local mongod with synthetic users, nominations,
+participants and votes, times every ``MongoDB`` method of the bot plus the
+admin ``Vote.cast_vote``, and writes the results as JSON so runs can be compared.
+
+    python scripts/benchmark_db.py --dataset 1000:5:10:2000 --dataset 20000:10:30:50000
+    python scripts/benchmark_db.py --output after.json --compare before.json
+
+A dataset is ``users:nominations:participants_per_nomination:votes``.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_DATASETS = ["1000:5:10:2000", "20000:10:30:50000"]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the MongoDB data-access layer.")
+    parser.add_argument("--uri", default="mongodb://localhost:27017", help="mongod to benchmark against")
+    parser.add_argument("--database", default="xumotjbot_bench", help="Scratch database, dropped before each dataset")
+    parser.add_argument("--dataset", action="append", help="users:nominations:participants:votes (repeatable)")
+    parser.add_argument("--iterations", type=int, default=200, help="Timed calls per operation")
+    parser.add_argument("--warmup", type=int, default=20, help="Untimed calls per operation")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for data and call arguments")
+    parser.add_argument("--output", default="benchmark_results.json", help="Where to write the JSON results")
+    parser.add_argument("--compare", default=None, help="Previous results file to compare against")
+    return parser.parse_args()
+
+
+def parse_dataset(spec: str) -> dict:
+    users, nominations, participants, votes = (int(part) for part in spec.split(":"))
+    return {"users": users, "nominations": nominations, "participants": participants, "votes": votes}
+
+
+def seed(database, dataset: dict, rng: random.Random) -> list:
+    """Fill the scratch database and return the seeded ``(user_id, nomination_id, participant)`` votes."""
+    from pymongo import ASCENDING, DESCENDING
+
+    now = datetime.datetime.now(datetime.timezone.utc)
+    users = [
+        {
+            "user_id": user_id,
+            "fullname": f"User {user_id}",
+            "username": f"user{user_id}",
+            "input_fullname": f"User {user_id}",
+            "input_phone": f"+998{90000000 + user_id}",
+            "created_at": now - datetime.timedelta(seconds=user_id),
+            "updated_at": now,
+        }
+        for user_id in range(1, dataset["users"] + 1)
+    ]
+    for start in range(0, len(users), 10000):
+        database.users.insert_many(users[start:start + 10000], ordered=False)
+
+    nominations = [
+        {
+            "title": f"Nomination {n}",
+            "description": "",
+            "participants": [
+                {"name": f"Participant {n}-{p}", "votes": 0, "created_at": now}
+                for p in range(dataset["participants"])
+            ],
+            "is_active": True,
+            "created_at": now,
+            "updated_at": now,
+        }
+        for n in range(dataset["nominations"])
+    ]
+    nomination_ids = database.nominations.insert_many(nominations).inserted_ids
+
+    pairs = set()
+    limit = min(dataset["votes"], dataset["users"] * dataset["nominations"])
+    while len(pairs) < limit:
+        pairs.add((rng.randint(1, dataset["users"]), rng.randrange(dataset["nominations"])))
+    seeded, counts, batch = [], {}, []
+    for user_id, n in pairs:
+        participant = f"Participant {n}-{rng.randrange(dataset['participants'])}"
+        seeded.append((user_id, nomination_ids[n], participant))
+        counts[(n, participant)] = counts.get((n, participant), 0) + 1
+        batch.append({
+            "nomination_id": nomination_ids[n],
+            "participant_name": participant,
+            "user_id": user_id,
+            "voted_at": now - datetime.timedelta(seconds=rng.randrange(86400)),
+        })
+        if len(batch) == 10000:
+            database.votes.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        database.votes.insert_many(batch, ordered=False)
+    for (n, participant), count in counts.items():
+        database.nominations.update_one(
+            {"_id": nomination_ids[n], "participants.name": participant},
+            {"$set": {"participants.$.votes": count}},
+        )
+
+    # Same indexes the admin models declare, so queries behave like production.
+    database.users.create_index([("user_id", ASCENDING)], unique=True)
+    database.users.create_index([("created_at", DESCENDING), ("_id", DESCENDING)])
+    database.nominations.create_index([("title", ASCENDING)], unique=True)
+    database.nominations.create_index([("is_active", ASCENDING)])
+    database.votes.create_index([("user_id", ASCENDING), ("nomination_id", ASCENDING)], unique=True)
+    database.votes.create_index([("voted_at", DESCENDING), ("_id", DESCENDING)])
+    return seeded
+
+
+def summarize(operation: str, dataset: dict, samples: list) -> dict:
+    ordered = sorted(samples)
+
+    def pct(p):
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))] * 1000
+
+    return {
+        "dataset": dataset,
+        "operation": operation,
+        "n": len(samples),
+        "mean_ms": round(statistics.fmean(samples) * 1000, 3),
+        "p50_ms": round(pct(50), 3),
+        "p95_ms": round(pct(95), 3),
+        "p99_ms": round(pct(99), 3),
+        "min_ms": round(ordered[0] * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+        "ops_per_s": round(len(samples) / sum(samples), 1) if sum(samples) else None,
+    }
+
+
+async def time_async(make_call, count: int) -> list:
+    samples = []
+    for i in range(count):
+        call = make_call(i)
+        started = time.perf_counter()
+        await call
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def time_sync(call, count: int) -> list:
+    samples = []
+    for i in range(count):
+        started = time.perf_counter()
+        call(i)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+async def run_bot_benchmarks(mongo, dataset: dict, seeded: list, names: dict, args, rng) -> list:
+    iterations, warmup = args.iterations, args.warmup
+    total = iterations + warmup
+    results = []
+
+    async def bench(operation, make_call):
+        await time_async(make_call, warmup)
+        samples = await time_async(lambda i: make_call(warmup + i), iterations)
+        results.append(summarize(operation, dataset, samples))
+        print(f"  {operation:<24} p50 {results[-1]['p50_ms']:>9.3f} ms  p95 {results[-1]['p95_ms']:>9.3f} ms")
+
+    await mongo.connect()
+    nomination_ids = list(names)
+    existing = [rng.randint(1, dataset["users"]) for _ in range(total)]
+    fresh_base = dataset["users"] + 1
+    await bench("user_update.create", lambda i: mongo.user_update(fresh_base + i, {"username": "new"}))
+    await bench("user_update.update", lambda i: mongo.user_update(existing[i], {"username": f"u{i}"}))
+    await bench("user_update.read", lambda i: mongo.user_update(existing[i]))
+    await bench("get_nominations", lambda i: mongo.get_nominations())
+    await bench("get_nominations.fresh", lambda i: mongo.get_nominations(fresh=True))
+    await bench("get_participants", lambda i: mongo.get_participants(str(rng.choice(nomination_ids))))
+    await bench("get_participants.all", lambda i: mongo.get_participants())
+
+    # Fresh votes come from the users created above, who have not voted yet.
+    fresh = [(rng.choice(nomination_ids), fresh_base + i) for i in range(total)]
+    fresh = [(n, rng.choice(names[n]), u) for n, u in fresh]
+    await bench("add_vote.fresh", lambda i: mongo.add_vote(str(fresh[i][0]), fresh[i][1], fresh[i][2]))
+
+    if len(seeded) >= total:
+        sample = rng.sample(seeded, total)
+        await bench("add_vote.duplicate", lambda i: mongo.add_vote(str(sample[i][1]), sample[i][2], sample[i][0]))
+        changed = [
+            (u, n, rng.choice([p for p in names[n] if p != name] or [name])) for u, n, name in sample
+        ]
+        await bench("add_vote.changed", lambda i: mongo.add_vote(str(changed[i][1]), changed[i][2], changed[i][0]))
+
+    list_iterations = max(3, iterations // 20)
+    samples = await time_async(lambda i: mongo.users_list(), list_iterations)
+    results.append(summarize("users_list", dataset, samples))
+    print(f"  {'users_list':<24} p50 {results[-1]['p50_ms']:>9.3f} ms  ({list_iterations} calls)")
+    mongo.close()
+    return results
+
+
+def run_admin_benchmarks(dataset: dict, seeded: list, names: dict, args, rng) -> list:
+    from database import Vote
+
+    total = args.iterations + args.warmup
+    if len(seeded) < total:
+        return []
+    calls = [
+        (u, str(n), rng.choice([p for p in names[n] if p != name] or [name]))
+        for u, n, name in rng.sample(seeded, total)
+    ]
+    time_sync(lambda i: Vote.cast_vote(*calls[i]), args.warmup)
+    samples = time_sync(lambda i: Vote.cast_vote(*calls[args.warmup + i]), args.iterations)
+    result = summarize("Vote.cast_vote", dataset, samples)
+    print(f"  {'Vote.cast_vote':<24} p50 {result['p50_ms']:>9.3f} ms  p95 {result['p95_ms']:>9.3f} ms")
+    return [result]
+
+
+def compare(results: list, baseline_path: str) -> None:
+    with open(baseline_path) as fh:
+        baseline = json.load(fh)
+    previous = {(json.dumps(r["dataset"], sort_keys=True), r["operation"]): r for r in baseline["results"]}
+    print(f"\nComparison with {baseline_path} (p50, negative is faster):")
+    for result in results:
+        key = (json.dumps(result["dataset"], sort_keys=True), result["operation"])
+        if key not in previous or not previous[key]["p50_ms"]:
+            continue
+        before, after = previous[key]["p50_ms"], result["p50_ms"]
+        change = (after - before) / before * 100
+        size = "{users}u/{nominations}n/{participants}p/{votes}v".format(**result["dataset"])
+        print(f"  {size:<24} {result['operation']:<24} {before:>9.3f} -> {after:>9.3f} ms  {change:+6.1f}%")
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> None:
+    args = parse_args()
+    datasets = [parse_dataset(spec) for spec in (args.dataset or DEFAULT_DATASETS)]
+    rng = random.Random(args.seed)
+
+    sys.path[:0] = [os.path.join(ROOT, "bot"), os.path.join(ROOT, "admin"), ROOT]
+
+    from pymongo import MongoClient
+
+    from configuration import load_configuration
+    from db import close_database, setup_database
+
+    # Nothing here talks to Telegram; the bot's required settings only need a value.
+    load_configuration(
+        db={"mongo_uri": args.uri, "database": args.database},
+        bot={"token": "42:benchmark", "admins": [], "channel_id": "@benchmark"},
+        results={"chat_id": "@benchmark"},
+    )
+    from structures.database import MongoDB
+
+    client = MongoClient(args.uri)
+    server_version = client.server_info()["version"]
+    setup_database(args.uri, args.database)
+    results = []
+
+    def reseed(dataset):
+        client.drop_database(args.database)
+        seeded = seed(client[args.database], dataset, rng)
+        names = {
+            doc["_id"]: [p["name"] for p in doc["participants"]]
+            for doc in client[args.database].nominations.find({}, {"participants.name": 1})
+        }
+        return seeded, names
+
+    try:
+        for dataset in datasets:
+            print("Dataset: {users} users, {nominations} nominations, {participants} participants, "
+                  "{votes} votes".format(**dataset))
+            seeded, names = reseed(dataset)
+            results.extend(asyncio.run(run_bot_benchmarks(MongoDB(), dataset, seeded, names, args, rng)))
+            # The bot benchmarks changed votes, so reseed before timing the admin path.
+            seeded, names = reseed(dataset)
+            results.extend(run_admin_benchmarks(dataset, seeded, names, args, rng))
+        client.drop_database(args.database)
+    finally:
+        close_database()
+        client.close()
+
+    report = {
+        "meta": {
+            "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "revision": git_revision(),
+            "server_version": server_version,
+            "iterations": args.iterations,
+            "warmup": args.warmup,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as fh:
+        json.dump(report, fh, indent=2)
+    print(f"\nResults written to {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()